@@ -15,34 +15,85 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 '''
 
 import os
+import atexit
 import logging
 import requests
 import json
 import time
-import csv
-from io import StringIO
+import base64
+import hashlib
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, render_template, request, Response, jsonify, session
+import numpy as np
+
+from flask import Flask, render_template, request, Response, jsonify, session, g, redirect, url_for
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, DecimalField, SubmitField, HiddenField
+from flask_wtf.file import FileField
+from wtforms import (StringField, SelectField, DecimalField, SubmitField, HiddenField, BooleanField,
+                     TextAreaField, DateField)
 from wtforms.validators import DataRequired, Regexp, Optional, NumberRange
 from flask_wtf.csrf import CSRFProtect
 from flask_session import Session
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from limits.storage import storage_from_string
 from flask_caching import Cache
 
-# 載入 config 中的 API_KEY 與 BLACKLISTED_WALLETS
-from config import BLOCKCHAIN_API_KEYS, BLACKLISTED_WALLETS
+# 載入 config 中的 API_KEY
+from config import BLOCKCHAIN_API_KEYS, BLOCKCHAIN_API_KEY_POOLS
+from config import BLOCKCHAIN_API_URLS, COINGECKO_API_URL
+from config import TX_STORE_PATH, TX_STORE_SYNC_INTERVAL, TX_STORE_MAX_SYNC_PAGES
+from config import RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_MB, RESULT_CACHE_TTL
+from config import HISTORY_MAX_WORKERS, HISTORY_MAX_REQUESTS
+from config import NHOP_MAX_FANOUT, NHOP_MAX_REQUESTS, NHOP_TIME_BUDGET
+from config import TAINT_MAX_LOTS, TAINT_MAX_HOPS
+from config import GRAPH_INDEX_DIR, GRAPH_INDEX_SAVE_INTERVAL, ADDRESS_BOOK_PATH
+from config import PRICE_HISTORY_PATH, PRICE_HISTORY_FAILURE_BACKOFF
+from config import METRICS_ENABLED, SLOW_REQUEST_SECONDS
+from config import JOB_MAX_WORKERS, JOB_MAX_PENDING, JOB_TTL
+from config import CACHE_TYPE, CACHE_REDIS_URL, EXPLORER_CACHE_TTL
+from config import RATELIMIT_STORAGE_URI, RATELIMIT_ENABLED
+from config import SHARED_CACHE_PATH, SHARED_CACHE_MAX_ENTRIES, SHARED_CACHE_MAX_MB
+from config import EXPLORER_RATE_PER_KEY, EXPLORER_BURST, EXPLORER_MAX_WAIT
+from config import EXPLORER_MAX_RETRIES, EXPLORER_RETRY_BACKOFF, EXPLORER_RATE_STORAGE_URI
+from config import SCREEN_MAX_ADDRESSES, SCREEN_MAX_WORKERS, SCREEN_SYNC_PAGES
 
 # models
 from models.anomaly_detection import detect_anomalies
 from models.data_processing import analyze_transactions
+from models.tx_batch import TransactionBatch
+from models.graph_index import GraphIndexRegistry
+from models.graph_payload import build_graph_payload
+from models.taint import cached_taint, TAINT_MODELS
+from models.tx_table import table_order, SORT_FIELDS
+
+# services
+from services.explorer import fetch_txlist, ExplorerError
+from services import http_client
+from services.tx_store import TransactionStore, sync_address
+from services.history_fetcher import sync_address_history
+from services.nhop_crawler import crawl_nhop
+from services.price_history import PriceHistory
+from services.blacklist import get_blacklist
+from services.address_book import get_address_book
+from services.result_cache import ResultCache
+from services.jobs import JobManager, JobQueueFull, DONE, FAILED
+from services.single_flight import SingleFlight
+from services.upstream import KeyPool, INTERACTIVE, BACKGROUND, BULK
+from services.screening import parse_address_list, risk_report, iter_screening, summarize
+# 只為了副作用：註冊 sqlite:// 限流儲存 (SQLiteLimiterStorage)
+from services import shared_cache  # noqa: F401
+from services import metrics as pipeline_metrics
+from services.metrics import stage, count_rows, run_in_context
+from services.tx_filter import FilterIndex, parse_date, DIRECTIONS
+from services.exporter import (iter_csv, iter_gzip, iter_columnar,
+                               COLUMNAR_FORMATS, ARROW_AVAILABLE)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your_secret_key_here')
 app.config['SESSION_TYPE'] = 'filesystem'
+app.config['RATELIMIT_ENABLED'] = RATELIMIT_ENABLED
 
 Session(app)
 csrf = CSRFProtect(app)
@@ -51,22 +102,93 @@ csrf = CSRFProtect(app)
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour", "10 per minute"],
-    storage_uri="memory://"  # 單機測試可用，生產環境建議用 Redis 等
+    # memory:// 各 worker 各自計數；多 worker 部署改用 sqlite:// (同主機) 或 redis://
+    storage_uri=RATELIMIT_STORAGE_URI
 )
 limiter.init_app(app)
 
-cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
+# 匯率與 API 回應快取；CACHE_TYPE 見 config.py
+cache = Cache(app, config={
+    'CACHE_TYPE': CACHE_TYPE,
+    'CACHE_REDIS_URL': CACHE_REDIS_URL or None,
+    'CACHE_SHARED_PATH': SHARED_CACHE_PATH,
+    'CACHE_THRESHOLD': SHARED_CACHE_MAX_ENTRIES,
+    'CACHE_SHARED_MAX_BYTES': SHARED_CACHE_MAX_MB * 1024 * 1024,
+})
+# 跨行程的共用快取層 (SimpleCache 只在單一行程內，不作為共用層)
+shared_tier = cache if CACHE_TYPE != "SimpleCache" else None
+
+# 多鏈並行查詢用的執行緒池
+chain_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chain")
+
+# 批次地址篩查：每個地址分析的最近交易筆數 (一頁)
+SCREEN_PAGE_SIZE = 10000
+
+# 批次地址篩查用的執行緒池 (所有篩查請求共用，API 呼叫以 BULK 優先順序排隊)
+screen_executor = ThreadPoolExecutor(max_workers=SCREEN_MAX_WORKERS, thread_name_prefix="screen")
+
+# 本地交易儲存 (增量同步)
+tx_store = TransactionStore(TX_STORE_PATH)
+
+# 歷史匯率：每筆交易以交易當下的價格換算 USD；Coingecko 失敗後暫停補抓，期間改用即時匯率
+price_history = PriceHistory(PRICE_HISTORY_PATH, base_url=COINGECKO_API_URL,
+                             failure_backoff=PRICE_HISTORY_FAILURE_BACKOFF)
+
+# 地址字典：地址 => 整數 id，需在任何交易進入前載入
+if ADDRESS_BOOK_PATH:
+    get_address_book().load(ADDRESS_BOOK_PATH)
+    atexit.register(lambda: get_address_book().save())
+
+# 地址圖索引：每條鏈一份，所有查詢過的交易都會累積進來
+graph_indexes = GraphIndexRegistry(GRAPH_INDEX_DIR, save_interval=GRAPH_INDEX_SAVE_INTERVAL)
+atexit.register(lambda: graph_indexes.save_all())
+
+# 查詢結果快取 (session 只存 result_id)；CACHE_TYPE 為跨行程後端時同時寫入共用層，
+# 請求落在其他 worker 時仍能以 result_id 取得結果
+result_cache = ResultCache(max_entries=RESULT_CACHE_MAX_ENTRIES,
+                           max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+                           ttl=RESULT_CACHE_TTL,
+                           shared=shared_tier)
+
+def _result_cache_metrics():
+    stats = result_cache.stats()
+    yield "result_cache_hits_total", "counter", {}, stats["hits"]
+    yield "result_cache_shared_hits_total", "counter", {}, stats["shared_hits"]
+    yield "result_cache_misses_total", "counter", {}, stats["misses"]
+    yield "result_cache_evictions_total", "counter", {}, stats["evictions"]
+    yield "result_cache_bytes", "gauge", {}, stats["bytes"]
+
+pipeline_metrics.metrics.add_collector(_result_cache_metrics)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.metrics_token = pipeline_metrics.start_breakdown()
+
+@app.after_request
+def record_request_metrics(response):
+    """ 各路由耗時直方圖；超過 SLOW_REQUEST_SECONDS 時記錄各階段耗時明細。 """
+    started = g.pop("request_started", None)
+    token = g.pop("metrics_token", None)
+    if started is None or token is None:
+        return response
+    elapsed = time.perf_counter() - started
+    breakdown = pipeline_metrics.end_breakdown(token)
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    pipeline_metrics.metrics.observe("http_request_duration_seconds", elapsed, route=route,
+                                     method=request.method, status=str(response.status_code))
+    if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+        stages = ", ".join(f"{k}={v:.3f}s" for k, v in
+                           sorted(breakdown.items(), key=lambda kv: kv[1], reverse=True))
+        logging.warning(f"慢請求 {request.method} {route} {elapsed:.3f}s: {stages or '無階段資料'}")
+    return response
 
 if app.debug:
     logging.basicConfig(level=logging.DEBUG)
 else:
     logging.basicConfig(level=logging.INFO)
 
-BLOCKCHAIN_APIS = {
-    "ethereum": "https://api.etherscan.io/api",
-    "bsc": "https://api.bscscan.com/api",
-    "polygon": "https://api.polygonscan.com/api"
-}
+BLOCKCHAIN_APIS = dict(BLOCKCHAIN_API_URLS)
 
 COINGECKO_IDS = {
     "ethereum": "ethereum",
@@ -74,6 +196,20 @@ COINGECKO_IDS = {
     "polygon": "polygon"
 }
 
+# 區塊鏈瀏覽器 API 金鑰池：每把金鑰依公布的速率配額發送，互動查詢優先於背景工作；
+# 配額計數器放在共用儲存時，所有 worker 合計不超過每把金鑰的速率
+key_rate_storage = (None if EXPLORER_RATE_STORAGE_URI.startswith("memory://")
+                    else storage_from_string(EXPLORER_RATE_STORAGE_URI))
+api_key_pools = {
+    chain: KeyPool(chain, keys, rate=EXPLORER_RATE_PER_KEY, burst=EXPLORER_BURST,
+                   max_wait=EXPLORER_MAX_WAIT, max_retries=EXPLORER_MAX_RETRIES,
+                   retry_backoff=EXPLORER_RETRY_BACKOFF, storage=key_rate_storage)
+    for chain, keys in BLOCKCHAIN_API_KEY_POOLS.items()
+}
+
+# 快取過期時，同一幣種的並行查詢只向 Coingecko 發出一次請求
+price_flight = SingleFlight("coingecko")
+
 def get_usd_price_for_blockchain(blockchain):
     """ 從 Coingecko 抓取該鏈對 USD 匯率，快取 1 分鐘。 """
     if blockchain not in COINGECKO_IDS:
@@ -81,28 +217,316 @@ def get_usd_price_for_blockchain(blockchain):
     cg_id = COINGECKO_IDS[blockchain]
     cache_key = f"cg_price_{cg_id}"
     cached_price = cache.get(cache_key)
+    if cached_price:
+        pipeline_metrics.inc("cache_requests_total", cache="coingecko_spot", result="hit")
+        return cached_price
+    pipeline_metrics.inc("cache_requests_total", cache="coingecko_spot", result="miss")
+    return price_flight.do(cache_key, fetch_usd_price, cg_id, cache_key)
+
+def fetch_usd_price(cg_id, cache_key):
+    """ 實際向 Coingecko 查詢 (由 single-flight 的第一個呼叫者執行)。 """
+    # 等待 single-flight 期間可能已有其他請求寫入快取
+    cached_price = cache.get(cache_key)
     if cached_price:
         return cached_price
 
-    url = f"https://api.coingecko.com/api/v3/simple/price?ids={cg_id}&vs_currencies=usd"
+    url = f"{COINGECKO_API_URL}/simple/price?ids={cg_id}&vs_currencies=usd"
     try:
-        resp = requests.get(url, timeout=5)
-        resp.raise_for_status()
-        data = resp.json()
+        with stage("coingecko_http"):
+            resp = http_client.http_get(url, timeout=5)
+            resp.raise_for_status()
+            data = resp.json()
+        pipeline_metrics.inc("upstream_requests_total", service="coingecko", outcome="ok")
         price = data.get(cg_id, {}).get("usd", 0.0)
         if price <= 0:
             price = 1.0
         cache.set(cache_key, price, timeout=60)
         return price
     except Exception as e:
+        pipeline_metrics.inc("upstream_requests_total", service="coingecko", outcome="error")
         logging.error(f"Coingecko API 錯誤: {e}")
         return 1.0
 
+def get_current_result():
+    """ 取得目前 session 對應的查詢結果；無資料或已被淘汰時回傳 None。 """
+    return result_cache.get(session.get("result_id"))
+
+class ChainQueryError(Exception):
+    """ 單一鏈查詢失敗，訊息可直接顯示給使用者。 """
+
+# 背景工作：大型查詢在獨立的執行緒池執行，不佔用 Flask worker 與 chain_executor
+# 跨行程後端時工作狀態與 result_id 寫入共用層，/jobs/<id> 可由任一 worker 回應
+job_manager = JobManager(max_workers=JOB_MAX_WORKERS, max_pending=JOB_MAX_PENDING,
+                         ttl=JOB_TTL, user_errors=(ChainQueryError,),
+                         shared=shared_tier)
+
+def _job_metrics():
+    for status, count in job_manager.counts().items():
+        yield "background_jobs", "gauge", {"status": status}, count
+
+pipeline_metrics.metrics.add_collector(_job_metrics)
+
+def cached_fetch_txlist(blockchain, api_key, address, **params):
+    """
+    fetch_txlist 加上 EXPLORER_CACHE_TTL 秒的回應快取 (與匯率共用 cache)。
+    使用共用後端時，同一台主機的其他 worker 剛抓過的相同分頁不會再呼叫 API。
+    api_key 為該鏈的 KeyPool；params 中的 priority 只影響排隊順序，不列入快取鍵。
+    """
+    if EXPLORER_CACHE_TTL <= 0:
+        return fetch_txlist(BLOCKCHAIN_APIS[blockchain], api_key, address, **params)
+    cache_key = "txlist_" + "_".join([blockchain, address.lower()] +
+                                     [f"{k}={params[k]}" for k in sorted(params) if k != "priority"])
+    txs = cache.get(cache_key)
+    if txs is not None:
+        pipeline_metrics.inc("cache_requests_total", cache="explorer", result="hit")
+        return txs
+    pipeline_metrics.inc("cache_requests_total", cache="explorer", result="miss")
+    txs = fetch_txlist(BLOCKCHAIN_APIS[blockchain], api_key, address, **params)
+    cache.set(cache_key, txs, timeout=EXPLORER_CACHE_TTL)
+    return txs
+
+def load_chain_page(blockchain, address, page_num, offset, min_val, max_val,
+                    deep_history=False, sync_pages=TX_STORE_MAX_SYNC_PAGES, progress=None,
+                    priority=INTERACTIVE):
+    """
+    查詢單一鏈：增量同步交易到本地儲存、讀取第 page_num 頁並依金額篩選。
+    deep_history=True 時以區塊範圍二分並行抓取完整歷史 (不受 10,000 筆視窗限制)。
+    progress (JobProgress) 不為 None 時，每抓完一頁回報該鏈累計的頁數與交易數。
+    priority 為 API 金鑰排隊的優先順序 (互動查詢 INTERACTIVE，背景工作與 n-hop 擴展 BACKGROUND)。
+    不使用 request/session，可在執行緒池中並行執行。
+    """
+    api_key = api_key_pools[blockchain]
+
+    # 增量同步到本地儲存：只向 API 要求 last_block 之後的交易；
+    # 首次同步先抓最新的一頁 (sort=desc)，較舊的區塊之後再回補
+    def fetch(startblock, page_size):
+        return cached_fetch_txlist(blockchain, api_key, address,
+                                   startblock=startblock, offset=page_size, sort="asc",
+                                   priority=priority)
+
+    def fetch_desc(endblock, page_size):
+        return cached_fetch_txlist(blockchain, api_key, address,
+                                   startblock=0, endblock=endblock,
+                                   offset=page_size, sort="desc", priority=priority)
+
+    def fetch_range(startblock, endblock, page_size):
+        return cached_fetch_txlist(blockchain, api_key, address,
+                                   startblock=startblock, endblock=endblock,
+                                   offset=page_size, sort="asc", priority=priority)
+
+    def report_progress(pages, rows):
+        progress.report(blockchain, pages, rows)
+
+    on_progress = report_progress if progress is not None else None
+
+    try:
+        with stage("store_sync"):
+            if deep_history:
+                sync_address_history(tx_store, blockchain, address, fetch_range, offset=offset,
+                                     max_workers=HISTORY_MAX_WORKERS,
+                                     max_requests=HISTORY_MAX_REQUESTS,
+                                     min_interval=TX_STORE_SYNC_INTERVAL,
+                                     on_progress=on_progress)
+            else:
+                sync_address(tx_store, blockchain, address, fetch, offset=offset,
+                             max_pages=sync_pages,
+                             min_interval=TX_STORE_SYNC_INTERVAL,
+                             on_progress=on_progress, fetch_desc=fetch_desc)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"API 請求失敗: {e}")
+        raise ChainQueryError(f"API 請求失敗: {e}")
+    except ExplorerError as e:
+        raise ChainQueryError(f"交易查詢失敗: {e}")
+
+    # 一頁 offset 筆 (新到舊)，由本地儲存讀取
+    with stage("store_read"):
+        raw_txs = tx_store.page(blockchain, address, page_num, offset)
+        full_batch = TransactionBatch.from_raw(raw_txs)
+    logging.debug(f"{blockchain} 取得 {len(raw_txs)} 筆交易")
+    count_rows("store_read", len(full_batch))
+
+    # 匯率：優先以歷史價格逐筆換算 (二分搜尋)，無歷史資料時才用即時匯率
+    with stage("price_lookup"):
+        full_usd, usd_price = None, None
+        cg_id = COINGECKO_IDS.get(blockchain)
+        if cg_id:
+            full_usd = price_history.usd_values(cg_id, full_batch.timestamps, full_batch.value)
+            usd_price = price_history.latest(cg_id)
+        if full_usd is None:
+            usd_price = get_usd_price_for_blockchain(blockchain)
+            full_usd = full_batch.usd_values(usd_price)
+
+    # 未篩選的整頁交易加入地址圖索引 (依哈希去重)
+    with stage("graph_index"):
+        graph_indexes.get(blockchain).add_batch(full_batch, full_usd)
+
+    # 依 min_val / max_val 篩選 (欄式批次，一次陣列運算)
+    with stage("filter"):
+        mask = full_batch.value_mask(min_val, max_val)
+        batch = full_batch.take(mask)
+    count_rows("filter", len(batch))
+    return {
+        "blockchain": blockchain,
+        "batch": batch,
+        "usd_price": usd_price,
+        "usd_values": full_usd[mask],
+        "full_batch": full_batch,
+        "full_usd_values": full_usd,
+        "has_next_page": tx_store.count(blockchain, address) > page_num * offset,
+    }
+
+def run_query(progress, chains, blockchain, address, page_num, min_val, max_val,
+              deep_history=False, executor=None, priority=INTERACTIVE,
+              start_date=None, end_date=None, direction="all"):
+    """
+    查詢 + 分析的完整流程，不使用 request/session (可在背景工作中執行)。
+    executor 為 None 時依序查詢各鏈；progress (JobProgress) 不為 None 時回報進度；
+    priority 傳給 load_chain_page (API 金鑰排隊順序)。
+    篩選條件 (金額、日期、流向) 套用在合併後的篩選索引上，見 refilter_result。
+    回傳存入 result_cache 的結果 dict；全部失敗或無交易時拋出 ChainQueryError。
+    """
+    offset = 10000
+    chain_errors = []
+    if progress:
+        progress.set_stage("fetch")
+
+    def load(chain):
+        return load_chain_page(chain, address, page_num, offset, 0.0, None,
+                               deep_history, progress=progress, priority=priority)
+
+    if len(chains) == 1:
+        chain_results = [load(chains[0])]
+    else:
+        if executor is not None:
+            futures = {c: run_in_context(executor, load, c) for c in chains}
+        chain_results = []
+        for c in chains:
+            try:
+                chain_results.append(futures[c].result() if executor is not None else load(c))
+            except ChainQueryError as e:
+                chain_errors.append(f"{c}: {e}")
+        if not chain_results:
+            raise ChainQueryError("；".join(chain_errors))
+
+    if progress:
+        progress.set_stage("analyze")
+    # 未篩選的交易 (多鏈時合併並依時間新到舊排序、標記所屬鏈) 建立篩選索引，
+    # 之後只改篩選條件時以 refilter_result 沿用，不再呼叫 API
+    if len(chain_results) == 1:
+        res = chain_results[0]
+        full_batch, full_usd, chain_labels = res["full_batch"], res["full_usd_values"], None
+        usd_price = res["usd_price"]
+    else:
+        full_batch = TransactionBatch.concat([r["full_batch"] for r in chain_results])
+        full_usd = np.concatenate([r["full_usd_values"] for r in chain_results])
+        chain_labels = np.concatenate([np.full(len(r["full_batch"]), r["blockchain"], dtype=object)
+                                       for r in chain_results])
+        order = np.argsort(-full_batch.timestamps, kind="stable")
+        full_batch, full_usd, chain_labels = full_batch.take(order), full_usd[order], chain_labels[order]
+        usd_price = {r["blockchain"]: r["usd_price"] for r in chain_results}
+    with stage("filter_index"):
+        source = FilterIndex(full_batch, address, full_usd, chain_labels)
+
+    # 判斷是否還有下一頁
+    has_next_page = any(r["has_next_page"] for r in chain_results)
+    base = {
+        "source": source,
+        "address": address,
+        "blockchain": blockchain,
+        "usd_price": usd_price,
+        "page": page_num,
+        "total_pages": page_num + 1 if has_next_page else page_num,
+        "chain_errors": chain_errors,
+        "deep_history": deep_history,
+    }
+    filters = {"min_val": min_val, "max_val": max_val, "start_date": start_date,
+               "end_date": end_date, "direction": direction}
+    return refilter_result(base, filters, progress)
+
+def refilter_result(base, filters, progress=None):
+    """
+    以查詢結果中的篩選索引 (base["source"]) 依 filters 重新篩選、分析，回傳新的結果 dict。
+    filters 為 FilterIndex.select 的參數 (min_val / max_val / start_date / end_date / direction)。
+    不呼叫 API，也不使用 request/session。
+    """
+    source = base["source"]
+    with stage("filter"):
+        rows = source.select(**filters)
+        batch, usd_values, chain_labels = source.subset(rows)
+    count_rows("filter", len(batch))
+    with stage("to_records"):
+        filtered_txs = batch.to_records(usd_values)
+        if chain_labels is not None:
+            for tx, chain in zip(filtered_txs, chain_labels):
+                tx["chain"] = chain
+
+    if not filtered_txs:
+        raise ChainQueryError("該篩選條件下無交易記錄。")
+
+    # 分析 & 異常
+    with stage("analyze"):
+        summary = analyze_transactions(batch, base["address"])
+    with stage("anomalies"):
+        anomalies = detect_anomalies(batch)
+    count_rows("analyze", len(batch))
+    if progress:
+        progress.set_rows_processed(len(batch))
+
+    keep = ("source", "address", "blockchain", "usd_price", "page", "total_pages",
+            "chain_errors", "deep_history")
+    return {
+        **{k: base[k] for k in keep},
+        "transactions": filtered_txs,
+        "batch": batch,
+        "usd_values": usd_values,
+        "summary": summary,
+        "anomalies": anomalies,
+        "filters": filters,
+    }
+
+def run_query_job(progress, *args, **kwargs):
+    """ 背景工作版本的 run_query：結果存入 result_cache，回傳 result_id。 """
+    return result_cache.put(run_query(progress, *args, priority=BACKGROUND, **kwargs))
+
+def show_result(result_id, result, form):
+    """ 將結果設為目前 session 的查詢結果 (供 /export、/graph_data)，並顯示 result.html。 """
+    session["result_id"] = result_id
+    session["address"] = result["address"]
+    session["current_blockchain"] = result["blockchain"]
+    session["usd_price"] = result["usd_price"]
+
+    # 交易表格由前端向 /api/transactions 分頁取得，頁面大小與交易筆數無關
+    with stage("render"):
+        return render_template("result.html",
+                               summary=result["summary"],
+                               anomalies=result["anomalies"],
+                               total_transactions=len(result["transactions"]),
+                               total_pages=result["total_pages"],
+                               current_page=result["page"],
+                               address=result["address"],
+                               blockchain=result["blockchain"],
+                               deep_history=result.get("deep_history", False),
+                               filters=result.get("filters", {}),
+                               source_transactions=len(result["source"]) if result.get("source") else None,
+                               chain_errors=result["chain_errors"],
+                               form=form
+                               )
+
+def can_refilter(result, blockchain, address, page_num, deep_history, filters):
+    """ 同一地址、鏈、頁數的查詢只改篩選條件時，可直接以結果中的篩選索引重新篩選。 """
+    return (result is not None and result.get("source") is not None
+            and result["address"].lower() == address.lower()
+            and result["blockchain"] == blockchain
+            and result["page"] == page_num
+            and result.get("deep_history", False) == deep_history
+            and result.get("filters") != filters)
+
 # Flask-WTF 表單
 class QueryForm(FlaskForm):
     blockchain = SelectField(
         '選擇區塊鏈',
-        choices=[('ethereum','Ethereum'),('bsc','Binance Smart Chain'),('polygon','Polygon')],
+        choices=[('ethereum','Ethereum'),('bsc','Binance Smart Chain'),('polygon','Polygon'),
+                 ('all','全部鏈 (並行查詢)')],
         validators=[DataRequired()]
     )
     address = StringField(
@@ -122,6 +546,15 @@ class QueryForm(FlaskForm):
         validators=[Optional(), NumberRange(min=0)],
         default=None
     )
+    start_date = DateField('起始日期', validators=[Optional()], format='%Y-%m-%d')
+    end_date = DateField('結束日期', validators=[Optional()], format='%Y-%m-%d')
+    direction = SelectField(
+        '流向',
+        choices=[('all','全部'),('in','流入'),('out','流出')],
+        default='all'
+    )
+    deep_history = BooleanField('完整歷史 (突破 10,000 筆上限)', default=False)
+    background = BooleanField('背景執行 (大量交易，完成後再檢視結果)', default=False)
     page = HiddenField('Page', default=1)
     submit = SubmitField('查詢')
 
@@ -137,6 +570,9 @@ def index():
         address = form.address.data.strip()
         min_val = float(form.min_value.data or 0.0)
         max_val = float(form.max_value.data) if form.max_value.data else None
+        deep_history = bool(form.deep_history.data)
+        filters = {"min_val": min_val, "max_val": max_val, "start_date": form.start_date.data,
+                   "end_date": form.end_date.data, "direction": form.direction.data or "all"}
 
         # 分頁 (Etherscan/bscscan offset 預設)
         try:
@@ -145,118 +581,353 @@ def index():
         except ValueError:
             page_num = 1
 
-        if blockchain not in BLOCKCHAIN_APIS:
+        if blockchain == "all":
+            # 並行查詢所有已設定 API Key 的鏈
+            chains = [c for c in BLOCKCHAIN_APIS if BLOCKCHAIN_API_KEYS.get(c)]
+            if not chains:
+                return render_template("index.html", form=form, error="API Key 未設定")
+        elif blockchain not in BLOCKCHAIN_APIS:
             return render_template("index.html", form=form, error="不支援的區塊鏈")
-
-        api_key = BLOCKCHAIN_API_KEYS.get(blockchain, "")
-        if not api_key:
+        elif not BLOCKCHAIN_API_KEYS.get(blockchain, ""):
             return render_template("index.html", form=form, error="API Key 未設定")
+        else:
+            chains = [blockchain]
 
-        # 匯率
-        usd_price = get_usd_price_for_blockchain(blockchain)
+        # 只改篩選條件：沿用目前結果的篩選索引，不再呼叫 API
+        current = get_current_result()
+        if not form.background.data and can_refilter(current, blockchain, address, page_num,
+                                                     deep_history, filters):
+            pipeline_metrics.inc("cache_requests_total", cache="refilter", result="hit")
+            try:
+                result = refilter_result(current, filters)
+            except ChainQueryError as e:
+                return render_template("index.html", form=form, error=str(e))
+            return show_result(result_cache.put(result), result, form)
 
-        # 一次抓 10000 筆
-        offset = 10000
-        url = (f"{BLOCKCHAIN_APIS[blockchain]}?module=account&action=txlist"
-               f"&address={address}&sort=desc&page={page_num}&offset={offset}"
-               f"&apikey={api_key}")
-        logging.debug(f"API URL: {url}")
+        if form.background.data:
+            # 背景工作：立即回傳工作頁面，查詢與分析在工作執行緒池中進行
+            try:
+                job_id = job_manager.submit(run_query_job, chains, blockchain, address, page_num,
+                                            min_val, max_val, deep_history,
+                                            start_date=filters["start_date"],
+                                            end_date=filters["end_date"],
+                                            direction=filters["direction"],
+                                            meta={"blockchain": blockchain, "address": address})
+            except JobQueueFull as e:
+                return render_template("index.html", form=form, error=str(e))
+            return redirect(url_for("job_page", job_id=job_id))
 
         try:
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-        except requests.exceptions.RequestException as e:
-            logging.error(f"API 請求失敗: {e}")
-            return render_template("index.html", form=form, error=f"API 請求失敗: {e}")
-
-        if data.get("status") != "1":
-            err_msg = data.get("message","未知錯誤")
-            return render_template("index.html", form=form, error=f"交易查詢失敗: {err_msg}")
+            result = run_query(None, chains, blockchain, address, page_num, min_val, max_val,
+                               deep_history, executor=chain_executor,
+                               start_date=filters["start_date"], end_date=filters["end_date"],
+                               direction=filters["direction"])
+        except ChainQueryError as e:
+            return render_template("index.html", form=form, error=str(e))
 
-        raw_txs = data.get("result", [])
-        logging.debug(f"取得 {len(raw_txs)} 筆交易")
-
-        # 依 min_val / max_val 篩選
-        filtered_txs = []
-        for tx in raw_txs:
-            raw_value = tx.get("value","0")
-            try:
-                raw_value_int = int(raw_value)
-            except:
-                raw_value_int = 0
-            native_val = raw_value_int / 10**18
-            if native_val < min_val:
-                continue
-            if max_val is not None and native_val > max_val:
-                continue
-            # timeStamp => to time
-            tstamp = tx.get("timeStamp","0")
-            try:
-                t = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(int(tstamp)))
-            except:
-                t = "未知時間"
-
-            tx["value"] = native_val
-            tx["usd_value"] = round(native_val * usd_price, 2)
-            tx["time"] = t
+        # 結果存入伺服器端快取，session 只保存 result_id 供 /export 和 /graph_data
+        return show_result(result_cache.put(result), result, form)
+    else:
+        return render_template("index.html", form=form, error="表單驗證失敗。請檢查輸入。")
 
-            filtered_txs.append(tx)
+class ScreenForm(FlaskForm):
+    blockchain = SelectField(
+        '選擇區塊鏈',
+        choices=[('ethereum','Ethereum'),('bsc','Binance Smart Chain'),('polygon','Polygon')],
+        validators=[DataRequired()]
+    )
+    addresses = TextAreaField('地址清單 (每行一個，或貼上 CSV)', validators=[Optional()])
+    address_file = FileField('上傳名單檔 (.txt / .csv / .json)')
+    submit = SubmitField('開始篩查')
 
-        if not filtered_txs:
-            return render_template("index.html", form=form, error="該篩選條件下無交易記錄。")
+def screen_address(blockchain, address):
+    """
+    單一地址的篩查：同步後對最近的 SCREEN_PAGE_SIZE 筆交易 (首次同步先抓最新的一頁)
+    做流入流出分析與異常偵測，回傳風險報告。
+    較舊的歷史尚未回補、或本地已有更多交易時，報告標示 truncated。
+    """
+    res = load_chain_page(blockchain, address, 1, SCREEN_PAGE_SIZE, 0.0, None,
+                          sync_pages=SCREEN_SYNC_PAGES, priority=BULK)
+    batch = res["batch"]
+    with stage("analyze"):
+        summary = analyze_transactions(batch, address)
+    with stage("anomalies"):
+        anomalies = detect_anomalies(batch)
+    truncated = bool(tx_store.first_block(blockchain, address)) or \
+        tx_store.count(blockchain, address) > len(batch)
+    return risk_report(address, blockchain, batch, res["usd_values"], summary, anomalies,
+                       address in get_blacklist(), truncated=truncated)
 
-        # 分析 & 異常
-        summary = analyze_transactions(filtered_txs, address)
-        anomalies = detect_anomalies(filtered_txs)
-        anomaly_dict = defaultdict(list)
-        for anom in anomalies:
-            anomaly_dict[anom["hash"]].append(anom["type"])
+@app.route("/screen", methods=["GET", "POST"])
+@limiter.limit("5 per minute", methods=["POST"])
+def screen():
+    """
+    批次地址篩查：上傳或貼上地址清單，並行抓取與分析 (同時最多 SCREEN_MAX_WORKERS 個地址)，
+    以 NDJSON 串流回傳每個地址的風險報告 (依完成順序)，最後一行為彙總 ({"done": true, ...})。
+    """
+    form = ScreenForm()
+    if request.method == "GET":
+        return render_template("screen.html", form=form, max_addresses=SCREEN_MAX_ADDRESSES)
+    if not form.validate_on_submit():
+        return jsonify({"error": "表單驗證失敗。請檢查輸入。"}), 400
 
-        # 判斷是否還有下一頁
-        has_next_page = (len(raw_txs) == offset)
-        total_pages = page_num + 1 if has_next_page else page_num
+    blockchain = form.blockchain.data
+    if not BLOCKCHAIN_API_KEYS.get(blockchain, ""):
+        return jsonify({"error": "API Key 未設定"}), 400
+    text = form.addresses.data or ""
+    if form.address_file.data:
+        text += "\n" + form.address_file.data.read().decode("utf-8", errors="ignore")
+    try:
+        addresses = parse_address_list(text, SCREEN_MAX_ADDRESSES)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not addresses:
+        return jsonify({"error": "清單中沒有合法的地址 (0x + 40 hex)"}), 400
 
-        # 存 session 供 /export 和 /graph_data
-        session["transactions"] = filtered_txs
-        session["current_blockchain"] = blockchain
-        session["usd_price"] = usd_price
+    def generate():
+        started = time.perf_counter()
+        reports = []
+        for report in iter_screening(addresses, lambda a: screen_address(blockchain, a),
+                                     screen_executor, max_in_flight=SCREEN_MAX_WORKERS,
+                                     user_errors=(ChainQueryError,), blockchain=blockchain):
+            reports.append(report)
+            yield json.dumps(report, ensure_ascii=False) + "\n"
+        yield json.dumps(summarize(reports, time.perf_counter() - started), ensure_ascii=False) + "\n"
 
-        return render_template("result.html",
-                               summary=summary,
-                               anomalies=anomalies,
-                               anomaly_dict=anomaly_dict,
-                               transactions=filtered_txs,
-                               total_pages=total_pages,
-                               current_page=page_num,
-                               address=address,
-                               form=form
-                               )
-    else:
-        return render_template("index.html", form=form, error="表單驗證失敗。請檢查輸入。")
+    return Response(generate(), mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no", "X-Total-Addresses": str(len(addresses))})
 
 @app.route("/export", methods=["POST"])
 @limiter.limit("5 per minute")
 def export():
-    txs = session.get("transactions", [])
+    result = get_current_result()
+    txs = result["transactions"] if result else []
     if not txs:
         return jsonify({"error":"無交易資料"}),400
 
-    si = StringIO()
-    writer = csv.writer(si)
-    writer.writerow(["交易哈希","來自","發送到","金額(原生)","金額(USD)","時間"])
-    for tx in txs:
-        writer.writerow([
-            tx.get("hash"),
-            tx.get("from"),
-            tx.get("to"),
-            tx.get("value"),
-            tx.get("usd_value"),
-            tx.get("time")
-        ])
-    output = si.getvalue()
-    return Response(output, mimetype="text/csv",
-                    headers={"Content-Disposition":"attachment; filename=transactions.csv"})
+    # format: csv (預設) / parquet / arrow / npz；gzip=1 時壓縮 CSV
+    fmt = request.values.get("format", "csv").lower()
+    use_gzip = request.values.get("gzip", "").lower() in ("1", "true", "on")
+
+    if fmt == "csv":
+        chunks = iter_csv(txs)
+        filename, mimetype = "transactions.csv", "text/csv"
+        if use_gzip:
+            chunks = iter_gzip(chunks)
+            filename, mimetype = "transactions.csv.gz", "application/gzip"
+    elif fmt in COLUMNAR_FORMATS:
+        if fmt != "npz" and not ARROW_AVAILABLE:
+            return jsonify({"error":"伺服器未安裝 pyarrow，無法匯出 " + fmt}),400
+        usd_values = result.get("usd_values")
+        if usd_values is None:
+            usd_values = [tx.get("usd_value", 0.0) for tx in txs]
+        chunks = iter_columnar(result["batch"], usd_values, fmt)
+        ext, mimetype = COLUMNAR_FORMATS[fmt]
+        filename = f"transactions.{ext}"
+    else:
+        return jsonify({"error":"不支援的匯出格式"}),400
+
+    # 以 generator 串流回應，不在記憶體中組出整份檔案
+    return Response(chunks, mimetype=mimetype,
+                    headers={"Content-Disposition":f"attachment; filename={filename}"})
+
+@app.route("/jobs/<job_id>")
+def job_page(job_id):
+    """ 背景工作的進度頁面 (輪詢 /jobs/<job_id>/status，完成後轉到結果頁)。 """
+    job = job_manager.get(job_id)
+    if job is None:
+        return render_template("index.html", form=QueryForm(), error="找不到背景工作或已過期"), 404
+    return render_template("job.html", job=job.to_dict())
+
+@app.route("/jobs/<job_id>/status")
+@limiter.exempt
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    data = job.to_dict()
+    if job.status == DONE:
+        data["result_url"] = url_for("job_result", job_id=job_id)
+    return jsonify(data)
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    """ 顯示背景工作的結果，並設為目前 session 的查詢結果 (之後可用 /graph、/export)。 """
+    job = job_manager.get(job_id)
+    if job is None:
+        return render_template("index.html", form=QueryForm(), error="找不到背景工作或已過期"), 404
+    if job.status == FAILED:
+        return render_template("index.html", form=QueryForm(), error=job.error)
+    if job.status != DONE:
+        return redirect(url_for("job_page", job_id=job_id))
+    result = result_cache.get(job.result)
+    if result is None:
+        return render_template("index.html", form=QueryForm(), error="查詢結果已過期，請重新查詢"), 410
+    return show_result(job.result, result, QueryForm())
+
+@app.route("/metrics")
+@limiter.exempt
+def metrics_endpoint():
+    """ Prometheus 文字格式的指標 (各階段耗時、各路由延遲、外部 API 呼叫與快取命中)。 """
+    if not METRICS_ENABLED:
+        return jsonify({"error": "metrics disabled"}), 404
+    return Response(pipeline_metrics.metrics.render(),
+                    mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/cache_stats")
+def cache_stats():
+    """ 查詢結果快取的命中率與淘汰統計。 """
+    return jsonify(result_cache.stats())
+
+# 每個查詢結果保留的表格檢視 (排序 + 篩選後的列順序) 數
+TABLE_VIEWS_PER_RESULT = 8
+TABLE_MAX_LIMIT = 500
+
+def _encode_cursor(offset, view_key):
+    raw = json.dumps({"o": offset, "v": view_key}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_cursor(cursor, view_key):
+    """ 回傳 cursor 對應的列位移；格式錯誤或屬於其他排序/篩選條件時拋出 ValueError。 """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(data["o"])
+    except Exception:
+        raise ValueError("cursor 格式錯誤")
+    if data.get("v") != view_key or offset < 0:
+        raise ValueError("cursor 與目前的排序或篩選條件不符")
+    return offset
+
+def table_view(result, sort, descending, text, min_value, max_value, direction, anomalies_only):
+    """
+    取得 (或建立) 結果表格的列順序。同一查詢結果以相同條件翻頁時直接沿用，
+    每頁只需切片，不再重新篩選與排序。回傳 (view_key, rows)。
+    """
+    params = [sort, descending, text, min_value, max_value, direction, anomalies_only]
+    view_key = hashlib.sha1(json.dumps(params).encode("utf-8")).hexdigest()[:16]
+    views = result.setdefault("table_views", {})
+    rows = views.get(view_key)
+    if rows is None:
+        flagged = None
+        if anomalies_only:
+            flagged = np.isin(result["batch"].hashes,
+                              np.asarray([a["hash"] for a in result["anomalies"]], dtype=object))
+        with stage("table_view"):
+            rows = table_order(result["batch"], result["usd_values"], result["address"],
+                               sort, descending, text, min_value, max_value, direction, flagged)
+        if len(views) >= TABLE_VIEWS_PER_RESULT:
+            views.pop(next(iter(views)))
+        views[view_key] = rows
+    return view_key, rows
+
+@app.route("/api/transactions")
+@limiter.limit("120 per minute")
+def api_transactions():
+    """
+    目前查詢結果的交易表格 (JSON，cursor 分頁)。
+
+    參數：
+      - limit: 每頁筆數 (預設 25，最多 500)
+      - cursor: 上一次回應的 next_cursor / prev_cursor；不帶時從第一頁開始
+      - sort: time / value / usd_value / counterparty；order: desc (預設) / asc
+      - q: 交易哈希或地址的部分字串；min_value / max_value: 原生幣金額範圍
+      - direction: in / out；anomalies=1 只列出異常交易
+    """
+    result = get_current_result()
+    if not result or not result.get("transactions"):
+        return jsonify({"error": "無交易資料"}), 404
+
+    args = request.args
+    sort = args.get("sort", "time")
+    if sort not in SORT_FIELDS:
+        return jsonify({"error": f"不支援的排序欄位: {sort}"}), 400
+    descending = args.get("order", "desc").lower() != "asc"
+    text = args.get("q", "").strip().lower() or None
+    direction = args.get("direction") or None
+    anomalies_only = args.get("anomalies", "").lower() in ("1", "true", "on")
+    try:
+        limit = min(max(int(args.get("limit", 25)), 1), TABLE_MAX_LIMIT)
+        min_value = float(args["min_value"]) if args.get("min_value") else None
+        max_value = float(args["max_value"]) if args.get("max_value") else None
+    except ValueError:
+        return jsonify({"error": "參數格式錯誤"}), 400
+
+    view_key, rows = table_view(result, sort, descending, text, min_value, max_value,
+                                direction, anomalies_only)
+    offset = 0
+    if args.get("cursor"):
+        try:
+            offset = _decode_cursor(args["cursor"], view_key)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    anomaly_types = defaultdict(list)
+    page_rows = rows[offset:offset + limit]
+    transactions = result["transactions"]
+    wanted = {transactions[i]["hash"] for i in page_rows}
+    for anom in result["anomalies"]:
+        if anom["hash"] in wanted:
+            anomaly_types[anom["hash"]].append(anom["type"])
+    items = [dict(transactions[i], anomalies=anomaly_types.get(transactions[i]["hash"], []))
+             for i in page_rows]
+
+    total = len(rows)
+    return jsonify({
+        "transactions": items,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "sort": sort,
+        "order": "desc" if descending else "asc",
+        "next_cursor": _encode_cursor(offset + limit, view_key) if offset + limit < total else None,
+        "prev_cursor": _encode_cursor(max(offset - limit, 0), view_key) if offset > 0 else None,
+    })
+
+@app.route("/api/filter")
+@limiter.limit("120 per minute")
+def api_filter():
+    """
+    以目前查詢結果的篩選索引重新篩選 (不呼叫 API)，新結果設為目前的查詢結果，
+    之後的 /api/transactions、/graph_data、/export 都依新條件。
+
+    參數：min_value / max_value (原生幣金額)、start_date / end_date (YYYY-MM-DD，含當日)、
+    direction (all / in / out)。
+    """
+    result = get_current_result()
+    if not result or result.get("source") is None:
+        return jsonify({"error": "無交易資料"}), 404
+    args = request.args
+    direction = args.get("direction", "all")
+    if direction not in DIRECTIONS:
+        return jsonify({"error": f"不支援的流向: {direction}"}), 400
+    try:
+        filters = {
+            "min_val": float(args.get("min_value") or 0.0),
+            "max_val": float(args["max_value"]) if args.get("max_value") else None,
+            "start_date": parse_date(args.get("start_date")),
+            "end_date": parse_date(args.get("end_date")),
+            "direction": direction,
+        }
+    except ValueError:
+        return jsonify({"error": "參數格式錯誤"}), 400
+
+    started = time.perf_counter()
+    try:
+        refiltered = refilter_result(result, filters)
+    except ChainQueryError as e:
+        return jsonify({"error": str(e), "total": 0}), 404
+    session["result_id"] = result_cache.put(refiltered)
+    summary = refiltered["summary"]
+    return jsonify({
+        "total": len(refiltered["transactions"]),
+        "source_total": len(result["source"]),
+        "summary": {k: summary[k] for k in ("total_in", "total_out", "count_in", "count_out")},
+        "anomalies": len(refiltered["anomalies"]),
+        "filters": {**filters,
+                    "start_date": filters["start_date"].isoformat() if filters["start_date"] else None,
+                    "end_date": filters["end_date"].isoformat() if filters["end_date"] else None},
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    })
 
 @app.route("/graph")
 def graph():
@@ -264,7 +935,8 @@ def graph():
 
 @app.route("/graph_data")
 def graph_data():
-    transactions = session.get("transactions", [])
+    result = get_current_result()
+    transactions = result["transactions"] if result else []
     if not transactions:
         # 若沒有資料，回傳一組假資料方便前端測試
         dummy_data = {
@@ -279,53 +951,61 @@ def graph_data():
                 {"source": "0x333", "target": "0x111", "value": 5}
             ]
         }
-        app.logger.debug("回傳假資料: %s", dummy_data)
+        app.logger.debug("回傳假資料")
         return jsonify(dummy_data)
 
-    # 取得黑名單（全部轉為小寫）
-    blacklisted_set = {addr.lower() for addr in BLACKLISTED_WALLETS}
-    # 強制加入測試用黑名單地址
-    blacklisted_set.add("0xblacklisted")
-
-    nodes_map = {}
-    links = []
-
-    for tx in transactions:
-        f = (tx.get("from", "未知") or "未知").lower()
-        t = (tx.get("to", "未知") or "未知").lower()
-        # 如果 usd_value 不是數字，強制轉換為 0.0
+    # 細節層級 (LOD) 參數：aggregate=1 合併平行邊、top_k / top_nodes 剪枝、format=compact；
+    # max_links：逐筆連線超過此數時才自動改為合併 + top_k
+    def int_arg(name):
+        raw = request.args.get(name)
         try:
-            usd_val = float(tx.get("usd_value", 0))
-        except Exception as e:
-            app.logger.error("轉換 usd_value 失敗，tx=%s, error=%s", tx, e)
-            usd_val = 0.0
-
-        # 排除自連（若 from == to 則不加入連線，但仍可建立節點）
-        if f == t:
-            app.logger.debug("發現自連交易，忽略連線: %s -> %s", f, t)
-        else:
-            links.append({
-                "source": f,
-                "target": t,
-                "value": usd_val
-            })
-
-        if f not in nodes_map:
-            nodes_map[f] = {"id": f, "is_blacklisted": (f in blacklisted_set)}
-        if t not in nodes_map:
-            nodes_map[t] = {"id": t, "is_blacklisted": (t in blacklisted_set)}
-
-    nodes = list(nodes_map.values())
-    ret = {"nodes": nodes, "links": links}
-    app.logger.debug("graph_data 回傳資料: %s", ret)
+            return max(int(raw), 0) if raw else None
+        except ValueError:
+            return None
+
+    with stage("graph_payload"):
+        ret = build_graph_payload(result["batch"], result["usd_values"], get_blacklist(),
+                                  aggregate=request.args.get("aggregate", "0") in ("1", "true"),
+                                  top_k=int_arg("top_k"), top_nodes=int_arg("top_nodes"),
+                                  compact=request.args.get("format") == "compact",
+                                  max_links=int_arg("max_links"))
+    app.logger.debug("graph_data 回傳 %d 個節點、%d 條連線", len(ret["nodes"]), len(ret["links"]))
     return jsonify(ret)
 
+def crawl_graph(blockchain, start_address, hop):
+    """ 跨地址 n-hop 追蹤，回傳 /graph_data_nhop 格式 (另附 stats)。 """
+    try:
+        fanout = int(request.args.get("fanout", NHOP_MAX_FANOUT))
+    except ValueError:
+        fanout = NHOP_MAX_FANOUT
+    fanout = max(1, min(fanout, NHOP_MAX_FANOUT))
+
+    def load_txs(addr):
+        # 每個鄰居地址只同步一頁，已同步過的地址直接讀本地儲存
+        res = load_chain_page(blockchain, addr, 1, 10000, 0.0, None, sync_pages=1,
+                              priority=BACKGROUND)
+        return res["batch"], res["usd_values"]
+
+    crawled = crawl_nhop(start_address, hop, load_txs, fanout=fanout,
+                         max_requests=NHOP_MAX_REQUESTS, time_budget=NHOP_TIME_BUDGET)
+    return {"nodes": node_dicts(crawled["node_ids"]), "links": crawled["links"],
+            "stats": crawled["stats"]}
+
+def node_dicts(node_ids):
+    """ 地址字典 id => 前端節點 (每個地址都做 is_blacklisted 判斷，以 id 查表)。 """
+    node_ids = np.asarray(node_ids, dtype=np.int64)
+    flags = get_blacklist().contains_ids(node_ids).tolist()
+    addresses = get_address_book().address_strings(node_ids)
+    return [{"id": addr, "is_blacklisted": f} for addr, f in zip(addresses, flags)]
+
 @app.route("/graph_data_nhop")
 def graph_data_nhop():
     """
     以 session["address"] 為起點，做 n-hop BFS (含 from->to / to->from 都視為相鄰)。
-    只在 session["transactions"] 中尋找，不會額外呼叫區塊鏈 API。
-    若要真正跨地址查詢，需要在 BFS 過程打 API。
+    預設只走目前查詢結果 (result_cache) 中的交易 (已套用金額 / 日期 / 方向篩選)，不會額外呼叫區塊鏈 API。
+    scope=index 時改走整個地址圖索引 (包含其他查詢、追蹤與篩查載入過的所有邊)。
+    crawl=1 時改為跨地址追蹤：每一層並行抓取鄰居地址的交易 (經本地交易儲存快取)，
+    並受 fanout / 請求數 / 時間上限限制。
     """
     # 讀取 hop 參數
     hop_str = request.args.get("hop", "1")
@@ -341,77 +1021,130 @@ def graph_data_nhop():
     if not start_address:
         return jsonify({"error":"no start address in session"}), 400
 
-    txs = session.get("transactions", [])
+    result = get_current_result()
+    txs = result["transactions"] if result else []
     if not txs:
         return jsonify({"error":"no transactions in session"}), 400
 
-    # 建立鄰接表 adjacency: { addr: set([addr2, addr3, ...]) }
-    # 以及 links_map: 用於記錄 (a,b) => 該筆交易(USD, time?)
-    from collections import defaultdict
-    adjacency = defaultdict(set)
-    links_map = defaultdict(list)
-
-    for tx in txs:
-        f = tx.get("from","").lower()
-        t = tx.get("to","").lower()
-        val = tx.get("usd_value", 0.0)
-        # 雙向紀錄 => BFS 方便
-        adjacency[f].add(t)
-        adjacency[t].add(f)
-        # 儲存連線資訊 (可能多筆)
-        links_map[(f,t)].append(tx)
-        links_map[(t,f)].append(tx)  # 不一定要雙向都加，但若想顯示 2 向交易可保留
-
-    # BFS
-    from collections import deque
-    visited = set()
-    queue = deque()
-    queue.append((start_address.lower(), 0))
-    visited.add(start_address.lower())
-
-    # 要收集的 "nodes" 和 "links"
-    nodes_set = set()
+    crawl = request.args.get("crawl", "0").lower() in ("1", "true")
+    blockchain = result.get("blockchain")
+    if crawl and blockchain in BLOCKCHAIN_APIS:
+        return jsonify(crawl_graph(blockchain, start_address, hop))
+
+    # 從地址圖索引 (CSR) 取 n-hop 鄰域；預設只走目前結果中的交易
+    whole_index = request.args.get("scope") == "index"
+    chains = list(BLOCKCHAIN_APIS) if blockchain == "all" else [blockchain]
+    node_ids = []
     edges = []
+    for chain in chains:
+        index = graph_indexes.get(chain)
+        allowed = None if whole_index else index.edge_ids(result["batch"].hashes)
+        nodes, edge_ids = index.neighborhood_ids(start_address, hop, edge_ids=allowed)
+        node_ids.append(nodes)
+        edges.extend(index.edge_dicts(edge_ids))
+
+    nodes = np.unique(np.concatenate(node_ids)) if node_ids else []
+    return jsonify({"nodes": node_dicts(nodes), "links": edges})
+
+@app.route("/graph_path")
+def graph_path():
+    """
+    地址圖索引上的路徑查詢：
+      - target: 終點地址 (必填)；source 預設為 session["address"]
+      - mode=shortest (預設)：最短路徑；mode=all：max_hops 內所有有向路徑 (最多 limit 條)
+      - chain: 預設為目前查詢的鏈
+    """
+    source = (request.args.get("source") or session.get("address") or "").lower()
+    target = (request.args.get("target") or "").lower()
+    if not source or not target:
+        return jsonify({"error":"source 與 target 為必填"}), 400
+    chain = request.args.get("chain") or session.get("current_blockchain") or "ethereum"
+    if chain not in BLOCKCHAIN_APIS:
+        return jsonify({"error":"不支援的區塊鏈"}), 400
+    try:
+        max_hops = max(1, min(int(request.args.get("max_hops", 4)), 8))
+        limit = max(1, min(int(request.args.get("limit", 100)), 1000))
+    except ValueError:
+        return jsonify({"error":"max_hops / limit 需為整數"}), 400
+
+    index = graph_indexes.get(chain)
+    if request.args.get("mode", "shortest") == "all":
+        paths = index.all_paths(source, target, max_hops=max_hops, limit=limit)
+    else:
+        path = index.shortest_path(source, target, max_hops=max_hops,
+                                   directed=request.args.get("directed", "1") != "0")
+        paths = [path] if path else []
+    return jsonify({"paths": [index.edge_dicts(p) for p in paths]})
+
+
+@app.route("/taint")
+@limiter.limit("30 per minute")
+def taint():
+    """
+    污點傳播：從黑名單地址 (與異常偵測、關聯圖相同的黑名單) 出發，沿地址圖索引依時間順序
+    計算資金流到各地址的污點金額。
+      - model: haircut (預設) / poison / fifo
+      - target: 要查看的地址，預設為 session["address"]；source: 以逗號分隔的起點，預設為黑名單
+      - chain: 預設為目前查詢的鏈；max_hops: 最多追蹤的跳數；top: 回傳污點最多的前幾個地址
+    """
+    chain = request.args.get("chain") or session.get("current_blockchain") or "ethereum"
+    if chain not in BLOCKCHAIN_APIS:
+        return jsonify({"error":"不支援的區塊鏈"}), 400
+    model = request.args.get("model", "haircut")
+    if model not in TAINT_MODELS:
+        return jsonify({"error":f"不支援的污點模型: {model}"}), 400
+    # 未指定 max_hops 時用 TAINT_MAX_HOPS (0 為不限)；有指定時必須 >= 1
+    hops_arg = request.args.get("max_hops")
+    try:
+        max_hops = int(hops_arg) if hops_arg is not None else (TAINT_MAX_HOPS or None)
+        top = max(1, min(int(request.args.get("top", 20)), 500))
+    except ValueError:
+        return jsonify({"error":"max_hops / top 需為整數"}), 400
+    if hops_arg is not None and max_hops < 1:
+        return jsonify({"error":"max_hops 需大於 0"}), 400
+
+    index = graph_indexes.get(chain)
+    book = get_address_book()
+    sources = [a.strip() for a in request.args.get("source", "").split(",") if a.strip()]
+    if sources:
+        seed_ids = book.lookup_many(sources)
+    else:
+        nodes = index.active_nodes()
+        seed_ids = nodes[get_blacklist().contains_ids(nodes)]
+    seed_ids = seed_ids[seed_ids >= 0]
+
+    with stage("taint"):
+        result, cached = cached_taint(index, seed_ids, model, max_hops, TAINT_MAX_LOTS)
+
+    target = (request.args.get("target") or session.get("address") or "").lower()
+    target_report = None
+    if target:
+        target_report = {"address": target, **result.report(result.position(book.lookup(target)))}
 
-    # 每個地址都做 is_blacklisted 判斷
-    black_set = {b.lower() for b in BLACKLISTED_WALLETS}
-    black_set.add("0xblacklisted")
-
-    while queue:
-        current, depth = queue.popleft()
-        # 加入 nodes_set
-        nodes_set.add(current)
-
-        if depth >= hop:
-            continue
-
-        # 取得下一層鄰居
-        neighbors = adjacency[current]
-        for nb in neighbors:
-            if nb not in visited:
-                visited.add(nb)
-                queue.append((nb, depth+1))
-
-            # 找出 current->nb 的交易 link
-            if (current, nb) in links_map:
-                for tx in links_map[(current, nb)]:
-                    # 預設以 usd_value 做 link value
-                    edges.append({
-                        "source": current,
-                        "target": nb,
-                        "value": tx.get("usd_value", 0.0),
-                        "time": tx.get("time", "未知")
-                    })
-
-    # 整理 nodes
-    nodes_list = []
-    for addr in nodes_set:
-        nodes_list.append({
-            "id": addr,
-            "is_blacklisted": (addr in black_set)
-        })
-
-    return jsonify({"nodes": nodes_list, "links": edges})
+    # 污點金額最大的邊；taint_usd 依該筆交易的 USD 金額按比例換算
+    order = np.argsort(-result.edge_taint, kind="stable")[:top * 5]
+    edge_ids, edge_taint = result.edge_ids[order], result.edge_taint[order]
+    # 節點：污點最多的前 top 個地址，加上這些邊的兩端 (與 /graph_data_nhop 相同格式，可直接合併到圖上)
+    top_ids = result.node_ids[result.top(top)]
+    node_ids = np.concatenate([top_ids, np.setdiff1d(
+        np.concatenate([index.src[edge_ids], index.dst[edge_ids]]), top_ids)])
+    nodes = [{**n, **result.report(result.position(i))}
+             for n, i in zip(node_dicts(node_ids), node_ids.tolist())]
+    links = index.edge_dicts(edge_ids)
+    ratios = edge_taint / np.maximum(index.value[edge_ids], 1e-18)
+    for link, t, r in zip(links, edge_taint.tolist(), ratios.tolist()):
+        link["taint"] = t
+        link["taint_usd"] = round(link["value"] * min(r, 1.0), 2)
+    return jsonify({
+        "model": model,
+        "chain": chain,
+        "seeds": len(result.seed_ids),
+        "target": target_report,
+        "nodes": nodes,
+        "links": links,
+        "stats": {"edges_scanned": result.edges_scanned, "tainted_edges": len(result.edge_ids),
+                  "seconds": round(result.seconds, 3), "cached": cached},
+    })
 
 
 if __name__=="__main__":
@@ -0,0 +1,280 @@
+# benchmarks/load_test.py
+"""
+壓力測試：模擬多個並行使用者依序呼叫 / (查詢)、/api/transactions、/graph_data、/graph_data_nhop、/export，
+輸出各端點的吞吐量與 p50 / p95 / p99 延遲 (JSON)。
+
+用法：
+    # 在本行程內啟動替身伺服器與 app (關閉 IP 限流)，適合發版前的容量評估
+    python -m benchmarks.load_test --users 8 --duration 60 --rows 10000 --latency-ms 150 --rate-limit 5 --keys 3
+
+    # 對已部署的 app 施壓 (需自行以 *_API_URL / COINGECKO_API_URL 指向替身伺服器並設定 RATELIMIT_ENABLED=0)
+    python -m benchmarks.load_test --target http://127.0.0.1:8000 --users 16 --duration 120
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+from benchmarks.standin_server import StandInServer
+
+ENDPOINTS = ["query", "transactions", "graph_data", "graph_data_nhop", "export"]
+_CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def app_environment(workdir):
+    """
+    在本行程內執行 app 時的環境變數：不需要真的 API Key，本地儲存放到 workdir。
+    須在第一次 import app 之前設定 (config 於 import 時讀取)。
+    """
+    env = {key: "loadtest" for key in ("ETHERSCAN_API_KEY", "BSCSCAN_API_KEY", "POLYGONSCAN_API_KEY")}
+    env.update(GRAPH_INDEX_DIR="", ADDRESS_BOOK_PATH="",
+               BLACKLIST_DB_PATH=os.path.join(workdir, "blacklist.npy"))
+    return env
+
+
+def make_addresses(n, seed=0):
+    rng = random.Random(seed)
+    return ["0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40)) for _ in range(n)]
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    arr = np.asarray(latencies)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"p50": round(float(p50), 4), "p95": round(float(p95), 4), "p99": round(float(p99), 4),
+            "mean": round(float(arr.mean()), 4), "max": round(float(arr.max()), 4)}
+
+
+class VirtualUser:
+    """ 一個使用者 (獨立的 cookie / session)：查詢一個地址、載入表格後看圖、n-hop 追蹤並匯出。 """
+
+    def __init__(self, base_url, addresses, chain, hop, export_format, rng, record, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.addresses = addresses
+        self.chain = chain
+        self.hop = hop
+        self.export_format = export_format
+        self.rng = rng
+        self.record = record
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.csrf_token = None
+
+    def _timed(self, name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = self.session.request(method, self.base_url + path, timeout=self.timeout,
+                                        stream=True, **kwargs)
+            size = sum(len(chunk) for chunk in resp.iter_content(64 * 1024))
+            ok = resp.status_code == 200
+        except requests.RequestException:
+            resp, size, ok = None, 0, False
+        self.record(name, time.perf_counter() - start, ok, size)
+        return resp
+
+    def login(self):
+        resp = self.session.get(self.base_url + "/", timeout=self.timeout)
+        match = _CSRF_RE.search(resp.text)
+        self.csrf_token = match.group(1) if match else None
+
+    def iteration(self):
+        address = self.rng.choice(self.addresses)
+        form = {"blockchain": self.chain, "address": address, "min_value": "0", "page": "1"}
+        if self.csrf_token:
+            form["csrf_token"] = self.csrf_token
+        self._timed("query", "POST", "/", data=form)
+        # 結果頁載入後向 /api/transactions 取第一頁表格
+        self._timed("transactions", "GET", "/api/transactions?limit=25")
+        self._timed("graph_data", "GET", "/graph_data")
+        self._timed("graph_data_nhop", "GET", f"/graph_data_nhop?hop={self.hop}")
+        export = {"format": self.export_format}
+        if self.csrf_token:
+            export["csrf_token"] = self.csrf_token
+        self._timed("export", "POST", "/export", data=export)
+
+
+def run_load(base_url, users=4, duration=None, iterations=1, addresses=None, chain="ethereum",
+             hop=2, export_format="csv", seed=0, timeout=120):
+    """
+    以 users 個執行緒並行施壓。duration (秒) 不為 None 時持續到時間結束，
+    否則每個使用者執行 iterations 輪。回傳各端點的統計 dict。
+    """
+    addresses = addresses or make_addresses(20, seed)
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    sizes = defaultdict(int)
+    lock = threading.Lock()
+
+    def record(name, elapsed, ok, size):
+        with lock:
+            samples[name].append(elapsed)
+            sizes[name] += size
+            if not ok:
+                errors[name] += 1
+
+    deadline = time.perf_counter() + duration if duration else None
+
+    def user_loop(index):
+        user = VirtualUser(base_url, addresses, chain, hop, export_format,
+                           random.Random(seed * 1000 + index), record, timeout)
+        user.login()
+        done = 0
+        while (deadline is not None and time.perf_counter() < deadline) or \
+                (deadline is None and done < iterations):
+            user.iteration()
+            done += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user_loop, args=(i,), name=f"user-{i}") for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name in ENDPOINTS:
+        count = len(samples[name])
+        endpoints[name] = {"requests": count, "errors": errors[name],
+                           "throughput_rps": round(count / elapsed, 3) if elapsed else None,
+                           "bytes": sizes[name], **percentiles(samples[name])}
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "users": users,
+        "seconds": round(elapsed, 3),
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": round(total / elapsed, 3) if elapsed else None,
+        "latency": percentiles([x for name in ENDPOINTS for x in samples[name]]),
+        "endpoints": endpoints,
+    }
+
+
+class InProcessApp:
+    """
+    在本行程內啟動替身伺服器與 app (werkzeug 多執行緒伺服器)：
+    外部 API 端點指向替身伺服器、關閉 IP 限流、交易儲存 / 匯率 / 圖索引改用暫存目錄，
+    API 金鑰池換成 keys 把假金鑰 (每把每秒 key_rate 次)。結束時還原並刪除暫存目錄。
+    """
+
+    def __init__(self, server, keys=1, key_rate=5.0):
+        self.server = server
+        self.keys = keys
+        self.key_rate = key_rate
+        self.base_url = None
+
+    def __enter__(self):
+        from werkzeug.serving import make_server
+
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="loadtest-", ignore_cleanup_errors=True)
+        tmp = self._tmpdir.name
+        # 只補上未設定的環境變數，結束時移除
+        self._added_env = []
+        for key, value in app_environment(tmp).items():
+            if key not in os.environ:
+                os.environ[key] = value
+                self._added_env.append(key)
+
+        import app as app_module
+        from models.graph_index import GraphIndexRegistry
+        from services.price_history import PriceHistory
+        from services.tx_store import TransactionStore
+        from services.upstream import KeyPool
+
+        self.app_module = app_module
+        names = ("BLOCKCHAIN_APIS", "COINGECKO_API_URL", "tx_store", "price_history",
+                 "graph_indexes", "api_key_pools")
+        self._saved = {n: getattr(app_module, n) for n in names}
+        self._saved_limiter = app_module.limiter.enabled
+        app_module.BLOCKCHAIN_APIS = {c: self.server.explorer_url(c) for c in self._saved["BLOCKCHAIN_APIS"]}
+        app_module.COINGECKO_API_URL = self.server.coingecko_url
+        app_module.tx_store = TransactionStore(os.path.join(tmp, "tx_store.sqlite3"))
+        app_module.price_history = PriceHistory(os.path.join(tmp, "prices.sqlite3"),
+                                                base_url=self.server.coingecko_url)
+        app_module.graph_indexes = GraphIndexRegistry(None)
+        app_module.api_key_pools = {
+            c: KeyPool(c, [f"loadtest-{c}-{i}" for i in range(self.keys)], rate=self.key_rate,
+                       burst=max(1, int(self.key_rate)), retry_backoff=0.2)
+            for c in self._saved["api_key_pools"]
+        }
+        app_module.limiter.enabled = False
+        app_module.cache.clear()
+        self._httpd = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="loadtest-app", daemon=True)
+        self._thread.start()
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_port}"
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        for name, value in self._saved.items():
+            setattr(self.app_module, name, value)
+        self.app_module.limiter.enabled = self._saved_limiter
+        for key in self._added_env:
+            os.environ.pop(key, None)
+        self._tmpdir.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="金流追查系統壓力測試")
+    parser.add_argument("--target", help="已部署的 app 網址；未指定時在本行程內啟動 app 與替身伺服器")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--duration", type=float, help="施壓秒數 (未指定時每個使用者跑 --iterations 輪)")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--addresses", type=int, default=20, help="輪流查詢的地址數")
+    parser.add_argument("--chain", default="ethereum")
+    parser.add_argument("--hop", type=int, default=2)
+    parser.add_argument("--export-format", default="csv")
+    parser.add_argument("--rows", type=int, default=10000, help="替身伺服器每個地址的交易筆數")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=5, help="替身伺服器每把金鑰每秒次數")
+    parser.add_argument("--keys", type=int, default=1, help="app 使用的假 API 金鑰數")
+    parser.add_argument("--key-rate", type=float, default=5, help="app 端每把金鑰每秒次數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果 JSON 路徑")
+    args = parser.parse_args(argv)
+
+    addresses = make_addresses(args.addresses, args.seed)
+    load_args = dict(users=args.users, duration=args.duration, iterations=args.iterations,
+                     addresses=addresses, chain=args.chain, hop=args.hop,
+                     export_format=args.export_format, seed=args.seed)
+    if args.target:
+        report = run_load(args.target, **load_args)
+    else:
+        server = StandInServer(rows=args.rows, latency=args.latency_ms / 1000,
+                               jitter=args.jitter_ms / 1000, error_rate=args.error_rate,
+                               rate_limit=args.rate_limit, seed=args.seed)
+        with server, InProcessApp(server, keys=args.keys, key_rate=args.key_rate) as target:
+            report = run_load(target.base_url, **load_args)
+            report["upstream"] = dict(server.stats)
+    report["config"] = vars(args)
+
+    print(f"{report['requests']} 個請求 / {report['seconds']}s = {report['throughput_rps']} req/s，"
+          f"錯誤 {report['errors']}")
+    for name, stats in report["endpoints"].items():
+        print(f"  {name:<16} n={stats['requests']:<5} err={stats['errors']:<4} "
+              f"p50={stats['p50']}s p95={stats['p95']}s p99={stats['p99']}s")
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+        print(f"結果已寫入 {args.output}")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
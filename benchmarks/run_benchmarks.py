@@ -0,0 +1,263 @@
+# benchmarks/run_benchmarks.py
+"""
+效能基準測試：以合成的 txlist 資料量測各處理階段的耗時與記憶體峰值，結果輸出為 JSON。
+
+用法：
+    python -m benchmarks.run_benchmarks --rows 10000,100000,1000000
+    python -m benchmarks.run_benchmarks --rows 10000 --baseline benchmarks/results/舊版.json
+
+--baseline 會比對同一資料量、同一階段的耗時，超過 --threshold 倍即視為退步 (結束碼 1)。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import date
+
+import numpy as np
+
+from benchmarks.synthetic import generate_txlist
+from models.data_processing import analyze_transactions
+from models.graph_index import GraphIndexRegistry
+from models.tx_batch import TransactionBatch
+from services.tx_filter import filter_transactions, FilterIndex
+
+STAGES = ["index_filter", "filter_transactions", "refilter", "analyze_transactions", "detect_anomalies",
+          "graph_data", "graph_data_nhop", "export_csv", "export_npz"]
+USD_PRICE = 2000.0
+
+
+def bench_environment(workdir):
+    """
+    不需要真的呼叫 API：假的 Key，本地儲存放到 workdir。
+    須在第一次 import app / config 之前設定 (於 import 時讀取)。
+    """
+    env = {key: "benchmark" for key in ("ETHERSCAN_API_KEY", "BSCSCAN_API_KEY", "POLYGONSCAN_API_KEY")}
+    env.update(TX_STORE_PATH=os.path.join(workdir, "tx_store.sqlite3"),
+               PRICE_HISTORY_PATH=os.path.join(workdir, "prices.sqlite3"),
+               GRAPH_INDEX_DIR="", ADDRESS_BOOK_PATH="",
+               BLACKLIST_DB_PATH=os.path.join(workdir, "blacklist.npy"))
+    return env
+
+
+def parse_rows(text):
+    """ "10k,100k,1M" => [10000, 100000, 1000000] """
+    sizes = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        scale = {"k": 1000, "m": 1000000}.get(part[-1], 1)
+        sizes.append(int(float(part.rstrip("km")) * scale))
+    return sizes
+
+
+def measure(fn, repeat=3):
+    """
+    先不追蹤記憶體執行 repeat 次量測耗時，再以 tracemalloc 執行一次取得記憶體峰值
+    (tracemalloc 會拖慢 Python 程式碼，兩者分開量)。
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds_min": round(min(times), 6),
+        "seconds_median": round(statistics.median(times), 6),
+        "peak_mb": round(peak / 2 ** 20, 3),
+    }
+
+
+class FlaskHarness:
+    """ 以 Flask test client 呼叫實際路由；查詢結果直接放入 result_cache，不經過 index()。 """
+
+    def __init__(self, app_module, data, batch, usd_values):
+        flask_app = app_module.app
+        flask_app.config["TESTING"] = True
+        flask_app.config["WTF_CSRF_ENABLED"] = False
+        app_module.limiter.enabled = False
+        app_module.graph_indexes = GraphIndexRegistry(None)
+        app_module.graph_indexes.get("ethereum").add_batch(batch, usd_values)
+        self.client = flask_app.test_client()
+        result_id = app_module.result_cache.put({
+            "transactions": batch.to_records(usd_values),
+            "batch": batch,
+            "usd_values": usd_values,
+            "address": data["wallet"],
+            "blockchain": "ethereum",
+            "usd_price": USD_PRICE,
+        })
+        with self.client.session_transaction() as sess:
+            sess["result_id"] = result_id
+            sess["address"] = data["wallet"]
+            sess["current_blockchain"] = "ethereum"
+
+    def get(self, path):
+        resp = self.client.get(path)
+        assert resp.status_code == 200, f"{path}: {resp.status_code}"
+        return resp.get_data()
+
+    def post_stream(self, path, data):
+        resp = self.client.post(path, data=data)
+        assert resp.status_code == 200, f"{path}: {resp.status_code}"
+        return sum(len(chunk) for chunk in resp.response)
+
+
+def run_suite(rows_list, stages=None, repeat=3, generator_args=None, log=print):
+    """ 對每個資料量執行各階段量測，回傳可序列化為 JSON 的結果 dict。 """
+    # app / config 於 import 時讀取環境變數，main() 設定好暫存目錄後才載入
+    import app as app_module
+    from models.anomaly_detection import detect_anomalies
+    from services import blacklist as blacklist_module
+
+    stages = stages or STAGES
+    results = []
+    # 量測時會替換共用的圖索引、黑名單與限流設定，結束後還原
+    saved = (app_module.graph_indexes, blacklist_module._default, app_module.limiter.enabled)
+    workdir = tempfile.TemporaryDirectory(prefix="bench-")
+    try:
+        for rows in rows_list:
+            started = time.perf_counter()
+            data = generate_txlist(rows, **(generator_args or {}))
+            raw = data["result"]
+            log(f"[{rows}] 產生資料 {time.perf_counter() - started:.2f}s")
+
+            # 黑名單比對器改用合成資料的黑名單，模擬實際的命中率
+            feed = os.path.join(workdir.name, f"blacklist-{rows}.txt")
+            with open(feed, "w") as fh:
+                fh.write("\n".join(data["blacklist"]))
+            blacklist_module._default = blacklist_module.BlacklistMatcher(
+                None, feeds=[feed], extra=["0xblacklisted"], check_interval=3600)
+
+            batch = TransactionBatch.from_raw(raw)
+            usd_values = batch.usd_values(USD_PRICE)
+            wallet = data["wallet"]
+            harness = None
+            if any(s in stages for s in ("graph_data", "graph_data_nhop", "export_csv", "export_npz")):
+                harness = FlaskHarness(app_module, data, batch, usd_values)
+
+            def index_filter():
+                # 與 load_chain_page / index() 相同：解析、依金額篩選、轉回顯示用 dict
+                b = TransactionBatch.from_raw(raw)
+                mask = b.value_mask(0.01, None)
+                return b.take(mask).to_records(b.usd_values(USD_PRICE)[mask])
+
+            # 已建好的篩選索引上改變條件 (日期範圍 + 金額 + 流向)，不含建立索引的時間
+            filter_index = FilterIndex(batch, wallet, usd_values)
+            mid = date.fromtimestamp(int(np.median(batch.timestamps))) if len(batch) else None
+
+            stage_funcs = {
+                "index_filter": index_filter,
+                "refilter": lambda: filter_index.select(0.01, None, mid, None, "in"),
+                "filter_transactions": lambda: filter_transactions(raw, wallet, min_val=0.01),
+                "analyze_transactions": lambda: analyze_transactions(batch, wallet),
+                "detect_anomalies": lambda: detect_anomalies(batch),
+                "graph_data": lambda: harness.get("/graph_data"),
+                "graph_data_nhop": lambda: harness.get("/graph_data_nhop?hop=2"),
+                "export_csv": lambda: harness.post_stream("/export", {"format": "csv"}),
+                "export_npz": lambda: harness.post_stream("/export", {"format": "npz"}),
+            }
+            for stage in stages:
+                stats = measure(stage_funcs[stage], repeat=repeat)
+                results.append({"rows": rows, "stage": stage, **stats})
+                log(f"[{rows}] {stage:<22} {stats['seconds_median'] * 1000:10.1f} ms"
+                    f"  peak {stats['peak_mb']:9.1f} MB")
+    finally:
+        app_module.graph_indexes, blacklist_module._default, app_module.limiter.enabled = saved
+        workdir.cleanup()
+
+    return {"meta": environment_info(repeat, generator_args), "results": results}
+
+
+def environment_info(repeat, generator_args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "generator": generator_args or {},
+    }
+
+
+def compare(current, baseline, threshold=1.2):
+    """ 回傳耗時 (中位數) 超過基準 threshold 倍的 (rows, stage, 比值) list。 """
+    base = {(r["rows"], r["stage"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in current["results"]:
+        old = base.get((r["rows"], r["stage"]))
+        if not old or old["seconds_median"] <= 0:
+            continue
+        ratio = r["seconds_median"] / old["seconds_median"]
+        if ratio > threshold:
+            regressions.append((r["rows"], r["stage"], round(ratio, 2)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="交易處理各階段的效能基準測試")
+    parser.add_argument("--rows", default="10k,100k", help="資料量，逗號分隔 (例如 10k,100k,1M)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="要量測的階段，逗號分隔")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="結果 JSON 路徑，預設 benchmarks/results/<commit>.json")
+    parser.add_argument("--baseline", help="比對用的舊結果 JSON")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    parser.add_argument("--counterparties", type=int, help="交易對手地址數")
+    parser.add_argument("--blacklist-rate", type=float, default=0.01)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--cluster-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"未知的階段: {', '.join(sorted(unknown))}")
+    generator_args = {"counterparties": args.counterparties, "blacklist_rate": args.blacklist_rate,
+                      "clusters": args.clusters, "cluster_ratio": args.cluster_ratio,
+                      "seed": args.seed}
+
+    with tempfile.TemporaryDirectory(prefix="bench-", ignore_cleanup_errors=True) as workdir:
+        for key, value in bench_environment(workdir).items():
+            os.environ.setdefault(key, value)
+        report = run_suite(parse_rows(args.rows), stages, args.repeat, generator_args)
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"{report['meta']['commit'] or 'local'}.json")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    print(f"結果已寫入 {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(report, json.load(fh), args.threshold)
+        for rows, stage, ratio in regressions:
+            print(f"退步: [{rows}] {stage} 為基準的 {ratio} 倍")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
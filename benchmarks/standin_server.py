@@ -0,0 +1,234 @@
+# benchmarks/standin_server.py
+"""
+本地替身伺服器：模擬 Etherscan 系列 txlist API 與 Coingecko 價格 API，供離線壓力測試。
+
+端點：
+    /<chain>/api?module=account&action=txlist&address=...   (ethereum / bsc / polygon)
+    /api/v3/simple/price?ids=...&vs_currencies=usd
+    /api/v3/coins/<id>/market_chart/range?vs_currency=usd&from=...&to=...
+    /_stats                                                    (各類請求計數)
+
+用法：
+    python -m benchmarks.standin_server --port 8545 --rows 10000 --latency-ms 200 --rate-limit 5
+    ETHERSCAN_API_URL=http://127.0.0.1:8545/ethereum/api COINGECKO_API_URL=http://127.0.0.1:8545/api/v3 \\
+        gunicorn -w 4 app:app
+
+交易資料預設以 benchmarks.synthetic 依地址產生 (同一地址每次相同)；
+--recorded 可指定錄製的 JSON 檔 ({"地址": [txlist 項目, ...]})，未錄到的地址仍用合成資料。
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import zlib
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks.synthetic import generate_txlist
+
+CHAINS = ("ethereum", "bsc", "polygon")
+PRICES = {"ethereum": 2000.0, "binancecoin": 300.0, "polygon": 0.8}
+# 與 Etherscan 相同：page * offset 不可超過此值
+RESULT_WINDOW = 10000
+
+
+class StandInServer:
+    """
+    參數：
+      - rows: 每個地址的合成交易筆數
+      - latency / jitter: 每個請求的延遲秒數 (平均值 / 均勻分布的上下幅度)
+      - error_rate: 回傳 HTTP 500 的比例
+      - rate_limit: 每把 API 金鑰每秒可呼叫次數 (0 為不限)；超過時回傳
+        {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+      - recorded: {地址: [txlist 項目]}，優先於合成資料
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, rows=10000, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_limit=0, recorded=None, seed=0):
+        self.rows = rows
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.recorded = {k.lower(): v for k, v in (recorded or {}).items()}
+        self.seed = seed
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._windows = {}     # apikey => (秒, 次數)
+        self._txs = {}         # (chain, address) => txlist (依區塊遞增)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def explorer_url(self, chain):
+        return f"{self.base_url}/{chain}/api"
+
+    @property
+    def coingecko_url(self):
+        return f"{self.base_url}/api/v3"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- 資料 ----------
+    def transactions(self, chain, address):
+        address = address.lower()
+        key = (chain, address)
+        with self._lock:
+            txs = self._txs.get(key)
+        if txs is None:
+            if address in self.recorded:
+                txs = sorted(self.recorded[address], key=lambda tx: int(tx["blockNumber"]))
+            else:
+                seed = zlib.crc32(f"{self.seed}:{chain}:{address}".encode())
+                txs = generate_txlist(self.rows, wallet=address, seed=seed)["result"]
+            with self._lock:
+                self._txs[key] = txs
+        return txs
+
+    def _rate_limited(self, apikey):
+        if not self.rate_limit:
+            return False
+        second = int(time.time())
+        with self._lock:
+            window, count = self._windows.get(apikey, (second, 0))
+            if window != second:
+                window, count = second, 0
+            self._windows[apikey] = (window, count + 1)
+            return count + 1 > self.rate_limit
+
+    def txlist(self, chain, params):
+        address = params.get("address", "")
+        apikey = params.get("apikey", "")
+        if self._rate_limited(apikey):
+            self.stats["rate_limited"] += 1
+            return {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+        startblock = int(params.get("startblock", 0))
+        endblock = int(params.get("endblock", 99999999))
+        page = max(1, int(params.get("page", 1)))
+        offset = max(1, int(params.get("offset", RESULT_WINDOW)))
+        if page * offset > RESULT_WINDOW:
+            return {"status": "0", "message": "NOTOK",
+                    "result": "Result window is too large, PageNo x Offset size must be less than or equal to 10000"}
+        rows = [tx for tx in self.transactions(chain, address)
+                if startblock <= int(tx["blockNumber"]) <= endblock]
+        if params.get("sort") == "desc":
+            rows.reverse()
+        rows = rows[(page - 1) * offset:page * offset]
+        self.stats["txlist_rows"] += len(rows)
+        if not rows:
+            return {"status": "0", "message": "No transactions found", "result": []}
+        return {"status": "1", "message": "OK", "result": rows}
+
+    @staticmethod
+    def price_range(cg_id, start, end):
+        """ 每小時一點的合成價格 (以基準價格正弦擺動)。 """
+        base = PRICES.get(cg_id, 1.0)
+        start = start - start % 3600
+        return [[ts * 1000, round(base * (1 + 0.1 * ((ts // 3600) % 24 - 12) / 12), 4)]
+                for ts in range(start, end + 1, 3600)]
+
+    # ---------- HTTP ----------
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                parts = [p for p in url.path.split("/") if p]
+                if parts == ["_stats"]:
+                    return self._send(200, dict(server.stats))
+
+                delay = server.latency + server._random.uniform(-server.jitter, server.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                if server.error_rate and server._random.random() < server.error_rate:
+                    server.stats["errors"] += 1
+                    return self._send(500, {"error": "injected failure"})
+
+                if len(parts) == 2 and parts[0] in CHAINS and parts[1] == "api" \
+                        and params.get("action") == "txlist":
+                    server.stats["txlist"] += 1
+                    return self._send(200, server.txlist(parts[0], params))
+                if parts == ["api", "v3", "simple", "price"]:
+                    server.stats["simple_price"] += 1
+                    ids = params.get("ids", "").split(",")
+                    return self._send(200, {i: {"usd": PRICES.get(i, 1.0)} for i in ids if i})
+                if len(parts) == 6 and parts[:3] == ["api", "v3", "coins"] and parts[4:] == ["market_chart", "range"]:
+                    server.stats["market_chart"] += 1
+                    points = server.price_range(parts[3], int(float(params.get("from", 0))),
+                                                int(float(params.get("to", 0))))
+                    return self._send(200, {"prices": points})
+                return self._send(404, {"error": "not found"})
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Etherscan / Coingecko 本地替身伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--rows", type=int, default=10000, help="每個地址的合成交易筆數")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="每把金鑰每秒次數，0 為不限")
+    parser.add_argument("--recorded", help="錄製的交易資料 JSON ({地址: [txlist 項目]})")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    recorded = None
+    if args.recorded:
+        with open(args.recorded, encoding="utf-8") as fh:
+            recorded = json.load(fh)
+    server = StandInServer(args.host, args.port, rows=args.rows, latency=args.latency_ms / 1000,
+                           jitter=args.jitter_ms / 1000, error_rate=args.error_rate,
+                           rate_limit=args.rate_limit, recorded=recorded, seed=args.seed)
+    print(f"替身伺服器：{server.base_url}")
+    for chain in CHAINS:
+        print(f"  {chain}: {server.explorer_url(chain)}")
+    print(f"  coingecko: {server.coingecko_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
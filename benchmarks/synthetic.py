@@ -0,0 +1,102 @@
+# benchmarks/synthetic.py
+import numpy as np
+
+# 以太坊約每 12 秒一個區塊；以此由時間戳推回區塊高度
+GENESIS_TS = 1438269973
+BLOCK_TIME = 12
+WEI_PER_NATIVE = 10 ** 18
+
+
+def _random_hex(rng, n, n_bytes):
+    """ n 個 0x 開頭、n_bytes 個隨機 bytes 的 hex 字串。 """
+    raw = rng.integers(0, 256, size=(n, n_bytes), dtype=np.uint8)
+    return ["0x" + row.tobytes().hex() for row in raw]
+
+
+def _timestamps(rng, rows, end_ts, span_days, clusters, cluster_ratio, cluster_spread):
+    """ 一部分交易均勻分布在 span_days 內，其餘集中在 clusters 個爆量時段附近。 """
+    start_ts = end_ts - span_days * 86400
+    ts = rng.integers(start_ts, end_ts, size=rows, dtype=np.int64)
+    if clusters > 0 and cluster_ratio > 0:
+        clustered = rng.random(rows) < cluster_ratio
+        centers = rng.integers(start_ts, end_ts, size=clusters, dtype=np.int64)
+        which = rng.integers(0, clusters, size=int(clustered.sum()))
+        offsets = rng.exponential(cluster_spread, size=len(which)).astype(np.int64)
+        ts[clustered] = np.minimum(centers[which] + offsets, end_ts)
+    return np.sort(ts)
+
+
+def generate_txlist(rows, wallet=None, counterparties=None, fanout_skew=1.2,
+                    blacklist_size=1000, blacklist_rate=0.01, in_ratio=0.5,
+                    span_days=365, clusters=50, cluster_ratio=0.5, cluster_spread=300,
+                    end_ts=1700000000, seed=0):
+    """
+    產生模擬 Etherscan txlist 回應的交易資料 (欄位與字串格式同 API，依區塊遞增)。
+
+    參數：
+      - rows: 交易筆數
+      - wallet: 查詢的錢包地址，預設隨機產生
+      - counterparties: 交易對手地址數 (地址扇出)，預設 rows // 10
+      - fanout_skew: 交易對手的 Zipf 分布參數，越大越集中在少數熱門地址；0 為均勻分布
+      - blacklist_size / blacklist_rate: 黑名單地址數，以及交易對手為黑名單地址的比例
+      - in_ratio: 流入 (to == wallet) 交易比例
+      - span_days / clusters / cluster_ratio / cluster_spread: 時間分布；
+        cluster_ratio 比例的交易集中在 clusters 個時段，與時段起點的間隔呈指數分布 (平均 cluster_spread 秒)
+    回傳：
+      - dict：{"wallet", "blacklist", "result"}，result 為 txlist 的 list[dict]
+    """
+    rng = np.random.default_rng(seed)
+    wallet = (wallet or _random_hex(rng, 1, 20)[0]).lower()
+    n_cp = max(1, counterparties if counterparties is not None else rows // 10)
+    pool = np.asarray(_random_hex(rng, n_cp, 20), dtype=object)
+    blacklist = np.asarray(_random_hex(rng, blacklist_size, 20), dtype=object)
+
+    # 交易對手：Zipf 加權抽樣，再依 blacklist_rate 換成黑名單地址
+    if fanout_skew > 0:
+        weights = 1.0 / np.arange(1, n_cp + 1) ** fanout_skew
+        cp = pool[rng.choice(n_cp, size=rows, p=weights / weights.sum())]
+    else:
+        cp = pool[rng.integers(0, n_cp, size=rows)]
+    if blacklist_size and blacklist_rate > 0:
+        hit = rng.random(rows) < blacklist_rate
+        cp[hit] = blacklist[rng.integers(0, blacklist_size, size=int(hit.sum()))]
+
+    incoming = rng.random(rows) < in_ratio
+    ts = _timestamps(rng, rows, end_ts, span_days, clusters, cluster_ratio, cluster_spread)
+    blocks = (ts - GENESIS_TS) // BLOCK_TIME
+    # 金額：對數常態分布 (原生幣)，少數大額
+    wei = (rng.lognormal(mean=-1.0, sigma=2.0, size=rows) * 1e9).astype(np.int64)
+    hashes = _random_hex(rng, rows, 32)
+    gas_used = rng.integers(21000, 200000, size=rows)
+
+    result = []
+    for i in range(rows):
+        other = cp[i]
+        result.append({
+            "blockNumber": str(blocks[i]),
+            "timeStamp": str(ts[i]),
+            "hash": hashes[i],
+            "nonce": str(i),
+            "blockHash": hashes[rows - 1 - i],
+            "transactionIndex": str(i % 200),
+            "from": other if incoming[i] else wallet,
+            "to": wallet if incoming[i] else other,
+            "value": str(int(wei[i]) * 10 ** 9),
+            "gas": "21000",
+            "gasPrice": "20000000000",
+            "isError": "0",
+            "txreceipt_status": "1",
+            "input": "0x",
+            "contractAddress": "",
+            "cumulativeGasUsed": str(gas_used[i] * 3),
+            "gasUsed": str(gas_used[i]),
+            "confirmations": "1000",
+            "methodId": "0x",
+            "functionName": "",
+        })
+    return {"wallet": wallet, "blacklist": blacklist.tolist(), "result": result}
+
+
+def txlist_response(txs):
+    """ 包成 Etherscan API 的回應格式。 """
+    return {"status": "1", "message": "OK", "result": txs}
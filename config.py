@@ -10,12 +10,17 @@ load_dotenv()
 # 日誌設置
 logging.basicConfig(level=logging.DEBUG)
 
-# 取得 API Keys
-BLOCKCHAIN_API_KEYS = {
-    "ethereum": os.getenv("ETHERSCAN_API_KEY"),
-    "bsc": os.getenv("BSCSCAN_API_KEY"),
-    "polygon": os.getenv("POLYGONSCAN_API_KEY")
+# 取得 API Keys (每條鏈可設定多把，以逗號分隔)
+def _key_list(name):
+    return [k.strip() for k in (os.getenv(name) or "").split(",") if k.strip()]
+
+BLOCKCHAIN_API_KEY_POOLS = {
+    "ethereum": _key_list("ETHERSCAN_API_KEY"),
+    "bsc": _key_list("BSCSCAN_API_KEY"),
+    "polygon": _key_list("POLYGONSCAN_API_KEY")
 }
+BLOCKCHAIN_API_KEYS = {chain: keys[0] if keys else None
+                       for chain, keys in BLOCKCHAIN_API_KEY_POOLS.items()}
 
 # 檢查必需的 API Keys 是否設置
 required_keys = ["ETHERSCAN_API_KEY", "BSCSCAN_API_KEY", "POLYGONSCAN_API_KEY"]
@@ -23,8 +28,94 @@ for key in required_keys:
     value = os.getenv(key)
     if not value:
         raise EnvironmentError(f"{key} 必須在環境變數中設置。")
-    logging.debug(f"{key} 已設置為: {value}")
+    logging.debug(f"{key} 已設置 ({len(_key_list(key))} 把)")
+
+# 外部 API 端點 (壓力測試時可指向本地替身伺服器，見 benchmarks/standin_server.py)
+BLOCKCHAIN_API_URLS = {
+    "ethereum": os.getenv("ETHERSCAN_API_URL", "https://api.etherscan.io/api"),
+    "bsc": os.getenv("BSCSCAN_API_URL", "https://api.bscscan.com/api"),
+    "polygon": os.getenv("POLYGONSCAN_API_URL", "https://api.polygonscan.com/api")
+}
+COINGECKO_API_URL = os.getenv("COINGECKO_API_URL", "https://api.coingecko.com/api/v3")
 
 # 取得黑名單錢包地址
 BLACKLISTED_WALLETS = json.loads(os.getenv("BLACKLISTED_WALLETS", "[]"))
-logging.debug(f"黑名單錢包地址: {BLACKLISTED_WALLETS}")
+logging.debug(f"黑名單錢包地址: {len(BLACKLISTED_WALLETS)} 筆")
+
+# 大型黑名單來源 (逗號分隔的檔案路徑)、編譯後的名單檔、重新載入檢查間隔(秒)
+BLACKLIST_FEEDS = [p.strip() for p in os.getenv("BLACKLIST_FEEDS", "").split(",") if p.strip()]
+BLACKLIST_DB_PATH = os.getenv("BLACKLIST_DB_PATH", os.path.join("data", "blacklist.npy"))
+BLACKLIST_RELOAD_INTERVAL = int(os.getenv("BLACKLIST_RELOAD_INTERVAL", "30"))
+
+# 本地交易儲存：SQLite 路徑、同步間隔(秒)、單次同步最多 API 呼叫數
+TX_STORE_PATH = os.getenv("TX_STORE_PATH", os.path.join("data", "tx_store.sqlite3"))
+TX_STORE_SYNC_INTERVAL = int(os.getenv("TX_STORE_SYNC_INTERVAL", "30"))
+TX_STORE_MAX_SYNC_PAGES = int(os.getenv("TX_STORE_MAX_SYNC_PAGES", "5"))
+
+# 伺服器端查詢結果快取：最多筆數、記憶體上限(MB)、存活秒數
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "512"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))
+
+# 完整歷史抓取：並行請求數、單次最多 API 呼叫數
+HISTORY_MAX_WORKERS = int(os.getenv("HISTORY_MAX_WORKERS", "4"))
+HISTORY_MAX_REQUESTS = int(os.getenv("HISTORY_MAX_REQUESTS", "200"))
+
+# 跨地址 n-hop 追蹤：每個地址最多擴展鄰居數、總請求數上限、時間上限(秒)
+NHOP_MAX_FANOUT = int(os.getenv("NHOP_MAX_FANOUT", "20"))
+NHOP_MAX_REQUESTS = int(os.getenv("NHOP_MAX_REQUESTS", "60"))
+NHOP_TIME_BUDGET = float(os.getenv("NHOP_TIME_BUDGET", "8"))
+
+# 污點傳播：FIFO 模型每個地址保留的資金批次上限、預設最多追蹤的跳數 (0 為不限)
+TAINT_MAX_LOTS = int(os.getenv("TAINT_MAX_LOTS", "64"))
+TAINT_MAX_HOPS = int(os.getenv("TAINT_MAX_HOPS", "0"))
+
+# 地址圖索引 (CSR)：儲存目錄、自動儲存間隔(秒)
+GRAPH_INDEX_DIR = os.getenv("GRAPH_INDEX_DIR", os.path.join("data", "graph"))
+GRAPH_INDEX_SAVE_INTERVAL = int(os.getenv("GRAPH_INDEX_SAVE_INTERVAL", "60"))
+
+# 地址字典 (地址 => 整數 id) 快照；空字串為不持久化
+ADDRESS_BOOK_PATH = os.getenv("ADDRESS_BOOK_PATH", os.path.join("data", "address_book.npz"))
+
+# 歷史匯率時間序列 (SQLite)
+PRICE_HISTORY_PATH = os.getenv("PRICE_HISTORY_PATH", os.path.join("data", "price_history.sqlite3"))
+# 歷史匯率補抓失敗後暫停補抓的秒數 (期間改用已有資料或即時匯率)
+PRICE_HISTORY_FAILURE_BACKOFF = int(os.getenv("PRICE_HISTORY_FAILURE_BACKOFF", "300"))
+
+# 指標：是否開放 /metrics、慢請求門檻(秒，超過時記錄各階段耗時；0 為停用)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0"))
+
+# 背景工作：執行緒數、等待中工作上限、完成後保留秒數
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+
+# 批次地址篩查：一次上傳的地址數上限、同時篩查的地址數、每個地址同步的頁數
+SCREEN_MAX_ADDRESSES = int(os.getenv("SCREEN_MAX_ADDRESSES", "5000"))
+SCREEN_MAX_WORKERS = int(os.getenv("SCREEN_MAX_WORKERS", "8"))
+SCREEN_SYNC_PAGES = int(os.getenv("SCREEN_SYNC_PAGES", "1"))
+
+# 跨行程共用快取：Flask-Caching 後端 (SimpleCache 為單一行程；
+# services.shared_cache.SharedFlaskCache 為同主機 worker 共用的 SQLite 檔；亦可用 RedisCache)
+CACHE_TYPE = os.getenv("CACHE_TYPE", "SimpleCache")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join("data", "shared_cache.sqlite3"))
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "10000"))
+SHARED_CACHE_MAX_MB = int(os.getenv("SHARED_CACHE_MAX_MB", "256"))
+# 限流計數器儲存 (memory:// 為單一行程；sqlite:///data/shared_cache.sqlite3 為同主機共用；亦可用 redis://)
+RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
+# 是否啟用每個 IP 的請求限制 (壓力測試時可關閉)
+RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "1").lower() in ("1", "true", "yes")
+# 區塊鏈瀏覽器 API 回應快取秒數 (0 為停用)
+EXPLORER_CACHE_TTL = int(os.getenv("EXPLORER_CACHE_TTL", "15"))
+
+# 區塊鏈瀏覽器 API 配額 (每把金鑰)：每秒請求數、瞬間可累積數、等待配額上限(秒)、
+# 遇速率限制時的重試次數與初始退避秒數 (每次加倍)
+EXPLORER_RATE_PER_KEY = float(os.getenv("EXPLORER_RATE_PER_KEY", "5"))
+EXPLORER_BURST = int(os.getenv("EXPLORER_BURST", "5"))
+EXPLORER_MAX_WAIT = float(os.getenv("EXPLORER_MAX_WAIT", "30"))
+EXPLORER_MAX_RETRIES = int(os.getenv("EXPLORER_MAX_RETRIES", "4"))
+EXPLORER_RETRY_BACKOFF = float(os.getenv("EXPLORER_RETRY_BACKOFF", "1"))
+# 金鑰配額的跨 worker 計數器 (預設與限流共用儲存；memory:// 時只在各 worker 內計算)
+EXPLORER_RATE_STORAGE_URI = os.getenv("EXPLORER_RATE_STORAGE_URI", RATELIMIT_STORAGE_URI)
@@ -1,84 +1,131 @@
 # models/anomaly_detection.py
 
-from config import BLACKLISTED_WALLETS
-import logging
-from datetime import datetime
+import numpy as np
 
-def detect_anomalies(transactions, large_tx_threshold=1000, time_threshold=600):
+from models.tx_batch import TransactionBatch
+from services.blacklist import get_blacklist
+
+# 已註冊的偵測規則，依序執行；每條規則只對共用的欄式資料做陣列運算，不另做整批迴圈
+DETECTORS = []
+
+
+def register_detector(func):
+    """
+    註冊偵測規則 (可當 decorator 使用)。
+    規則簽名為 func(ctx, emit)：
+      - ctx: AnomalyContext，含 batch、依時間排序後的索引等共用資料
+      - emit(i, anomaly_type, **extra)：回報第 i 筆交易的異常
+    """
+    DETECTORS.append(func)
+    return func
+
+
+class AnomalyContext:
+    """ 偵測規則共用的資料；時間排序只做一次。 """
+
+    def __init__(self, batch, large_tx_threshold, time_threshold, blacklisted):
+        self.batch = batch
+        self.value = batch.value
+        self.large_tx_threshold = large_tx_threshold
+        self.time_threshold = time_threshold
+        self.blacklisted = blacklisted
+        # 依 epoch 秒穩定排序，rank[i] 為第 i 筆交易在時間序中的位置
+        self.order = np.argsort(batch.timestamps, kind="stable")
+        self.rank = np.empty(len(batch), dtype=np.int64)
+        self.rank[self.order] = np.arange(len(batch), dtype=np.int64)
+
+
+@register_detector
+def detect_large_transactions(ctx, emit):
+    """ 大額交易：value >= large_tx_threshold """
+    for i in np.flatnonzero(ctx.value >= ctx.large_tx_threshold):
+        emit(i, "大額交易")
+
+
+@register_detector
+def detect_blacklisted(ctx, emit):
+    """ 黑名單錢包：from 或 to 在黑名單清單內 (以地址表索引查表) """
+    batch = ctx.batch
+    flagged = batch.address_flags(ctx.blacklisted)
+    from_hit = flagged[batch.from_ids]
+    to_hit = flagged[batch.to_ids]
+    for i in np.flatnonzero(from_hit | to_hit):
+        if from_hit[i]:
+            emit(i, "黑名單錢包", address=batch.from_addr(i))
+        if to_hit[i]:
+            emit(i, "黑名單錢包", address=batch.to_addr(i))
+
+
+@register_detector
+def detect_rapid_in_out(ctx, emit):
     """
-    偵測交易異常，包括：
+    快速流入流出：存在 tx1.to == tx2.from，tx1 在時間序中早於 tx2，
+    且 tx2.time - tx1.time <= time_threshold 秒；回報 tx2。
+
+    以 (地址, 時間序) 建立流入索引，對每筆流出交易用二分搜尋找出同一地址
+    在它之前最近的一筆流入 (等同逐地址的雙指標滑動視窗)，
+    因此中間夾雜其他交易也不會漏判，整體 O(n log n)。
+    """
+    batch = ctx.batch
+    n = len(batch)
+    if n < 2:
+        return
+    stride = n + 1
+    # 流入索引：key = to 地址 * stride + 時間序位置，排序後可二分搜尋
+    in_keys = batch.to_ids.astype(np.int64) * stride + ctx.rank
+    in_order = np.argsort(in_keys)
+    in_keys = in_keys[in_order]
+    # 每筆流出交易：找 key < (from 地址, 自身位置) 的最後一筆流入
+    out_keys = batch.from_ids.astype(np.int64) * stride + ctx.rank
+    pos = np.searchsorted(in_keys, out_keys, side="left") - 1
+    valid = pos >= 0
+    prev = in_order[np.where(valid, pos, 0)]
+    valid &= batch.to_ids[prev] == batch.from_ids
+    # 用 <= 才能包含「剛好等於 time_threshold」的邊界情況
+    valid &= batch.timestamps - batch.timestamps[prev] <= ctx.time_threshold
+    for i in ctx.order[valid[ctx.order]]:
+        emit(i, "快速流入流出")
+
+
+def detect_anomalies(transactions, large_tx_threshold=1000, time_threshold=600,
+                     detectors=None):
+    """
+    偵測交易異常，預設規則包括：
       1) 大額交易：單筆交易金額 >= large_tx_threshold
       2) 黑名單錢包：若交易的 from 或 to 位於黑名單
       3) 快速流入流出：如果 tx1 的 to == tx2 的 from，
-         並且兩筆交易時間差 <= time_threshold 秒
-    
+         並且兩筆交易時間差 <= time_threshold 秒 (不限相鄰)
+
     參數：
-      - transactions: list[dict]，包含 {hash, from, to, value, time} 等必要欄位
+      - transactions: list[dict] 或 TransactionBatch，
+        dict 需包含 {hash, from, to, value, time 或 timeStamp} 等必要欄位
       - large_tx_threshold: float，大額交易門檻
       - time_threshold: int，秒數，用於判斷「快速流入流出」
+      - detectors: 要執行的規則 list，預設為 DETECTORS
     回傳：
       - list[dict]：偵測到的所有異常交易
     """
 
     anomalies = []
+    batch = TransactionBatch.coerce(transactions)
+    if len(batch) == 0:
+        return anomalies
+
+    # 共用的黑名單比對器 (含 config 地址與測試用的 "0xblacklisted")
+    ctx = AnomalyContext(batch, large_tx_threshold, time_threshold, get_blacklist())
+    value = ctx.value
+
+    def emit(i, anomaly_type, **extra):
+        anomaly = {
+            "type": anomaly_type,
+            "hash": batch.hashes[i],
+            "value": f"{value[i]:.2f}",
+            "time": batch.time_str(i)
+        }
+        anomaly.update(extra)
+        anomalies.append(anomaly)
 
-    # 測試檔使用的黑名單地址是 "0xblacklisted"；若 .env/config 裡沒有它，就手動加入
-    blacklisted = set(addr.lower() for addr in BLACKLISTED_WALLETS)
-    blacklisted.add("0xblacklisted")  # 將測試所用的地址也納入黑名單
-
-    # 將交易時間轉成 datetime，便於後續排序與計算時間差
-    for tx in transactions:
-        try:
-            tx['time_obj'] = datetime.strptime(tx['time'], "%Y-%m-%d %H:%M:%S")
-        except Exception as e:
-            logging.error(f"交易 {tx['hash']} 的 time 解析失敗: {e}")
-            tx['time_obj'] = datetime.min
-
-    # 1) 大額交易：value >= large_tx_threshold
-    for tx in transactions:
-        if tx['value'] >= large_tx_threshold:
-            anomalies.append({
-                "type": "大額交易",
-                "hash": tx['hash'],
-                "value": f"{tx['value']:.2f}",
-                "time": tx['time']
-            })
-
-    # 2) 黑名單錢包：from 或 to 在黑名單清單內
-    for tx in transactions:
-        from_addr_lower = tx['from'].lower()
-        to_addr_lower = tx['to'].lower()
-        if from_addr_lower in blacklisted:
-            anomalies.append({
-                "type": "黑名單錢包",
-                "hash": tx['hash'],
-                "value": f"{tx['value']:.2f}",
-                "address": tx['from'],  # 保留原大小寫
-                "time": tx['time']
-            })
-        if to_addr_lower in blacklisted:
-            anomalies.append({
-                "type": "黑名單錢包",
-                "hash": tx['hash'],
-                "value": f"{tx['value']:.2f}",
-                "address": tx['to'],    # 保留原大小寫
-                "time": tx['time']
-            })
-
-    # 3) 快速流入流出：tx1 的 to == tx2 的 from，且時間差 <= time_threshold 秒
-    sorted_txs = sorted(transactions, key=lambda x: x['time_obj'])
-    for i in range(len(sorted_txs) - 1):
-        tx1 = sorted_txs[i]
-        tx2 = sorted_txs[i + 1]
-        if tx1['to'].lower() == tx2['from'].lower():
-            time_diff = (tx2['time_obj'] - tx1['time_obj']).total_seconds()
-            # 用 <= 才能包含「剛好等於 time_threshold」的邊界情況
-            if time_diff <= time_threshold:
-                anomalies.append({
-                    "type": "快速流入流出",
-                    "hash": tx2['hash'],
-                    "value": f"{tx2['value']:.2f}",
-                    "time": tx2['time']
-                })
+    for detector in (DETECTORS if detectors is None else detectors):
+        detector(ctx, emit)
 
     return anomalies
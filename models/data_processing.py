@@ -1,35 +1,41 @@
 # models/data_processing.py
 import logging
+import numpy as np
+
+from models.tx_batch import TransactionBatch
 
 def analyze_transactions(transactions, wallet_address):
-    flow_in = []
-    flow_out = []
+    """
+    統計錢包的流入/流出。transactions 可為 list[dict] 或 TransactionBatch；
+    金額加總以陣列運算完成。
+    """
+    batch = TransactionBatch.coerce(transactions)
     wallet_address_lower = wallet_address.lower()
     logging.debug(f"分析錢包地址: {wallet_address_lower}")
 
-    for tx in transactions:
-        tx_to = tx.get("to", "").lower()
-        tx_from = tx.get("from", "").lower()
-
-        if tx_to == wallet_address_lower:
-            flow_in.append({
-                "hash": tx["hash"],
-                "from": tx["from"],
-                "value": tx["value"],  # 保持為數字類型
-                "time": tx["time"]     # 已經在 app.py 中添加
-            })
-            logging.debug(f"流入交易: {tx['hash']} 金額: {tx['value']} ETH")
-        elif tx_from == wallet_address_lower:
-            flow_out.append({
-                "hash": tx["hash"],
-                "to": tx["to"],
-                "value": tx["value"],  # 保持為數字類型
-                "time": tx["time"]     # 已經在 app.py 中添加
-            })
-            logging.debug(f"流出交易: {tx['hash']} 金額: {tx['value']} ETH")
-
-    total_in = round(sum(tx["value"] for tx in flow_in), 2)
-    total_out = round(sum(tx["value"] for tx in flow_out), 2)
+    wallet_id = batch.address_id(wallet_address_lower)
+    if wallet_id >= 0:
+        in_mask = batch.to_ids == wallet_id
+        out_mask = (batch.from_ids == wallet_id) & ~in_mask
+    else:
+        in_mask = out_mask = np.zeros(len(batch), dtype=bool)
+
+    value = batch.value
+    flow_in = [{
+        "hash": batch.hashes[i],
+        "from": batch.from_addr(i),
+        "value": float(value[i]),  # 保持為數字類型
+        "time": batch.time_str(i)
+    } for i in np.flatnonzero(in_mask)]
+    flow_out = [{
+        "hash": batch.hashes[i],
+        "to": batch.to_addr(i),
+        "value": float(value[i]),  # 保持為數字類型
+        "time": batch.time_str(i)
+    } for i in np.flatnonzero(out_mask)]
+
+    total_in = round(float(value[in_mask].sum()), 2)
+    total_out = round(float(value[out_mask].sum()), 2)
 
     summary = {
         "total_in": total_in,      # 數字類型
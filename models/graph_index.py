@@ -0,0 +1,422 @@
+# models/graph_index.py
+import os
+import time
+import hashlib
+import logging
+import threading
+from functools import partial
+import numpy as np
+
+from models.tx_batch import format_time
+from services.address_book import get_address_book
+
+_EMPTY_INT = np.empty(0, dtype=np.int64)
+
+
+def normalize_hashes(hashes):
+    """ 交易哈希 => 小寫字串 (object 陣列)，去重時以此比對完整哈希。 """
+    out = np.empty(len(hashes), dtype=object)
+    out[:] = [str(h).lower() for h in hashes]
+    return out
+
+
+def hash_key(hashes):
+    """
+    交易哈希 => int64 緊湊鍵 (完整哈希的 blake2b 前 8 bytes)，供排序與二分搜尋去重。
+    與行程無關 (不使用 hash())，可寫入索引檔；鍵相同時仍需比對完整哈希。
+    摘要串接後一次以 frombuffer 轉成陣列，不逐筆轉整數寫入。
+    """
+    blake2b = partial(hashlib.blake2b, digest_size=8)
+    digests = b"".join([blake2b(str(h).lower().encode("utf-8")).digest() for h in hashes])
+    return np.frombuffer(digests, dtype="<i8").astype(np.int64)
+
+
+def _gather(indptr, frontier):
+    """ 回傳 frontier 中每個節點在 CSR 陣列內的所有位置 (向量化展開)。 """
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return _EMPTY_INT
+    group_start = np.cumsum(counts) - counts
+    return np.arange(total, dtype=np.int64) + np.repeat(starts - group_start, counts)
+
+
+# 邊的欄位與型別；底層陣列預留容量，有效部分為前 _size 筆
+_COLUMNS = {"src": np.int64, "dst": np.int64, "value": np.float64, "usd_value": np.float64,
+            "timestamp": np.int64, "keys": np.int64, "hashes": object}
+_MIN_CAPACITY = 1024
+
+
+def _column(name):
+    return property(lambda self: self._cols[name][:self._size])
+
+
+def _build_csr(keys, n_nodes):
+    """ 依 keys (節點 id) 排序邊，回傳 (indptr, edge_ids)。 """
+    order = np.argsort(keys, kind="stable")
+    counts = np.bincount(keys, minlength=n_nodes)
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, order.astype(np.int64)
+
+
+class AddressGraphIndex:
+    """
+    持久化的地址圖索引 (單一鏈)。
+
+    邊以欄式陣列保存 (src, dst, value, usd_value, timestamp, hash_key, 完整哈希)，
+    查詢時以壓縮稀疏列 (CSR) 的出邊 / 入邊鄰接陣列展開，不再每次重建 dict-of-sets。
+    新交易以 add_batch() 追加 (依哈希去重)：欄位陣列預留容量 (倍增)，排序後的鍵以二分搜尋插入，
+    不重新排序整個索引；CSR 在下次查詢時才重建。
+    節點 id 即行程共用地址字典 (book) 的 id；檔案中仍以地址字串保存，載入時重新配發。
+    """
+
+    def __init__(self, path=None, save_interval=60, book=None):
+        self.path = path
+        self.save_interval = save_interval
+        self.book = book or get_address_book()
+        self._lock = threading.RLock()
+        # keys 為去重用的哈希鍵，hashes 為完整哈希 (鍵相同時比對)
+        self._cols = {name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._size = 0
+        self._sorted_keys = _EMPTY_INT
+        self._key_order = _EMPTY_INT  # _sorted_keys 每個位置對應的邊 id
+        self._csr = None
+        self.derived = {}            # 由邊推導的快取結果 (如污點傳播)，邊變動時清空
+        self._dirty = False
+        self._saved_at = time.time()
+        if path and os.path.exists(path):
+            self._load(path)
+
+    src = _column("src")
+    dst = _column("dst")
+    value = _column("value")
+    usd_value = _column("usd_value")
+    timestamp = _column("timestamp")
+    keys = _column("keys")
+    hashes = _column("hashes")
+
+    # ---------- 寫入 ----------
+    def node_id(self, address, create=False):
+        return self.book.intern(address) if create else self.book.lookup(address)
+
+    def node_addresses(self, node_ids):
+        """ 節點 id 陣列 => 地址字串 list。 """
+        return self.book.address_strings(node_ids).tolist()
+
+    def add_batch(self, batch, usd_values):
+        """ 將 TransactionBatch 的交易加入圖中 (已存在的哈希略過)；回傳新增的邊數。 """
+        if len(batch) == 0:
+            return 0
+        hashes = normalize_hashes(batch.hashes)
+        with self._lock:
+            # 批次內以完整哈希去重，再與已有的邊比對
+            _, first = np.unique(hashes.astype(str), return_index=True)
+            keys = hash_key(hashes[first])
+            known = self._known(keys, hashes[first])
+            new = np.sort(first[~known])
+            if len(new) == 0:
+                return 0
+            new_keys = keys[~known][np.argsort(first[~known], kind="stable")]
+
+            # 批次地址表 => 圖節點 id (地址字典 id)
+            local = batch.gids.astype(np.int64)
+            usd_values = np.asarray(usd_values, dtype=np.float64)
+            base = self._size
+            self._append(src=local[batch.from_ids[new]], dst=local[batch.to_ids[new]],
+                         value=batch.value[new], usd_value=usd_values[new],
+                         timestamp=batch.timestamps[new], keys=new_keys, hashes=hashes[new])
+            self._merge_keys(new_keys, base)
+            self._csr = None
+            self.derived.clear()
+            self._dirty = True
+            added = len(new)
+        self.maybe_save()
+        return added
+
+    def _append(self, **columns):
+        """ 將新邊寫入各欄位尾端，容量不足時倍增 (攤銷後每筆 O(1))。 """
+        count = len(columns["src"])
+        end = self._size + count
+        capacity = len(self._cols["src"])
+        if end > capacity:
+            capacity = max(end, 2 * capacity, _MIN_CAPACITY)
+            for name, dtype in _COLUMNS.items():
+                grown = np.empty(capacity, dtype=dtype)
+                grown[:self._size] = self._cols[name][:self._size]
+                self._cols[name] = grown
+        for name, values in columns.items():
+            self._cols[name][self._size:end] = values
+        self._size = end
+
+    def _merge_keys(self, new_keys, base):
+        """ 新邊 (id 自 base 起) 的鍵以 searchsorted 插入已排序的鍵，不重新排序整個索引。 """
+        order = np.argsort(new_keys, kind="stable")
+        pos = np.searchsorted(self._sorted_keys, new_keys[order], side="right")
+        self._sorted_keys = np.insert(self._sorted_keys, pos, new_keys[order])
+        self._key_order = np.insert(self._key_order, pos, base + order.astype(np.int64))
+
+    def _sort_keys(self):
+        self._key_order = np.argsort(self.keys, kind="stable")
+        self._sorted_keys = self.keys[self._key_order]
+
+    def _known(self, keys, hashes):
+        """ 每筆 (鍵, 完整哈希) 是否已在索引中；鍵相同但哈希不同 (碰撞) 視為不同交易。 """
+        return self._locate(keys, hashes) >= 0
+
+    def _locate(self, keys, hashes):
+        """ 每筆 (鍵, 完整哈希) 對應的邊 id，不在索引中為 -1。 """
+        found = np.full(len(keys), -1, dtype=np.int64)
+        if len(self._sorted_keys) == 0:
+            return found
+        pos = np.searchsorted(self._sorted_keys, keys)
+        at = np.minimum(pos, len(self._sorted_keys) - 1)
+        key_hit = self._sorted_keys[at] == keys
+        edge = self._key_order[at]
+        hit = key_hit & (self.hashes[edge] == hashes)
+        found[hit] = edge[hit]
+        # 鍵相同但第一個位置的哈希不同：逐一檢查同鍵的其他邊 (極少發生)
+        for i in np.flatnonzero(key_hit & ~hit):
+            p = int(pos[i])
+            while p < len(self._sorted_keys) and self._sorted_keys[p] == keys[i]:
+                if self.hashes[self._key_order[p]] == hashes[i]:
+                    found[i] = self._key_order[p]
+                    break
+                p += 1
+        return found
+
+    def edge_ids(self, hashes):
+        """ 交易哈希 => 本索引中的邊 id 陣列 (不在索引中的哈希略過)。 """
+        if len(hashes) == 0:
+            return _EMPTY_INT
+        hashes = normalize_hashes(hashes)
+        with self._lock:
+            found = self._locate(hash_key(hashes), hashes)
+        return np.unique(found[found >= 0])
+
+    # ---------- 持久化 ----------
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = self.path + ".tmp"
+            # 只保存用到的節點，src / dst 轉成檔案內的地址表索引
+            used, inverse = np.unique(np.concatenate([self.src, self.dst]), return_inverse=True)
+            inverse = inverse.astype(np.int64)
+            with open(tmp, "wb") as fh:
+                np.savez(fh, addresses=self.book.address_strings(used).astype(str),
+                         src=inverse[:len(self.src)], dst=inverse[len(self.src):], value=self.value,
+                         usd_value=self.usd_value, timestamp=self.timestamp, keys=self.keys,
+                         hashes=self.hashes.astype(str))
+            os.replace(tmp, self.path)   # 原子替換，讀取端不會看到寫到一半的檔案
+            self._dirty = False
+            self._saved_at = time.time()
+
+    def maybe_save(self):
+        if self._dirty and time.time() - self._saved_at >= self.save_interval:
+            try:
+                self.save()
+            except OSError as e:
+                logging.error(f"圖索引儲存失敗: {e}")
+
+    def _load(self, path):
+        with np.load(path) as data:
+            if "hashes" not in data:
+                # 舊版索引的鍵由哈希前後段 XOR 而來，無法與新鍵比對去重，捨棄後由之後的查詢重建
+                logging.warning(f"圖索引 {path} 為舊版格式，將重新建立")
+                return
+            ids = self.book.intern_many(data["addresses"]).astype(np.int64)
+            self._append(src=ids[data["src"]], dst=ids[data["dst"]], value=data["value"],
+                         usd_value=data["usd_value"], timestamp=data["timestamp"],
+                         keys=data["keys"], hashes=data["hashes"].astype(object))
+        self._sort_keys()
+
+    # ---------- 查詢 ----------
+    @property
+    def edge_count(self):
+        return self._size
+
+    def _get_csr(self):
+        with self._lock:
+            if self._csr is None:
+                # 地址字典為所有鏈共用，只需涵蓋本索引用到的最大節點 id
+                n = int(max(self.src.max(), self.dst.max())) + 1 if len(self.src) else 0
+                out_ptr, out_edges = _build_csr(self.src, n)
+                in_ptr, in_edges = _build_csr(self.dst, n)
+                self._csr = (out_ptr, out_edges, in_ptr, in_edges)
+            return self._csr
+
+    def active_nodes(self):
+        """ 本索引中至少有一條邊的節點 id。 """
+        out_ptr, _, in_ptr, _ = self._get_csr()
+        return np.flatnonzero((np.diff(out_ptr) > 0) | (np.diff(in_ptr) > 0))
+
+    def _expand(self, csr, frontier, direction, edge_mask=None):
+        """ frontier 的所有相鄰邊 (edge_mask 為 False 的邊略過)：回傳 (edge_ids, 鄰居節點 id)。 """
+        out_ptr, out_edges, in_ptr, in_edges = csr
+        edges, nbrs = [], []
+        if direction in ("out", "both"):
+            e = out_edges[_gather(out_ptr, frontier)]
+            if edge_mask is not None:
+                e = e[edge_mask[e]]
+            edges.append(e)
+            nbrs.append(self.dst[e])
+        if direction in ("in", "both"):
+            e = in_edges[_gather(in_ptr, frontier)]
+            if edge_mask is not None:
+                e = e[edge_mask[e]]
+            edges.append(e)
+            nbrs.append(self.src[e])
+        return np.concatenate(edges), np.concatenate(nbrs)
+
+    def _bfs(self, start, max_hops, direction):
+        """ 回傳 (dist, parent_edge)，未到達的節點 dist = -1。 """
+        csr = self._get_csr()
+        n = max(len(csr[0]) - 1, start + 1)
+        dist = np.full(n, -1, dtype=np.int64)
+        parent_edge = np.full(n, -1, dtype=np.int64)
+        dist[start] = 0
+        if start >= len(csr[0]) - 1:
+            return dist, parent_edge   # 本索引中沒有任何邊的節點
+        frontier = np.array([start], dtype=np.int64)
+        for depth in range(1, max_hops + 1):
+            edges, nbrs = self._expand(csr, frontier, direction)
+            fresh = dist[nbrs] < 0
+            nbrs, edges = nbrs[fresh], edges[fresh]
+            nbrs, first = np.unique(nbrs, return_index=True)
+            if len(nbrs) == 0:
+                break
+            dist[nbrs] = depth
+            parent_edge[nbrs] = edges[first]
+            frontier = nbrs
+        return dist, parent_edge
+
+    def neighborhood(self, address, hops=1, direction="both", max_edges=5000, edge_ids=None):
+        """
+        k-hop 鄰域：回傳 (節點地址 list, 邊 id 陣列)。
+        邊為所有從距離 < hops 的節點出發、被 BFS 走過的邊，超過 max_edges 時保留 USD 金額最大者；
+        節點為保留下來的邊的端點。edge_ids 不為 None 時只走這些邊 (例如目前查詢結果的交易)。
+        """
+        nodes, edges = self.neighborhood_ids(address, hops, direction, max_edges, edge_ids)
+        return self.node_addresses(nodes), edges
+
+    def neighborhood_ids(self, address, hops=1, direction="both", max_edges=5000, edge_ids=None):
+        """ 同 neighborhood，節點以地址字典 id 陣列回傳。 """
+        start = self.node_id(address)
+        if start < 0:
+            return _EMPTY_INT, _EMPTY_INT
+        csr = self._get_csr()
+        n = len(csr[0]) - 1
+        out_ptr, _, in_ptr, _ = csr
+        if start >= n or out_ptr[start] == out_ptr[start + 1] and in_ptr[start] == in_ptr[start + 1]:
+            # 地址字典共用於所有鏈，本索引沒有邊的地址視同不存在
+            return _EMPTY_INT, _EMPTY_INT
+        edge_mask = None
+        if edge_ids is not None:
+            edge_mask = np.zeros(self.edge_count, dtype=bool)
+            edge_mask[np.asarray(edge_ids, dtype=np.int64)] = True
+        seen = np.zeros(n, dtype=bool)
+        seen[start] = True
+        frontier = np.array([start], dtype=np.int64)
+        all_edges = []
+        for _ in range(hops):
+            edges, nbrs = self._expand(csr, frontier, direction, edge_mask)
+            all_edges.append(edges)
+            nbrs = np.unique(nbrs)
+            frontier = nbrs[~seen[nbrs]]
+            seen[frontier] = True
+            if len(frontier) == 0:
+                break
+        edges = np.unique(np.concatenate(all_edges)) if all_edges else _EMPTY_INT
+        if len(edges) > max_edges:
+            edges = edges[np.argsort(-self.usd_value[edges], kind="stable")[:max_edges]]
+        # 只回傳保留下來的邊的端點，截斷後不留下沒有邊的節點
+        return np.unique(np.concatenate([self.src[edges], self.dst[edges]])), edges
+
+    def shortest_path(self, source, target, max_hops=6, directed=True):
+        """ 最短路徑 (依 hop 數)：回傳邊 id list，找不到則回傳 None。 """
+        s, t = self.node_id(source), self.node_id(target)
+        if s < 0 or t < 0:
+            return None
+        if s == t:
+            return []
+        dist, parent_edge = self._bfs(s, max_hops, "out" if directed else "both")
+        if t >= len(dist) or dist[t] < 0:
+            return None
+        path, node = [], t
+        while node != s:
+            e = int(parent_edge[node])
+            path.append(e)
+            node = int(self.src[e]) if int(self.src[e]) != node else int(self.dst[e])
+        return path[::-1]
+
+    def all_paths(self, source, target, max_hops=4, limit=100):
+        """
+        source => target 在 max_hops 內的所有有向路徑 (節點不重複)，最多 limit 條。
+        先從 target 反向 BFS 求出每個節點到 target 的距離，DFS 時只走得到 target 的節點。
+        回傳 list[list[邊 id]]。
+        """
+        s, t = self.node_id(source), self.node_id(target)
+        if s < 0 or t < 0 or s == t:
+            return []
+        out_ptr, out_edges, _, _ = self._get_csr()
+        dist_to_t, _ = self._bfs(t, max_hops, "in")
+        if max(s, t) >= len(dist_to_t) or dist_to_t[s] < 0:
+            return []
+        paths = []
+        stack = [(s, [], {s})]
+        while stack and len(paths) < limit:
+            node, path, on_path = stack.pop()
+            remaining = max_hops - len(path)
+            for e in out_edges[out_ptr[node]:out_ptr[node + 1]]:
+                nb = int(self.dst[e])
+                if nb == t:
+                    paths.append(path + [int(e)])
+                    if len(paths) >= limit:
+                        break
+                    continue
+                d = dist_to_t[nb]
+                if nb in on_path or d < 0 or d > remaining - 1:
+                    continue
+                stack.append((nb, path + [int(e)], on_path | {nb}))
+        return paths
+
+    def edge_dicts(self, edge_ids):
+        """ 邊 id => 前端使用的 link dict。 """
+        edge_ids = np.asarray(edge_ids, dtype=np.int64)
+        sources = self.book.address_strings(self.src[edge_ids])
+        targets = self.book.address_strings(self.dst[edge_ids])
+        return [{
+            "source": s,
+            "target": t,
+            "value": float(self.usd_value[e]),
+            "time": format_time(self.timestamp[e])
+        } for e, s, t in zip(edge_ids.tolist(), sources, targets)]
+
+
+class GraphIndexRegistry:
+    """ 每條鏈一個 AddressGraphIndex，延遲載入，檔案位於 directory/{chain}.npz。 """
+
+    def __init__(self, directory, save_interval=60):
+        self.directory = directory
+        self.save_interval = save_interval
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, chain):
+        with self._lock:
+            index = self._indexes.get(chain)
+            if index is None:
+                path = os.path.join(self.directory, f"{chain}.npz") if self.directory else None
+                index = AddressGraphIndex(path, save_interval=self.save_interval)
+                self._indexes[chain] = index
+            return index
+
+    def save_all(self):
+        for index in list(self._indexes.values()):
+            if index._dirty:
+                index.save()
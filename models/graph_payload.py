@@ -0,0 +1,102 @@
+# models/graph_payload.py
+import numpy as np
+
+from models.tx_batch import format_time
+
+# compact 格式的欄位順序
+COMPACT_NODE_FIELDS = ["id", "is_blacklisted"]
+COMPACT_LINK_FIELDS = ["source", "target", "value", "count", "min_time", "max_time"]
+
+
+def build_graph_payload(batch, usd_values, blacklisted, aggregate=False,
+                        top_k=None, top_nodes=None, compact=False, max_links=None):
+    """
+    由 TransactionBatch 產生 /graph_data 的節點與連線。
+
+    參數：
+      - aggregate: 將相同 (source, target) 的平行邊合併為一條，附 count / 金額總和 / 最早與最晚時間
+      - top_k: 只保留 USD 金額最大的 k 條邊
+      - top_nodes: 只保留進出金額總和最大的 n 個節點 (及其之間的邊)
+      - compact: 以陣列的陣列輸出 (節點以索引引用)，減少 JSON 體積
+      - max_links: 逐筆交易的連線數超過此值時才改為 aggregate + top_k=max_links；
+        未超過時維持逐筆連線 (每條附交易時間，供時間軸播放)
+    自連交易 (from == to) 不產生連線，但仍建立節點。
+    回傳的 aggregated 標示連線是否已合併。
+    """
+    usd_values = np.asarray(usd_values, dtype=np.float64)
+    n_addr = len(batch.addresses)
+    src, dst, ts = batch.from_ids, batch.to_ids, batch.timestamps
+    keep = src != dst
+    src, dst, value, ts = src[keep], dst[keep], usd_values[keep], ts[keep]
+    if max_links is not None and not aggregate and len(src) > max_links:
+        aggregate = True
+        top_k = max_links if top_k is None else min(top_k, max_links)
+
+    if aggregate and len(src):
+        pair = src.astype(np.int64) * n_addr + dst
+        pairs, inverse = np.unique(pair, return_inverse=True)
+        src = (pairs // n_addr).astype(np.int32)
+        dst = (pairs % n_addr).astype(np.int32)
+        count = np.bincount(inverse, minlength=len(pairs))
+        total = np.bincount(inverse, weights=value, minlength=len(pairs))
+        min_t = np.full(len(pairs), np.iinfo(np.int64).max, dtype=np.int64)
+        max_t = np.full(len(pairs), np.iinfo(np.int64).min, dtype=np.int64)
+        np.minimum.at(min_t, inverse, ts)
+        np.maximum.at(max_t, inverse, ts)
+        value = total
+    else:
+        count = np.ones(len(src), dtype=np.int64)
+        min_t = max_t = ts
+
+    # 節點：所有出現過的地址 (含自連交易)
+    node_used = np.zeros(n_addr, dtype=bool)
+    node_used[batch.from_ids] = True
+    node_used[batch.to_ids] = True
+
+    if top_nodes is not None and top_nodes < node_used.sum():
+        strength = np.bincount(src, weights=value, minlength=n_addr) + \
+            np.bincount(dst, weights=value, minlength=n_addr)
+        strength[~node_used] = -np.inf
+        chosen = np.argpartition(-strength, top_nodes - 1)[:top_nodes] if top_nodes > 0 else []
+        node_used = np.zeros(n_addr, dtype=bool)
+        node_used[chosen] = True
+        sel = node_used[src] & node_used[dst]
+        src, dst, value, count, min_t, max_t = (a[sel] for a in (src, dst, value, count, min_t, max_t))
+
+    if top_k is not None and top_k < len(src):
+        sel = np.argsort(-value, kind="stable")[:max(top_k, 0)]
+        src, dst, value, count, min_t, max_t = (a[sel] for a in (src, dst, value, count, min_t, max_t))
+        # 剪枝後只保留仍有連線的節點
+        node_used = np.zeros(n_addr, dtype=bool)
+        node_used[src] = True
+        node_used[dst] = True
+
+    node_ids = np.flatnonzero(node_used)
+    addresses = batch.addresses
+    flags = batch.address_flags(blacklisted)[node_ids].tolist()
+    value = np.round(value, 2).tolist()
+
+    if compact:
+        position = np.full(n_addr, -1, dtype=np.int64)
+        position[node_ids] = np.arange(len(node_ids))
+        links = [[int(s), int(t), v, int(c), format_time(a), format_time(b)]
+                 for s, t, v, c, a, b in zip(position[src], position[dst], value,
+                                             count, min_t, max_t)]
+        return {
+            "node_fields": COMPACT_NODE_FIELDS,
+            "link_fields": COMPACT_LINK_FIELDS,
+            "nodes": [[addresses[i], f] for i, f in zip(node_ids, flags)],
+            "links": links,
+            "aggregated": aggregate,
+        }
+
+    nodes = [{"id": addresses[i], "is_blacklisted": f} for i, f in zip(node_ids, flags)]
+    if aggregate:
+        links = [{"source": addresses[s], "target": addresses[t], "value": v,
+                  "count": int(c), "time": format_time(a), "max_time": format_time(b)}
+                 for s, t, v, c, a, b in zip(src, dst, value, count, min_t, max_t)]
+    else:
+        links = [{"source": addresses[s], "target": addresses[t], "value": v,
+                  "time": format_time(a)}
+                 for s, t, v, a in zip(src, dst, value, min_t)]
+    return {"nodes": nodes, "links": links, "aggregated": aggregate}
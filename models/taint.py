@@ -0,0 +1,238 @@
+# models/taint.py
+import time
+from collections import deque
+
+import numpy as np
+
+from models.graph_index import _gather, _EMPTY_INT
+
+# 污點傳播模型
+#   - poison: 收到任何一筆污點資金的地址整個被污染，之後轉出的每一筆都算全額污點
+#   - haircut: 依比例稀釋，轉出金額中的污點 = 金額 x (目前污點餘額 / 目前餘額)
+#   - fifo: 先進先出，轉出時依序消耗最早收到的資金批次 (lot)
+TAINT_MODELS = ("poison", "haircut", "fifo")
+
+
+class TaintResult:
+    """
+    一次污點傳播的結果 (節點以地址字典 id 表示)：
+      - node_ids / received / tainted / hops: 範圍內每個收款節點收到的總金額、其中的污點金額、
+        污點最早經過幾跳到達 (未受污染為 -1)
+      - edge_ids / edge_taint: 帶有污點的邊 (索引內的邊 id) 與各自的污點金額 (原生幣)
+    """
+
+    def __init__(self, model, seed_ids, node_ids, received, tainted, hops,
+                 edge_ids, edge_taint, edges_scanned, seconds):
+        self.model = model
+        self.seed_ids = seed_ids
+        self.node_ids = node_ids
+        self.received = received
+        self.tainted = tainted
+        self.hops = hops
+        self.edge_ids = edge_ids
+        self.edge_taint = edge_taint
+        self.edges_scanned = edges_scanned
+        self.seconds = seconds
+        self._pos = {int(n): i for i, n in enumerate(node_ids.tolist())}
+
+    def position(self, node_id):
+        """ 節點在 node_ids 中的位置；不在傳播範圍內時為 -1。 """
+        return self._pos.get(int(node_id), -1)
+
+    def report(self, i):
+        """ 第 i 個節點的收到總額、污點金額、污點比例與跳數；i < 0 時視為未受污染。 """
+        if i < 0:
+            return {"received": 0.0, "tainted": 0.0, "ratio": 0.0, "hops": -1}
+        received, tainted = float(self.received[i]), float(self.tainted[i])
+        return {"received": received, "tainted": tainted,
+                "ratio": round(tainted / received, 6) if received > 0 else 0.0,
+                "hops": int(self.hops[i])}
+
+    def top(self, k):
+        """ 污點金額最大的 k 個節點在 node_ids 中的位置 (不含污點為 0 者)。 """
+        hit = np.flatnonzero(self.tainted > 0)
+        return hit[np.argsort(-self.tainted[hit], kind="stable")[:k]]
+
+
+def reachable_edges(index, seed_ids, max_hops=None):
+    """
+    從 seed 沿出邊可到達的節點 (不考慮時間，最多 max_hops 跳) 的所有入邊。
+    污點只可能流入這些節點；其他邊對結果沒有影響，掃描前先排除。
+    """
+    out_ptr, out_edges, in_ptr, in_edges = index._get_csr()
+    n = len(out_ptr) - 1
+    seeds = np.unique(seed_ids[(seed_ids >= 0) & (seed_ids < n)])
+    if len(seeds) == 0:
+        return _EMPTY_INT
+    seen = np.zeros(n, dtype=bool)
+    seen[seeds] = True
+    frontier = seeds
+    depth = 0
+    while len(frontier) and (max_hops is None or depth < max_hops):
+        nbrs = np.unique(index.dst[out_edges[_gather(out_ptr, frontier)]])
+        frontier = nbrs[~seen[nbrs]]
+        seen[frontier] = True
+        depth += 1
+    return in_edges[_gather(in_ptr, np.flatnonzero(seen))]
+
+
+def _sweep_poison(src, dst, value, is_seed, hop, max_hops):
+    tainted_node = is_seed.copy()
+    edge_taint = [0.0] * len(src)
+    for e in range(len(src)):
+        s = src[e]
+        if tainted_node[s] and hop[s] < max_hops:
+            d = dst[e]
+            edge_taint[e] = value[e]
+            tainted_node[d] = True
+            if hop[s] + 1 < hop[d]:
+                hop[d] = hop[s] + 1
+    return edge_taint
+
+
+def _sweep_haircut(src, dst, value, is_seed, hop, max_hops, n):
+    balance = [0.0] * n
+    dirty = [0.0] * n
+    edge_taint = [0.0] * len(src)
+    for e in range(len(src)):
+        s, d, v = src[e], dst[e], value[e]
+        if is_seed[s]:
+            t = v
+        else:
+            b, ts = balance[s], dirty[s]
+            # 轉出超過已知餘額的部分視為來自範圍外的乾淨資金
+            t = ts * v / b if b > v else ts
+            dirty[s] = ts - t
+            balance[s] = b - v if b > v else 0.0
+            if hop[s] >= max_hops:
+                t = 0.0
+        balance[d] += v
+        if t > 0.0:
+            dirty[d] += t
+            edge_taint[e] = t
+            if hop[s] + 1 < hop[d]:
+                hop[d] = hop[s] + 1
+    return edge_taint
+
+
+def _sweep_fifo(src, dst, value, is_seed, hop, max_hops, n, max_lots):
+    # 每個節點一個 lot 佇列 [金額, 其中污點]；超過 max_lots 時合併最新的兩批，
+    # 每個地址的記憶體有上限，而最先被轉出的舊批次維持精確
+    lots = [None] * n
+    edge_taint = [0.0] * len(src)
+    for e in range(len(src)):
+        s, d, v = src[e], dst[e], value[e]
+        if is_seed[s]:
+            t = v
+        else:
+            t = 0.0
+            queue = lots[s]
+            remaining = v
+            while remaining > 0.0 and queue:
+                lot = queue[0]
+                if lot[0] <= remaining:
+                    remaining -= lot[0]
+                    t += lot[1]
+                    queue.popleft()
+                else:
+                    part = lot[1] * remaining / lot[0]
+                    t += part
+                    lot[0] -= remaining
+                    lot[1] -= part
+                    remaining = 0.0
+            if hop[s] >= max_hops:
+                t = 0.0
+        queue = lots[d]
+        if queue is None:
+            queue = lots[d] = deque()
+        if queue:
+            last = queue[-1]
+            # 同為全乾淨或全污點的相鄰批次直接合併
+            if (t == 0.0 and last[1] == 0.0) or (t == v and last[1] == last[0]):
+                last[0] += v
+                last[1] += t
+            else:
+                queue.append([v, t])
+                if len(queue) > max_lots:
+                    newest = queue.pop()
+                    queue[-1][0] += newest[0]
+                    queue[-1][1] += newest[1]
+        else:
+            queue.append([v, t])
+        if t > 0.0:
+            edge_taint[e] = t
+            if hop[s] + 1 < hop[d]:
+                hop[d] = hop[s] + 1
+    return edge_taint
+
+
+def propagate_taint(index, seed_ids, model="haircut", max_hops=None, max_lots=64):
+    """
+    在單鏈地址圖索引上，從 seed (黑名單等) 地址出發做污點傳播。
+
+    只掃描一次依時間排序的邊 (同一時間戳依加入索引的順序)，資金不會往回流：
+    某地址在時間 t 收到的污點只影響它在 t 之後 (含) 的轉出。
+    seed 地址的每筆轉出都是全額污點。每個地址只保留固定大小的狀態
+    (poison: 是否受污染；haircut: 餘額與污點餘額；fifo: 至多 max_lots 個批次)。
+    金額以原生幣計算；max_hops 之外的地址不再往外傳遞污點。
+    """
+    if model not in TAINT_MODELS:
+        raise ValueError(f"不支援的污點模型: {model}")
+    started = time.perf_counter()
+    seed_ids = np.asarray(seed_ids, dtype=np.int64)
+    with index._lock:
+        edges = reachable_edges(index, seed_ids, max_hops)
+        edges = edges[np.lexsort((edges, index.timestamp[edges]))]
+        src, dst, value = index.src[edges], index.dst[edges], index.value[edges]
+
+    # 範圍內的節點改用連續的區域 id，狀態陣列只需涵蓋這些節點
+    node_ids, local = np.unique(np.concatenate([src, dst, seed_ids[seed_ids >= 0]]),
+                                return_inverse=True)
+    m = len(edges)
+    src_l, dst_l = local[:m], local[m:2 * m]
+    n = len(node_ids)
+    is_seed = np.isin(node_ids, seed_ids)
+    hop_limit = max_hops if max_hops is not None else n + 1
+    hop = np.where(is_seed, 0, n + 1).tolist()
+
+    src_list, dst_list, value_list = src_l.tolist(), dst_l.tolist(), value.tolist()
+    if model == "poison":
+        edge_taint = _sweep_poison(src_list, dst_list, value_list, is_seed.tolist(), hop, hop_limit)
+    elif model == "haircut":
+        edge_taint = _sweep_haircut(src_list, dst_list, value_list, is_seed.tolist(), hop, hop_limit, n)
+    else:
+        edge_taint = _sweep_fifo(src_list, dst_list, value_list, is_seed.tolist(), hop, hop_limit,
+                                 n, max(1, max_lots))
+
+    edge_taint = np.asarray(edge_taint, dtype=np.float64)
+    received = np.bincount(dst_l, weights=value, minlength=n)
+    tainted = np.bincount(dst_l, weights=edge_taint, minlength=n)
+    hops = np.asarray(hop, dtype=np.int64)
+    hops[hops > n] = -1
+    hit = edge_taint > 0
+    return TaintResult(model, np.unique(seed_ids[seed_ids >= 0]), node_ids, received, tainted, hops,
+                       edges[hit], edge_taint[hit], m, time.perf_counter() - started)
+
+
+# 每個索引保留的污點傳播結果數
+MAX_CACHED_RESULTS = 8
+
+
+def cached_taint(index, seed_ids, model="haircut", max_hops=None, max_lots=64):
+    """
+    同 propagate_taint，但結果快取在索引上 (依模型、跳數與 seed 集合)；
+    索引加入新的邊時快取即清空。回傳 (TaintResult, 是否命中快取)。
+    """
+    seeds = np.unique(np.asarray(seed_ids, dtype=np.int64))
+    # 含邊數：計算期間有新的邊加入時，舊結果不會被當成新的
+    key = ("taint", index.edge_count, model, max_hops, max_lots, seeds.tobytes())
+    result = index.derived.get(key)
+    if result is not None:
+        return result, True
+    result = propagate_taint(index, seeds, model, max_hops, max_lots)
+    with index._lock:
+        stale = [k for k in index.derived if k[0] == "taint"]
+        if len(stale) >= MAX_CACHED_RESULTS:
+            index.derived.pop(stale[0], None)
+        index.derived[key] = result
+    return result, False
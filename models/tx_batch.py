@@ -0,0 +1,371 @@
+# models/tx_batch.py
+import time
+import numpy as np
+
+from services.address_book import get_address_book
+
+WEI_PER_NATIVE = 10**18
+# 精確金額：wei = whole * 10**18 + frac (0 <= frac < 10**18)，兩欄皆為 int64，
+# 不受 float64 在 2^53 以上失去精度的影響 (可表示到約 9.2e36 wei)
+WEI_DTYPE = np.dtype([("whole", np.int64), ("frac", np.int64)])
+_WEI_DIGITS = 18
+
+
+def _wei_from_ints(values):
+    """ 逐筆 (Python int) 建立 WEI_DTYPE 陣列；僅用於無法向量化解析的資料，超出範圍視為 0。 """
+    exact = np.zeros(len(values), dtype=WEI_DTYPE)
+    for i, v in enumerate(values):
+        try:
+            exact[i] = divmod(v, WEI_PER_NATIVE)
+        except OverflowError:
+            pass
+    return exact
+
+
+def _to_int(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        try:
+            return int(float(v))
+        except (TypeError, ValueError, OverflowError):
+            return 0
+
+
+def _split_digits(arr):
+    """
+    十進位字串 (最多 36 位數) => WEI_DTYPE：依字串長度分組，每組以固定欄位切出
+    前段與末 18 位數，再各自轉成 int64 (不逐筆轉成 Python int)。
+    """
+    b = arr.astype("S")
+    n, width = len(b), b.dtype.itemsize
+    if width > 2 * _WEI_DIGITS:
+        raise ValueError("超過 36 位數")
+    lengths = np.char.str_len(b)
+    exact = np.zeros(n, dtype=WEI_DTYPE)
+    short = lengths <= _WEI_DIGITS
+    exact["frac"][short] = b[short].astype(np.int64)
+    chars = b.view(np.uint8).reshape(n, width)
+    for length in np.unique(lengths[~short]).tolist():
+        rows = np.flatnonzero(lengths == length)
+        head = length - _WEI_DIGITS
+        part = chars[rows, :length]
+        exact["whole"][rows] = np.ascontiguousarray(part[:, :head]).view(f"S{head}").ravel().astype(np.int64)
+        exact["frac"][rows] = np.ascontiguousarray(part[:, head:]).view(f"S{_WEI_DIGITS}").ravel().astype(np.int64)
+    return exact
+
+
+def _parse_wei(raw_values):
+    """
+    將金額 (wei，字串或 int) 轉成 (float64 陣列, WEI_DTYPE 精確陣列)；無法解析的值視為 0。
+    小於 2^63 時整欄直接轉 int64；較大的十進位字串依長度分組切成兩段解析；
+    其他格式才逐筆轉成 Python int。
+    """
+    arr = np.asarray(raw_values, dtype=object)
+    try:
+        try:
+            ints = arr.astype(np.int64)
+            exact = np.empty(len(arr), dtype=WEI_DTYPE)
+            exact["whole"], exact["frac"] = np.divmod(ints, WEI_PER_NATIVE)
+        except OverflowError:
+            exact = _split_digits(arr)
+        if (exact["whole"] < 0).any() or (exact["frac"] < 0).any():
+            raise ValueError("負數")
+    except (TypeError, ValueError, OverflowError):
+        exact = _wei_from_ints([_to_int(v) for v in arr])
+    return wei_to_float(exact), exact
+
+
+def _wei_from_float(value_wei):
+    """ float64 wei => WEI_DTYPE (只有 float 精度的資料，例如舊格式的交易 dict)。 """
+    value_wei = np.nan_to_num(np.asarray(value_wei, dtype=np.float64))
+    exact = np.empty(len(value_wei), dtype=WEI_DTYPE)
+    whole = np.floor(value_wei / WEI_PER_NATIVE)
+    exact["whole"] = whole
+    exact["frac"] = np.clip(value_wei - whole * WEI_PER_NATIVE, 0, WEI_PER_NATIVE - 1)
+    return exact
+
+
+def wei_to_float(exact):
+    """ WEI_DTYPE => float64 wei (供加總、換算 USD 等聚合運算)。 """
+    whole, frac = exact["whole"], exact["frac"]
+    out = whole * float(WEI_PER_NATIVE) + frac
+    neg = whole < 0
+    if neg.any():
+        # 負數以 (whole + 1) 與 10**18 - frac 計算，避免兩個大數相減的捨入誤差
+        out[neg] = (whole[neg] + 1) * float(WEI_PER_NATIVE) - (WEI_PER_NATIVE - frac[neg])
+    return out
+
+
+def wei_strings(exact):
+    """ WEI_DTYPE => 精確的十進位 wei 字串 (str 陣列)。 """
+    if len(exact) and (exact["whole"] == 0).all():
+        return exact["frac"].astype(str)
+    return np.asarray([str(int(w) * WEI_PER_NATIVE + int(f))
+                       for w, f in zip(exact["whole"].tolist(), exact["frac"].tolist())], dtype=str)
+
+
+def _parse_int(raw_values):
+    arr = np.asarray(raw_values, dtype=object)
+    try:
+        return arr.astype(np.int64)
+    except (TypeError, ValueError):
+        out = np.zeros(len(arr), dtype=np.int64)
+        for i, v in enumerate(arr):
+            try:
+                out[i] = int(v)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+
+def _parse_time(time_str):
+    try:
+        return int(time.mktime(time.strptime(time_str, "%Y-%m-%d %H:%M:%S")))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def format_time(tstamp):
+    """ epoch 秒 => 'YYYY-mm-dd HH:MM:SS' (本地時間)。 """
+    try:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(int(tstamp)))
+    except (ValueError, OverflowError, OSError):
+        return "未知時間"
+
+
+class TransactionBatch:
+    """
+    欄式 (columnar) 交易批次，篩選、摘要與異常偵測共用。
+
+    欄位：
+      - hashes: object 陣列，交易哈希
+      - from_ids / to_ids: int32 陣列，指向 addresses 的索引
+      - addresses: object 陣列，小寫地址表
+      - gids: int32 陣列，addresses 中每個地址在行程共用地址字典的 id (建立時配發)
+      - value_wei: float64 陣列，金額 (wei)，供加總與換算；超過 2^53 時有捨入誤差
+      - wei: WEI_DTYPE 陣列，精確金額，供匯出與金額排序
+      - timestamps: int64 陣列，epoch 秒
+      - blocks: int64 陣列，區塊高度
+      - times: object 陣列或 None，已格式化的時間字串
+    """
+
+    __slots__ = ("hashes", "from_ids", "to_ids", "addresses", "value_wei",
+                 "timestamps", "blocks", "times", "wei", "_value", "_gids")
+
+    def __init__(self, hashes, from_ids, to_ids, addresses, value_wei,
+                 timestamps, blocks, times=None, gids=None, wei=None):
+        self.hashes = hashes
+        self.from_ids = from_ids
+        self.to_ids = to_ids
+        self.addresses = addresses
+        self.value_wei = value_wei
+        self.wei = _wei_from_float(value_wei) if wei is None else wei
+        self.timestamps = timestamps
+        self.blocks = blocks
+        self.times = times
+        self._value = None
+        self._gids = gids
+
+    def __getstate__(self):
+        # 地址字典 id 只在本行程有效，序列化 (快取、session) 時不保存，載入後重新配發
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ("_value", "_gids")}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        if "wei" not in state:
+            self.wei = _wei_from_float(self.value_wei)
+        self._value = None
+        self._gids = None
+
+    @classmethod
+    def _build(cls, txs, value_wei, timestamps, blocks, times=None, wei=None):
+        n = len(txs)
+        hashes = np.empty(n, dtype=object)
+        hashes[:] = [tx.get("hash", "") for tx in txs]
+        raw_addrs = [(tx.get("from") or "").lower() for tx in txs]
+        raw_addrs += [(tx.get("to") or "").lower() for tx in txs]
+        addresses, inverse = np.unique(np.asarray(raw_addrs, dtype=object),
+                                       return_inverse=True)
+        inverse = inverse.astype(np.int32)
+        return cls(hashes, inverse[:n], inverse[n:], addresses,
+                   value_wei, timestamps, blocks, times,
+                   gids=get_address_book().intern_many(addresses.astype(str)), wei=wei)
+
+    @classmethod
+    def from_raw(cls, raw_txs):
+        """ 由 txlist API 原始資料 (數值皆為字串) 建立。 """
+        if not raw_txs:
+            return cls.empty()
+        value_wei, wei = _parse_wei([tx.get("value", "0") for tx in raw_txs])
+        timestamps = _parse_int([tx.get("timeStamp", "0") for tx in raw_txs])
+        blocks = _parse_int([tx.get("blockNumber", "0") for tx in raw_txs])
+        return cls._build(raw_txs, value_wei, timestamps, blocks, wei=wei)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        由已處理的交易 dict (value 為原生幣金額、time 為時間字串) 建立。
+        有 value_wei (to_records 產生的精確字串) 時以它為準。
+        """
+        if not records:
+            return cls.empty()
+        if all("value_wei" in tx for tx in records):
+            value_wei, wei = _parse_wei([tx["value_wei"] for tx in records])
+        else:
+            value_wei = np.asarray([tx.get("value", 0.0) for tx in records],
+                                   dtype=np.float64) * WEI_PER_NATIVE
+            wei = None
+        if all("timeStamp" in tx for tx in records):
+            timestamps = _parse_int([tx["timeStamp"] for tx in records])
+        else:
+            timestamps = np.asarray([_parse_time(tx.get("time")) for tx in records],
+                                    dtype=np.int64)
+        blocks = _parse_int([tx.get("blockNumber", 0) for tx in records])
+        times = np.empty(len(records), dtype=object)
+        times[:] = [tx.get("time", "未知時間") for tx in records]
+        return cls._build(records, value_wei, timestamps, blocks, times, wei=wei)
+
+    @classmethod
+    def coerce(cls, transactions):
+        """ 若已是 TransactionBatch 直接回傳，否則由交易 dict 建立。 """
+        if isinstance(transactions, cls):
+            return transactions
+        return cls.from_records(transactions)
+
+    @classmethod
+    def concat(cls, batches):
+        """ 合併多個批次 (地址表重新建立)。 """
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        all_addrs = np.concatenate([b.addresses for b in batches])
+        addresses, first, inverse = np.unique(all_addrs, return_index=True, return_inverse=True)
+        inverse = inverse.astype(np.int32)
+        from_ids, to_ids, base = [], [], 0
+        for b in batches:
+            remap = inverse[base:base + len(b.addresses)]
+            from_ids.append(remap[b.from_ids])
+            to_ids.append(remap[b.to_ids])
+            base += len(b.addresses)
+        if all(b.times is not None for b in batches):
+            times = np.concatenate([b.times for b in batches])
+        else:
+            times = None
+        gids = np.concatenate([b.gids for b in batches])[first]
+        return cls(np.concatenate([b.hashes for b in batches]),
+                   np.concatenate(from_ids), np.concatenate(to_ids), addresses,
+                   np.concatenate([b.value_wei for b in batches]),
+                   np.concatenate([b.timestamps for b in batches]),
+                   np.concatenate([b.blocks for b in batches]), times, gids=gids,
+                   wei=np.concatenate([b.wei for b in batches]))
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=object), np.empty(0, dtype=np.int32),
+                   np.empty(0, dtype=np.int32), np.empty(0, dtype=object),
+                   np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int64),
+                   np.empty(0, dtype=np.int64), gids=np.empty(0, dtype=np.int32),
+                   wei=np.empty(0, dtype=WEI_DTYPE))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @property
+    def value(self):
+        """ 原生幣金額 (value_wei / 10**18)。 """
+        if self._value is None:
+            self._value = self.value_wei / WEI_PER_NATIVE
+        return self._value
+
+    @property
+    def gids(self):
+        """ addresses 對應的地址字典 id；反序列化後的批次在第一次取用時重新配發。 """
+        if self._gids is None:
+            self._gids = get_address_book().intern_many(self.addresses.astype(str))
+        return self._gids
+
+    @property
+    def from_gids(self):
+        return self.gids[self.from_ids]
+
+    @property
+    def to_gids(self):
+        return self.gids[self.to_ids]
+
+    def take(self, index):
+        """ 以布林遮罩或索引陣列取出子批次 (地址表共用)。 """
+        times = self.times[index] if self.times is not None else None
+        return TransactionBatch(self.hashes[index], self.from_ids[index],
+                                self.to_ids[index], self.addresses,
+                                self.value_wei[index], self.timestamps[index],
+                                self.blocks[index], times, gids=self._gids, wei=self.wei[index])
+
+    def address_id(self, address):
+        """ 回傳地址在 addresses 中的索引；不存在則回傳 -1。 """
+        address = (address or "").lower()
+        i = int(np.searchsorted(self.addresses, address))
+        if i < len(self.addresses) and self.addresses[i] == address:
+            return i
+        return -1
+
+    def address_flags(self, addresses):
+        """
+        回傳 bool 陣列，標記 addresses 表中哪些地址屬於給定集合。
+        集合若提供 contains_ids (例如 BlacklistMatcher)，以地址字典 id 查表；
+        提供 contains_many 時整欄一次批次比對。
+        """
+        if hasattr(addresses, "contains_ids"):
+            return addresses.contains_ids(self.gids)
+        if hasattr(addresses, "contains_many"):
+            return addresses.contains_many(self.addresses)
+        return np.fromiter((a in addresses for a in self.addresses),
+                           dtype=bool, count=len(self.addresses))
+
+    def value_mask(self, min_val=0.0, max_val=None):
+        """ 原生幣金額介於 [min_val, max_val] 的遮罩。 """
+        value = self.value
+        mask = value >= min_val
+        if max_val is not None:
+            mask &= value <= max_val
+        return mask
+
+    def time_str(self, i):
+        if self.times is not None:
+            return self.times[i]
+        return format_time(self.timestamps[i])
+
+    def from_addr(self, i):
+        return self.addresses[self.from_ids[i]]
+
+    def to_addr(self, i):
+        return self.addresses[self.to_ids[i]]
+
+    def usd_values(self, usd_price):
+        """ 以單一匯率換算每筆交易的 USD 金額 (四捨五入至小數 2 位)。 """
+        return np.round(self.value * usd_price, 2)
+
+    def to_records(self, usd_values=None):
+        """ 轉回交易 dict list，供模板、匯出與圖表使用。 """
+        value = self.value.tolist()
+        wei = wei_strings(self.wei).tolist()
+        usd = usd_values.tolist() if usd_values is not None else None
+        records = []
+        for i in range(len(self)):
+            rec = {
+                "hash": self.hashes[i],
+                "from": self.from_addr(i),
+                "to": self.to_addr(i),
+                "value": value[i],
+                "value_wei": wei[i],
+                "time": self.time_str(i),
+                "timeStamp": str(self.timestamps[i]),
+                "blockNumber": str(self.blocks[i]),
+            }
+            if usd is not None:
+                rec["usd_value"] = usd[i]
+            records.append(rec)
+        return records
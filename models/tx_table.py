@@ -0,0 +1,70 @@
+# models/tx_table.py
+import numpy as np
+
+# 可排序欄位：時間、原生幣金額、USD 金額、交易對手 (依地址字串排序)
+SORT_FIELDS = ("time", "value", "usd_value", "counterparty")
+# 交易方向篩選：in = 流入錢包、out = 由錢包流出
+DIRECTIONS = ("in", "out")
+
+
+def counterparty_ids(batch, wallet_address):
+    """ 每筆交易的交易對手在 addresses 中的索引 (錢包為 from 時取 to，否則取 from)。 """
+    wallet_id = batch.address_id(wallet_address)
+    return np.where(batch.from_ids == wallet_id, batch.to_ids, batch.from_ids)
+
+
+def text_mask(batch, text):
+    """ 交易哈希、from 或 to 包含 text (不分大小寫) 的遮罩；地址比對以地址表為單位只做一次。 """
+    text = text.lower()
+    addr_hit = np.fromiter((text in a for a in batch.addresses), dtype=bool,
+                           count=len(batch.addresses))
+    mask = addr_hit[batch.from_ids] | addr_hit[batch.to_ids]
+    if not mask.all():
+        mask |= np.fromiter((text in h.lower() for h in batch.hashes), dtype=bool, count=len(batch))
+    return mask
+
+
+def table_order(batch, usd_values, wallet_address, sort="time", descending=True, text=None,
+                min_value=None, max_value=None, direction=None, flagged=None):
+    """
+    結果表格的列順序：依條件篩選後排序，回傳 batch 中的列索引 (int64 陣列)。
+
+    參數：
+      - sort / descending: 排序欄位 (SORT_FIELDS) 與方向；相同值依時間新到舊
+      - text: 交易哈希 / 地址的部分字串
+      - min_value / max_value: 原生幣金額範圍
+      - direction: "in" / "out" (相對於 wallet_address)
+      - flagged: bool 陣列，只保留為 True 的列 (例如異常交易)
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"不支援的排序欄位: {sort}")
+    mask = np.ones(len(batch), dtype=bool)
+    if text:
+        mask &= text_mask(batch, text)
+    if min_value is not None:
+        mask &= batch.value >= min_value
+    if max_value is not None:
+        mask &= batch.value <= max_value
+    if direction in DIRECTIONS:
+        wallet_id = batch.address_id(wallet_address)
+        mask &= (batch.to_ids == wallet_id) if direction == "in" else \
+            (batch.from_ids == wallet_id) & (batch.to_ids != wallet_id)
+    if flagged is not None:
+        mask &= flagged
+    rows = np.flatnonzero(mask)
+
+    if sort == "time":
+        keys = [batch.timestamps[rows]]
+    elif sort == "value":
+        # 以精確金額 (整數原生幣, 剩餘 wei) 排序，float64 無法區分的大金額也不會被當成同值
+        wei = batch.wei[rows]
+        keys = [wei["frac"], wei["whole"]]
+    elif sort == "usd_value":
+        keys = [np.asarray(usd_values, dtype=np.float64)[rows]]
+    else:
+        # addresses 已排序，索引大小即地址字串順序
+        keys = [counterparty_ids(batch, wallet_address)[rows]]
+    if descending:
+        keys = [-key for key in keys]
+    # 次要排序：時間新到舊；lexsort 為穩定排序，最後以原始順序決定
+    return rows[np.lexsort((-batch.timestamps[rows], *keys))]
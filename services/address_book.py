@@ -0,0 +1,268 @@
+# services/address_book.py
+import os
+import logging
+import threading
+import numpy as np
+
+ADDRESS_BYTES = 20
+KEY_DTYPE = np.dtype(f"S{ADDRESS_BYTES}")
+_EMPTY_KEYS = np.empty(0, dtype=KEY_DTYPE)
+_EMPTY_IDS = np.empty(0, dtype=np.int32)
+
+# ASCII => 十六進位數值，非 hex 字元為 255
+_HEX_TABLE = np.full(128, 255, dtype=np.uint8)
+for _i, _c in enumerate("0123456789abcdef"):
+    _HEX_TABLE[ord(_c)] = _i
+    _HEX_TABLE[ord(_c.upper())] = _i
+# 十六進位數值 => ASCII (小寫)
+_HEX_CHARS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+def encode_addresses(addresses):
+    """
+    將一整欄 0x 開頭、40 個 hex 字元的地址向量化轉成 20 bytes 的鍵 (不做逐筆 Python 迴圈)。
+    回傳 (keys: S20 陣列, valid: bool 陣列)；不合法的地址 valid 為 False、鍵為全 0。
+    """
+    arr = np.asarray(addresses, dtype=str).ravel()
+    n = len(arr)
+    width = arr.dtype.itemsize // 4
+    if n == 0 or width < 2 + 2 * ADDRESS_BYTES:
+        return np.zeros(n, dtype=KEY_DTYPE), np.zeros(n, dtype=bool)
+
+    codes = arr.view(np.uint32).reshape(n, width)
+    valid = (np.char.str_len(arr) == 2 + 2 * ADDRESS_BYTES) & (codes[:, 0] == ord("0")) & \
+        ((codes[:, 1] == ord("x")) | (codes[:, 1] == ord("X")))
+    nib = _HEX_TABLE[np.minimum(codes[:, 2:2 + 2 * ADDRESS_BYTES], 127)]
+    bad = nib == 255
+    valid &= ~bad.any(axis=1)
+    nib[bad] = 0
+    raw = np.ascontiguousarray((nib[:, 0::2] << 4) | nib[:, 1::2])
+    keys = raw.view(KEY_DTYPE).ravel()
+    keys[~valid] = b""
+    return keys, valid
+
+
+def decode_keys(keys):
+    """ encode_addresses 的反向：20 bytes 鍵 => "0x" + 40 個小寫 hex 字元 (object 陣列)。 """
+    n = len(keys)
+    if n == 0:
+        return np.empty(0, dtype=object)
+    raw = np.ascontiguousarray(keys, dtype=KEY_DTYPE).view(np.uint8).reshape(n, ADDRESS_BYTES)
+    chars = np.empty((n, 2 + 2 * ADDRESS_BYTES), dtype=np.uint8)
+    chars[:, 0], chars[:, 1] = ord("0"), ord("x")
+    chars[:, 2::2] = _HEX_CHARS[raw >> 4]
+    chars[:, 3::2] = _HEX_CHARS[raw & 15]
+    return chars.view(f"S{2 + 2 * ADDRESS_BYTES}").ravel().astype(str).astype(object)
+
+
+class AddressBook:
+    """
+    地址字典：每個地址在第一次出現 (交易進入系統) 時取得一個密集的 int32 id，
+    之後批次、黑名單比對與地址圖都以 id 陣列運算，不再反覆對 42 字元字串做小寫與雜湊。
+
+    - 合法地址以 20 bytes 鍵保存 (依 id 排列)，另有排序索引供向量化二分搜尋；
+      新地址以 np.insert 併入排序索引，不需整體重排
+    - 不合法的字串 (空字串、測試用標籤) 以字串 dict 配發 id
+    - save() / path：寫成 .npz 快照 (暫存檔 + os.replace)，重新啟動或其他行程啟動時載入，
+      同一批地址得到相同 id；之後新增的地址 id 只在本行程內有效，
+      因此需要持久化的結構 (例如地址圖索引) 仍以地址字串保存
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys = np.zeros(1024, dtype=KEY_DTYPE)
+        self._is_label = np.zeros(1024, dtype=bool)
+        self._size = 0
+        self._sorted_keys = _EMPTY_KEYS
+        self._sorted_ids = _EMPTY_IDS
+        self._labels = {}        # 字串 => id
+        self._label_names = {}   # id => 字串
+        self._saved_size = 0
+        if path:
+            self.load(path)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def keys(self):
+        """ 依 id 排列的 20 bytes 鍵 (標籤的鍵為全 0，以 label_mask 區分)。 """
+        return self._keys[:self._size]
+
+    @property
+    def label_mask(self):
+        return self._is_label[:self._size]
+
+    def labels(self):
+        """ 標籤 id => 字串 (快照)。 """
+        with self._lock:
+            return dict(self._label_names)
+
+    def snapshot(self, start=0):
+        """
+        id >= start 的 (鍵, 標籤旗標, 標籤 id => 字串) 一致快照。
+        keys / label_mask 屬性在其他執行緒擴充陣列時可能讀到不同版本，需要對齊時使用本方法。
+        """
+        with self._lock:
+            size = self._size
+            keys, is_label = self._keys[start:size], self._is_label[start:size]
+            labels = dict(self._label_names) if is_label.any() else {}
+        return keys, is_label, labels
+
+    # ---------- 查詢 / 配發 ----------
+    def _find(self, keys):
+        """ 已排序、不重複的鍵 => id (不存在為 -1)。 """
+        if len(self._sorted_keys) == 0 or len(keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int32)
+        pos = np.minimum(np.searchsorted(self._sorted_keys, keys), len(self._sorted_keys) - 1)
+        return np.where(self._sorted_keys[pos] == keys, self._sorted_ids[pos], -1).astype(np.int32)
+
+    def _reserve(self, count):
+        """
+        確保容量並回傳接下來 count 個 id；呼叫端寫入鍵與標籤旗標後再以 _publish 更新 _size，
+        其他執行緒不會看到尚未寫入 (全 0) 的鍵。
+        """
+        start = self._size
+        need = start + count
+        if need > len(self._keys):
+            capacity = max(need, 2 * len(self._keys))
+            keys = np.zeros(capacity, dtype=KEY_DTYPE)
+            keys[:start] = self._keys[:start]
+            is_label = np.zeros(capacity, dtype=bool)
+            is_label[:start] = self._is_label[:start]
+            self._keys, self._is_label = keys, is_label
+        return np.arange(start, need, dtype=np.int32)
+
+    def _publish(self, ids):
+        if len(ids):
+            self._size = int(ids[-1]) + 1
+
+    def _add_keys(self, new_keys):
+        """ new_keys 已排序、不重複且都不存在。 """
+        ids = self._reserve(len(new_keys))
+        self._keys[ids] = new_keys
+        pos = np.searchsorted(self._sorted_keys, new_keys)
+        self._sorted_keys = np.insert(self._sorted_keys, pos, new_keys)
+        self._sorted_ids = np.insert(self._sorted_ids, pos, ids)
+        self._publish(ids)
+        return ids
+
+    def _label_id(self, label, create):
+        lid = self._labels.get(label)
+        if lid is None and create:
+            ids = self._reserve(1)
+            lid = int(ids[0])
+            self._is_label[lid] = True
+            self._labels[label] = lid
+            self._label_names[lid] = label
+            self._publish(ids)
+        return -1 if lid is None else lid
+
+    def _resolve(self, addresses, create):
+        addresses = np.asarray(addresses, dtype=str).ravel()
+        keys, valid = encode_addresses(addresses)
+        ids = np.full(len(addresses), -1, dtype=np.int32)
+        with self._lock:
+            if valid.any():
+                uniq, inverse = np.unique(keys[valid], return_inverse=True)
+                found = self._find(uniq)
+                missing = found < 0
+                if create and missing.any():
+                    found[missing] = self._add_keys(uniq[missing])
+                ids[valid] = found[inverse]
+            for i in np.flatnonzero(~valid):
+                ids[i] = self._label_id(addresses[i].strip().lower(), create)
+        return ids
+
+    def intern_many(self, addresses):
+        """ 地址 (字串陣列) => id 陣列；新地址配發新 id。 """
+        return self._resolve(addresses, create=True)
+
+    def lookup_many(self, addresses):
+        """ 同 intern_many，但不配發新 id (不存在為 -1)。 """
+        return self._resolve(addresses, create=False)
+
+    def intern(self, address):
+        return int(self.intern_many([address or ""])[0])
+
+    def lookup(self, address):
+        return int(self.lookup_many([address or ""])[0])
+
+    def address_strings(self, ids):
+        """ id 陣列 => 地址字串 (object 陣列)。 """
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        out = decode_keys(self._keys[ids])
+        label = self._is_label[ids]
+        if label.any():
+            names = self._label_names
+            for i in np.flatnonzero(label):
+                out[i] = names[int(ids[i])]
+        return out
+
+    # ---------- 持久化 ----------
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            if self._size == self._saved_size and os.path.exists(path):
+                return
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            label_ids = np.fromiter(self._label_names, dtype=np.int32, count=len(self._label_names))
+            label_names = np.asarray([self._label_names[i] for i in label_ids.tolist()], dtype=str)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                np.savez(fh, keys=self.keys, label_ids=label_ids, label_names=label_names)
+            os.replace(tmp, path)   # 原子替換
+            self._saved_size = self._size
+
+    def load(self, path):
+        """
+        載入快照並之後 save() 到 path。字典仍是空的時直接沿用快照的 id；
+        已有地址時 (例如測試中已建立過批次) 改為逐一併入，既有 id 不變。
+        """
+        self.path = path
+        if not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as data:
+                keys = data["keys"].astype(KEY_DTYPE)
+                label_ids = data["label_ids"].astype(np.int32)
+                label_names = data["label_names"].tolist()
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"地址字典載入失敗 {path}: {e}")
+            return
+        with self._lock:
+            empty = self._size == 0
+            if empty:
+                self._restore(keys, label_ids, label_names)
+        if not empty:
+            is_label = np.zeros(len(keys), dtype=bool)
+            is_label[label_ids] = True
+            self.intern_many(decode_keys(keys[~is_label]).astype(str))
+            self.intern_many(label_names)
+        logging.info(f"地址字典已載入 {len(keys)} 筆")
+
+    def _restore(self, keys, label_ids, label_names):
+        ids = self._reserve(len(keys))
+        self._keys[:len(keys)] = keys
+        self._is_label[label_ids] = True
+        self._labels = dict(zip(label_names, label_ids.tolist()))
+        self._label_names = {i: name for name, i in self._labels.items()}
+        real = np.flatnonzero(~self._is_label[:len(keys)]).astype(np.int32)
+        order = np.argsort(keys[real], kind="stable")
+        self._sorted_keys = keys[real][order]
+        self._sorted_ids = real[order]
+        self._publish(ids)
+        self._saved_size = self._size
+
+
+# 行程共用的地址字典；app 啟動時以 address_book.load(ADDRESS_BOOK_PATH) 載入持久化快照
+address_book = AddressBook()
+
+
+def get_address_book():
+    return address_book
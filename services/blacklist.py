@@ -0,0 +1,259 @@
+# services/blacklist.py
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import numpy as np
+
+from config import (BLACKLISTED_WALLETS, BLACKLIST_FEEDS, BLACKLIST_DB_PATH,
+                    BLACKLIST_RELOAD_INTERVAL)
+# 地址編碼移至 address_book；在此重新匯出，維持既有的 import 路徑
+from services.address_book import ADDRESS_BYTES, KEY_DTYPE, encode_addresses, get_address_book  # noqa: F401
+
+_EMPTY_KEYS = np.empty(0, dtype=KEY_DTYPE)
+
+
+def _sorted_contains(sorted_keys, keys):
+    if len(sorted_keys) == 0 or len(keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return sorted_keys[pos] == keys
+
+
+def read_feed(path):
+    """
+    讀取名單檔：.json 為地址字串陣列；其他格式每行一筆 (取逗號前第一欄，# 開頭為註解)。
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        if path.lower().endswith(".json"):
+            return [str(a).strip() for a in json.load(fh)]
+        entries = []
+        for line in fh:
+            line = line.split(",", 1)[0].strip()
+            if line and not line.startswith("#"):
+                entries.append(line)
+        return entries
+
+
+def compile_feeds(feed_paths, out_path=None):
+    """
+    將多個名單檔編譯成排序、去重的 20 bytes 鍵陣列；out_path 不為 None 時寫成 .npy
+    (先寫暫存檔再 os.replace，讀取端不會看到寫到一半的檔案)。回傳鍵陣列。
+    """
+    parts = []
+    for path in feed_paths:
+        entries = read_feed(path)
+        keys, valid = encode_addresses(entries)
+        if not valid.all():
+            logging.warning(f"名單 {path} 有 {int((~valid).sum())} 筆不是合法地址，已略過")
+        parts.append(keys[valid])
+    keys = np.unique(np.concatenate(parts)) if parts else _EMPTY_KEYS
+    if out_path:
+        directory = os.path.dirname(out_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{out_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.save(fh, keys)
+        os.replace(tmp, out_path)
+    return keys
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _load_keys(path):
+    """ 以唯讀 mmap 開啟編譯好的名單，多個 worker 行程共用同一份 page cache。 """
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # 空陣列無法 mmap
+        return np.load(path)
+
+
+class BlacklistMatcher:
+    """
+    黑名單比對器。
+
+    大型名單 (制裁 / 詐騙地址 feed，可達數百萬筆) 編譯成排序後的 20 bytes 二進位陣列 (.npy)，
+    以 mmap 唯讀載入，查詢時整欄地址一次向量化編碼再二分搜尋。
+    名單檔比編譯檔新時在背景執行緒重新編譯 (查詢不等待、不持有鎖)，鎖內只切換陣列；
+    編譯檔被替換 (任何行程，例如 python -m services.blacklist) 時，下次檢查即切換到新版本。
+    extra 為 config 中的少量地址，不合法的 hex 字串 (例如測試用標籤) 以字串集合比對。
+    """
+
+    def __init__(self, path=None, feeds=(), extra=(), check_interval=30):
+        self.path = path
+        self.feeds = [f for f in feeds if f]
+        self.check_interval = check_interval
+        extra = [str(a).strip().lower() for a in extra if a]
+        extra_keys, valid = encode_addresses(extra)
+        self._extra_keys = np.unique(extra_keys[valid])
+        self._extra_labels = frozenset(a for a, ok in zip(extra, valid) if not ok)
+        self._keys = _EMPTY_KEYS
+        # 地址字典 id => 是否命中 (依字典成長增量補算，名單換版時清空)
+        self._id_flags = np.zeros(0, dtype=bool)
+        self._id_flags_source = None
+        self._version = 0
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._compile_lock = threading.Lock()
+        self._compiler = None   # 背景編譯執行緒
+        self.reload()
+
+    def __len__(self):
+        return len(self._keys) + len(self._extra_keys) + len(self._extra_labels)
+
+    def __contains__(self, address):
+        return bool(self.contains_many([address])[0])
+
+    def contains_many(self, addresses):
+        """ 批次比對：回傳與 addresses 等長的 bool 陣列。 """
+        addresses = np.asarray(addresses, dtype=str).ravel()
+        keys, valid = encode_addresses(addresses)
+        keys_db = self._keys   # 取當下版本，重新載入時不受影響
+        hit = valid & (_sorted_contains(keys_db, keys) | _sorted_contains(self._extra_keys, keys))
+        if self._extra_labels:
+            for i in np.flatnonzero(~valid):
+                hit[i] = addresses[i].lower() in self._extra_labels
+        return hit
+
+    def contains_ids(self, ids, book=None):
+        """
+        以地址字典 id 比對 (ids 為 int 陣列，-1 視為不命中)：每個 id 的結果只在第一次出現時
+        以 20 bytes 鍵計算一次，之後都是陣列索引。
+        """
+        book = book or get_address_book()
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            keys_db, source = self._keys, (book, self._version)
+            flags = self._id_flags
+            if self._id_flags_source != source:
+                flags = np.zeros(0, dtype=bool)
+            if len(flags) < len(book):
+                # 在字典的鎖內取鍵與標籤旗標，不會讀到其他執行緒剛配發、尚未寫入的鍵
+                keys, is_label, labels = book.snapshot(len(flags))
+                fresh = ~is_label & (_sorted_contains(keys_db, keys) |
+                                     _sorted_contains(self._extra_keys, keys))
+                if self._extra_labels and is_label.any():
+                    for i in np.flatnonzero(is_label):
+                        fresh[i] = labels.get(len(flags) + int(i)) in self._extra_labels
+                flags = np.concatenate([flags, fresh])
+                self._id_flags, self._id_flags_source = flags, source
+        hit = np.zeros(len(ids), dtype=bool)
+        ok = (ids >= 0) & (ids < len(flags))
+        hit[ok] = flags[ids[ok]]
+        return hit
+
+    def _feeds_newer(self):
+        db = _file_signature(self.path)
+        if db is None:
+            return True
+        for feed in self.feeds:
+            sig = _file_signature(feed)
+            if sig is None:
+                logging.warning(f"黑名單來源 {feed} 不存在")
+            elif sig[0] > db[0]:
+                return True
+        return False
+
+    def _needs_compile(self, existing):
+        return bool(existing) and (not self.path or self._feeds_newer())
+
+    def _compile(self, existing):
+        """ 編譯名單 (不持有比對用的鎖，查詢不受影響)；無編譯檔路徑時回傳鍵陣列。 """
+        with self._compile_lock:
+            try:
+                return compile_feeds(existing, self.path)
+            except (OSError, ValueError) as e:
+                logging.error(f"黑名單編譯失敗: {e}")
+                return None
+
+    def _swap(self, keys=None):
+        """ 在鎖內切換到新的鍵陣列 (或已替換的編譯檔的 mmap)；有切換版本時回傳 True。 """
+        if not self.path:
+            if keys is None:
+                return False
+            with self._lock:
+                self._keys = keys
+                self._version += 1
+            return True
+        sig = _file_signature(self.path)
+        if sig is None or sig == self._signature:
+            return False
+        try:
+            keys = _load_keys(self.path)
+        except (OSError, ValueError) as e:
+            logging.error(f"黑名單載入失敗: {e}")
+            return False
+        with self._lock:
+            self._keys = keys
+            self._version += 1
+            self._signature = sig
+        logging.info(f"黑名單已載入 {len(keys)} 筆地址")
+        return True
+
+    def reload(self):
+        """ 必要時重新編譯並載入名單 (在呼叫端執行緒內完成)；有切換版本時回傳 True。 """
+        self._checked_at = time.time()
+        existing = [f for f in self.feeds if os.path.exists(f)]
+        keys = self._compile(existing) if self._needs_compile(existing) else None
+        return self._swap(keys)
+
+    def maybe_reload(self):
+        """
+        查詢路徑使用：依間隔檢查。名單需要重新編譯時交給背景執行緒 (完成後自動切換)，
+        本次回傳 False；只是編譯檔被其他行程替換時直接切換 mmap。
+        """
+        if time.time() - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = time.time()
+        existing = [f for f in self.feeds if os.path.exists(f)]
+        if self._needs_compile(existing):
+            with self._lock:
+                if self._compiler is None or not self._compiler.is_alive():
+                    self._compiler = threading.Thread(target=self.reload, name="blacklist-compile",
+                                                      daemon=True)
+                    self._compiler.start()
+            return False
+        return self._swap()
+
+    def wait_compiled(self, timeout=None):
+        """ 等待背景編譯完成 (測試與預先編譯用)。 """
+        compiler = self._compiler
+        if compiler is not None:
+            compiler.join(timeout)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_blacklist():
+    """ 依 config 建立的共用黑名單 (延遲建立，每次取用時依間隔檢查是否需要重新載入)。 """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                # 測試檔使用的黑名單地址是 "0xblacklisted"，一併納入
+                _default = BlacklistMatcher(BLACKLIST_DB_PATH, feeds=BLACKLIST_FEEDS,
+                                            extra=list(BLACKLISTED_WALLETS) + ["0xblacklisted"],
+                                            check_interval=BLACKLIST_RELOAD_INTERVAL)
+    _default.maybe_reload()
+    return _default
+
+
+if __name__ == "__main__":
+    # 預先編譯：python -m services.blacklist 輸出.npy 名單1 [名單2 ...]
+    if len(sys.argv) < 3:
+        sys.exit("usage: python -m services.blacklist OUT.npy FEED [FEED ...]")
+    compiled = compile_feeds(sys.argv[2:], sys.argv[1])
+    print(f"{len(compiled)} addresses => {sys.argv[1]}")
@@ -0,0 +1,250 @@
+# services/explorer.py
+import json
+import codecs
+import logging
+
+from services import http_client
+from services.metrics import stage, inc, count_rows
+from services.single_flight import SingleFlight
+from services.upstream import KeyPool, UpstreamBusy, INTERACTIVE
+
+# Etherscan 系列 API 單次查詢上限 (page * offset 不可超過此值)
+MAX_OFFSET = 10000
+# 未指定 endblock 時使用的上限區塊
+LATEST_BLOCK = 99999999
+# 串流解析時每次從 socket 讀取的位元組數
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+_json_decoder = json.JSONDecoder()
+
+# 相同 (端點, 地址, 區塊範圍, 分頁) 的並行查詢只呼叫一次 API
+_txlist_flight = SingleFlight("explorer")
+
+
+class ExplorerError(Exception):
+    """ 區塊鏈瀏覽器 API 回傳 status != "1" 時拋出，訊息為 API 的 message。 """
+
+
+class RateLimitedError(ExplorerError):
+    """ API 回應超過速率限制 (HTTP 429 或 "Max rate limit reached")，可換金鑰或稍後重試。 """
+
+
+def is_rate_limit_message(message):
+    return "rate limit" in str(message).lower()
+
+
+def _to_int(raw):
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return 0
+
+
+def slim_tx(item):
+    """
+    只保留後續流程會用到的欄位，數值轉為 int (from/to 轉小寫)；
+    其餘約 20 個欄位 (input、gas、confirmations 等) 直接丟棄。
+    """
+    return {
+        "hash": item.get("hash", ""),
+        "from": (item.get("from") or "").lower(),
+        "to": (item.get("to") or "").lower(),
+        "value": _to_int(item.get("value")),
+        "timeStamp": _to_int(item.get("timeStamp")),
+        "blockNumber": _to_int(item.get("blockNumber")),
+    }
+
+
+class _ChunkReader:
+    """ 將 bytes chunk 串流遞增解碼成字串緩衝區；已解析的部分會被丟棄，緩衝區只保留未處理的尾段。 """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """ 再讀一個 chunk；已到結尾時回傳 False。 """
+        if self.eof:
+            return False
+        if self.pos > STREAM_CHUNK_SIZE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.buf += self._decoder.decode(chunk)
+                return True
+        self.buf += self._decoder.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self):
+        """ 跳過空白並回傳下一個字元 (結尾為空字串)。 """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f"JSON 格式錯誤：預期 {ch!r}，位置 {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """ 解析下一個完整的 JSON 值；緩衝區內容不足時繼續讀取。 """
+        self.peek()
+        while True:
+            try:
+                obj, end = _json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # 數字等純量可能剛好被 chunk 截斷，值必須在緩衝區結束前完整出現
+            if end < len(self.buf) or self.eof or not self.fill():
+                self.pos = end
+                return obj
+
+
+def decode_txlist(chunks, min_value=None, max_value=None):
+    """
+    遞增解析 txlist 回應 (bytes chunk 串流)，不先組出整份 result 陣列。
+
+    result 陣列中的交易逐筆解析後立即以 slim_tx 精簡並轉型；
+    min_value / max_value (wei) 不為 None 時，於解析時即略過範圍外的交易。
+    回傳：
+      - (status, message, txs, scanned, top_block)：scanned 為解析到的交易總數 (含被略過者)，
+        top_block 為其中最高的區塊，供分頁判斷是否滿載
+      - result 不是陣列時 (錯誤說明併入 message，例如 "NOTOK: Max rate limit reached")，
+        txs 為空 list
+    """
+    reader = _ChunkReader(chunks)
+    status, message, detail = None, None, None
+    txs, scanned, top_block = [], 0, -1
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return status, message, txs, scanned, top_block
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == "result" and reader.peek() == "[":
+            reader.pos += 1
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    tx = slim_tx(reader.value())
+                    scanned += 1
+                    if tx["blockNumber"] > top_block:
+                        top_block = tx["blockNumber"]
+                    if (min_value is None or tx["value"] >= min_value) and \
+                            (max_value is None or tx["value"] <= max_value):
+                        txs.append(tx)
+                    sep = reader.peek()
+                    reader.pos += 1
+                    if sep == "]":
+                        break
+                    if sep != ",":
+                        raise ValueError(f"JSON 格式錯誤：result 陣列位置 {reader.pos}")
+        else:
+            val = reader.value()
+            if key == "result" and isinstance(val, str) and val:
+                detail = val
+            elif key == "status":
+                status = str(val)
+            elif key == "message":
+                message = val
+        sep = reader.peek()
+        reader.pos += 1
+        if sep == "}":
+            break
+        if sep != ",":
+            raise ValueError(f"JSON 格式錯誤：位置 {reader.pos}")
+    if detail:
+        message = f"{message}: {detail}" if message else detail
+    return status, message, txs, scanned, top_block
+
+
+def fetch_txlist(api_url, api_key, address, startblock=0, endblock=LATEST_BLOCK,
+                 page=1, offset=MAX_OFFSET, sort="asc", timeout=10,
+                 min_value=None, max_value=None, priority=INTERACTIVE):
+    """
+    呼叫 Etherscan 相容 API 的 module=account&action=txlist。
+    回應以串流方式邊讀邊解析 (decode_txlist)，每筆交易只保留
+    hash/from/to/value/timeStamp/blockNumber，數值為 int。
+
+    參數：
+      - api_url: 該鏈的 API 端點 (BLOCKCHAIN_APIS[blockchain])
+      - api_key: 單一金鑰字串，或 KeyPool (依速率配額選用金鑰，遇速率限制換金鑰重試)
+      - startblock / endblock: 區塊範圍 (含頭尾)
+      - page / offset / sort: 分頁與排序
+      - min_value / max_value: 金額範圍 (wei)，解析時即過濾；
+        用於分頁同步時勿指定，否則無法由筆數判斷該頁是否滿載
+      - priority: 使用 KeyPool 時的排隊優先順序 (services.upstream.INTERACTIVE / BACKGROUND / BULK)
+    相同參數、相同 priority 的並行呼叫會合併為一次 API 請求，共用同一個回傳 list (呼叫端勿修改)；
+    priority 列入合併的鍵，互動查詢不會等在排隊中的 BULK 請求後面。
+    回傳：
+      - list[dict]：精簡後的交易資料；查無交易時回傳空 list
+    例外：
+      - requests.exceptions.RequestException：網路或 HTTP 錯誤
+      - ExplorerError：API 回傳錯誤訊息；超過速率限制 (重試後仍失敗) 時為 RateLimitedError
+    """
+    url = (f"{api_url}?module=account&action=txlist"
+           f"&address={address}&startblock={startblock}&endblock={endblock}"
+           f"&page={page}&offset={offset}&sort={sort}")
+    key = (api_url, address.lower(), startblock, endblock, page, offset, sort, min_value, max_value,
+           priority)
+    return _txlist_flight.do(key, _request_txlist, url, api_key, timeout, min_value, max_value,
+                             priority)
+
+
+def _request_txlist(url, api_key, timeout, min_value, max_value, priority=INTERACTIVE):
+    if not isinstance(api_key, KeyPool):
+        return _request_txlist_once(url, api_key, timeout, min_value, max_value)
+    try:
+        return api_key.call(
+            lambda key: _request_txlist_once(url, key, timeout, min_value, max_value),
+            priority=priority, retry_on=(RateLimitedError,))
+    except UpstreamBusy as e:
+        raise RateLimitedError(str(e))
+
+
+def _request_txlist_once(url, api_key, timeout, min_value, max_value):
+    logging.debug(f"API URL: {url}")
+
+    try:
+        with stage("explorer_http"):
+            resp = http_client.http_get(f"{url}&apikey={api_key}", timeout=timeout, stream=True)
+            if resp.status_code == 429:
+                resp.close()
+                raise RateLimitedError("HTTP 429 Too Many Requests")
+            resp.raise_for_status()
+        try:
+            with stage("explorer_decode"):
+                status, message, result, scanned, _ = decode_txlist(
+                    resp.iter_content(chunk_size=STREAM_CHUNK_SIZE), min_value, max_value)
+        except ValueError as e:
+            raise ExplorerError(f"回應格式錯誤: {e}")
+        finally:
+            resp.close()
+    except Exception:
+        inc("upstream_requests_total", service="explorer", outcome="error")
+        raise
+    inc("upstream_requests_total", service="explorer", outcome="ok")
+
+    if status != "1":
+        err_msg = message or "未知錯誤"
+        # 查無交易時 API 也會回 status=0，視為空結果
+        if str(err_msg).startswith("No transactions found"):
+            return []
+        if is_rate_limit_message(err_msg):
+            raise RateLimitedError(err_msg)
+        raise ExplorerError(err_msg)
+
+    count_rows("explorer_fetch", scanned)
+    return result
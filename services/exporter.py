@@ -0,0 +1,140 @@
+# services/exporter.py
+import io
+import csv
+import zlib
+import numpy as np
+
+from models.tx_batch import wei_strings
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 為選用套件，未安裝時只提供 CSV / NPZ
+    pa = None
+
+ARROW_AVAILABLE = pa is not None
+
+CSV_HEADER = ["交易哈希", "來自", "發送到", "金額(原生)", "金額(USD)", "時間", "區塊", "時間戳", "金額(wei)"]
+
+# 欄式格式：副檔名與 MIME type
+COLUMNAR_FORMATS = {
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.stream"),
+    "npz": ("npz", "application/octet-stream"),
+}
+
+
+def iter_csv(transactions, chunk_rows=2000):
+    """ 逐段產生 CSV 文字，每段最多 chunk_rows 筆，避免一次組出整份檔案。 """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_HEADER)
+    for i, tx in enumerate(transactions, 1):
+        writer.writerow([
+            tx.get("hash"),
+            tx.get("from"),
+            tx.get("to"),
+            tx.get("value"),
+            tx.get("usd_value"),
+            tx.get("time"),
+            tx.get("blockNumber"),
+            tx.get("timeStamp"),
+            tx.get("value_wei"),
+        ])
+        if i % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def iter_gzip(chunks, encoding="utf-8"):
+    """ 將文字串流即時壓縮為 gzip 串流。 """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 => gzip 格式
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode(encoding))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def batch_columns(batch, usd_values):
+    """
+    TransactionBatch => 具型別的欄位 dict (欄名 => numpy 陣列)。
+    value_wei 為精確的十進位字串 (float64 在 2^53 wei 以上會失去精度)；value 為 float 原生幣金額。
+    """
+    return {
+        "hash": batch.hashes.astype(str),
+        "from": batch.addresses[batch.from_ids].astype(str),
+        "to": batch.addresses[batch.to_ids].astype(str),
+        "value_wei": wei_strings(batch.wei),
+        "value": batch.value,
+        "usd_value": np.asarray(usd_values, dtype=np.float64),
+        "timestamp": batch.timestamps,
+        "block_number": batch.blocks,
+    }
+
+
+class _DrainSink(io.RawIOBase):
+    """ 只記錄寫入位置的緩衝區；每寫完一個區塊就把內容交出去。 """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_columnar(batch, usd_values, fmt, chunk_rows=65536):
+    """
+    產生欄式二進位匯出：
+      - parquet / arrow：需安裝 pyarrow，以每 chunk_rows 筆一個 row group / record batch 串流輸出
+      - npz：NumPy 壓縮陣列檔，可直接 np.load
+    """
+    columns = batch_columns(batch, usd_values)
+    if fmt == "npz":
+        buf = io.BytesIO()
+        np.savez_compressed(buf, **columns)
+        yield buf.getvalue()
+        return
+
+    if pa is None:
+        raise RuntimeError("匯出 parquet/arrow 需要安裝 pyarrow")
+
+    schema = pa.schema([(name, pa.from_numpy_dtype(arr.dtype) if arr.dtype.kind != "U" else pa.string())
+                        for name, arr in columns.items()])
+    sink = _DrainSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+        write = writer.write_table
+    else:
+        writer = pa_ipc.new_stream(sink, schema)
+        write = writer.write
+
+    n = len(batch)
+    for start in range(0, max(n, 1), chunk_rows):
+        part = {name: arr[start:start + chunk_rows] for name, arr in columns.items()}
+        write(pa.table(part, schema=schema))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,109 @@
+# services/history_fetcher.py
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from services.explorer import MAX_OFFSET, LATEST_BLOCK
+
+
+def _block(tx):
+    try:
+        return int(tx.get("blockNumber", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def fetch_history(fetch_range, startblock=0, endblock=LATEST_BLOCK, offset=MAX_OFFSET,
+                  max_workers=4, max_requests=200, on_progress=None):
+    """
+    以區塊範圍二分法抓取完整交易歷史，突破 API 單次 10,000 筆的視窗限制。
+
+    每個範圍以 sort=asc 抓一頁；若整頁滿載，代表範圍內還有更多交易：
+    頁中最高區塊之前的區塊已完整，剩下的 [最高區塊, hi] 再對半切成兩個範圍並行抓取。
+    結果以 hash 去重。
+
+    參數：
+      - fetch_range: callable(startblock, endblock, offset) -> list[dict]，依區塊遞增排序
+      - max_workers: 同時進行的 API 請求數上限
+      - max_requests: 本次最多呼叫 API 的次數
+      - on_progress: callable(requests_done, rows)，每完成一次請求呼叫一次
+    回傳：
+      - (list[dict], complete_upto)：依區塊排序的交易，以及已確定完整抓取的最高區塊；
+        若請求數用盡，complete_upto 之後的區塊可能有缺漏
+    """
+    by_hash = {}
+    pending = {}       # future => (lo, hi)
+    unfinished = []    # 因請求數用盡而未抓取的範圍
+    requests_done = 0
+    started = time.time()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history") as pool:
+        def submit(lo, hi):
+            if requests_done + len(pending) >= max_requests:
+                unfinished.append((lo, hi))
+                return
+            pending[pool.submit(fetch_range, lo, hi, offset)] = (lo, hi)
+
+        submit(startblock, endblock)
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for fut in done:
+                lo, hi = pending.pop(fut)
+                txs = fut.result()
+                requests_done += 1
+                for tx in txs:
+                    by_hash.setdefault(tx.get("hash"), tx)
+                if on_progress:
+                    on_progress(requests_done, len(by_hash))
+
+                if len(txs) < offset:
+                    continue
+                # 整頁滿載：從最高區塊 (可能只抓到一部分) 開始，其餘範圍對半切開
+                top = max(_block(tx) for tx in txs)
+                if top <= lo:
+                    logging.warning(f"區塊 {lo} 的交易數超過單頁上限 {offset}，部分交易無法取得")
+                    top = lo + 1
+                    if top > hi:
+                        continue
+                mid = (top + hi) // 2
+                submit(top, mid)
+                if mid < hi:
+                    submit(mid + 1, hi)
+
+    txs = sorted(by_hash.values(), key=lambda tx: (_block(tx), tx.get("hash", "")))
+    if unfinished:
+        complete_upto = min(lo for lo, _ in unfinished) - 1
+    else:
+        complete_upto = max((_block(tx) for tx in txs), default=startblock - 1)
+    logging.debug(f"完整歷史抓取：{requests_done} 次請求，{len(txs)} 筆交易，"
+                  f"耗時 {time.time() - started:.2f}s")
+    return txs, complete_upto
+
+
+def sync_address_history(store, chain, address, fetch_range, offset=MAX_OFFSET,
+                         max_workers=4, max_requests=200, min_interval=0, on_progress=None):
+    """
+    sync_address 的完整歷史版本：從 last_block+1 起以 fetch_history 並行抓取，
+    寫入 store 並更新已完整同步的最高區塊；先前同步只抓了最新區塊時 (first_block > 0)，
+    同時回補 [0, first_block-1]。回傳本次抓到的交易數。
+    """
+    last_block, synced_at = store.sync_state(chain, address)
+    if synced_at is not None and time.time() - synced_at < min_interval:
+        return 0
+
+    start = 0 if last_block is None else last_block + 1
+    txs, complete_upto = fetch_history(fetch_range, startblock=start, offset=offset,
+                                       max_workers=max_workers, max_requests=max_requests,
+                                       on_progress=on_progress)
+    store.add(chain, address, txs, max(complete_upto, start - 1))
+
+    first = store.first_block(chain, address)
+    if first:
+        older, older_upto = fetch_history(fetch_range, startblock=0, endblock=first - 1,
+                                          offset=offset, max_workers=max_workers,
+                                          max_requests=max_requests, on_progress=on_progress)
+        # 請求數用盡時 older_upto 之後仍有缺漏 (已抓到的最高區塊會高於 older_upto)，範圍下界維持不變
+        complete = older_upto >= max((_block(tx) for tx in older), default=-1)
+        store.add(chain, address, older, first_block=0 if complete else None)
+        txs = txs + older
+    return len(txs)
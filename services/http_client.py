@@ -0,0 +1,33 @@
+# services/http_client.py
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# 每個 host 保留的連線數上限 (同一 host 的並行請求數)
+POOL_MAXSIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    取得程序共用的 requests.Session。
+    底層 urllib3 會為每個 host 維護一個 keep-alive 連線池，
+    同一 host 的 TLS 握手只需做一次，之後的請求重用連線。
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def http_get(url, timeout=10, **kwargs):
+    """ 以共用連線池發出 GET 請求，介面同 requests.get。 """
+    return get_session().get(url, timeout=timeout, **kwargs)
@@ -0,0 +1,212 @@
+# services/jobs.py
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+# 共用快取層中工作狀態的鍵前綴
+SHARED_PREFIX = "job_"
+# 執行中的工作最多每幾秒把進度寫入共用快取層一次 (狀態改變時一律寫入)
+PUBLISH_INTERVAL = 1.0
+
+
+class JobQueueFull(Exception):
+    """ 等待中的背景工作已達上限。 """
+
+
+class JobProgress:
+    """
+    背景工作的進度。各資料來源 (例如每條鏈) 以 report(key, pages, rows) 回報自己的累計值，
+    snapshot() 時加總，因此並行或重試時不會重複計算。
+    """
+
+    def __init__(self, on_change=None):
+        self._lock = threading.Lock()
+        self.stage = QUEUED
+        self._sources = {}   # key => (pages, rows)
+        self.rows_processed = 0
+        self._on_change = on_change
+
+    def set_stage(self, stage):
+        self.stage = stage
+        self._changed()
+
+    def report(self, key, pages, rows):
+        with self._lock:
+            self._sources[key] = (pages, rows)
+        self._changed()
+
+    def set_rows_processed(self, rows):
+        self.rows_processed = rows
+        self._changed()
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change()
+
+    def snapshot(self):
+        with self._lock:
+            pages = sum(p for p, _ in self._sources.values())
+            rows = sum(r for _, r in self._sources.values())
+        return {"stage": self.stage, "pages_fetched": pages, "rows_fetched": rows,
+                "rows_processed": self.rows_processed}
+
+
+class Job:
+    def __init__(self, job_id, meta, on_change=None):
+        self.id = job_id
+        self.meta = meta
+        self.status = QUEUED
+        self.progress = JobProgress(on_change)
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_state(self):
+        """ 寫入共用快取層的狀態 (result 須可序列化，例如 result_id)。 """
+        return {"id": self.id, "meta": self.meta, "status": self.status,
+                "progress": self.progress.snapshot(), "result": self.result,
+                "error": self.error, "created_at": self.created_at,
+                "started_at": self.started_at, "finished_at": self.finished_at}
+
+    @classmethod
+    def from_state(cls, state):
+        """ 由其他 worker 寫入的狀態重建 (唯讀的快照)。 """
+        job = cls(state["id"], state["meta"])
+        for name in ("status", "result", "error", "created_at", "started_at", "finished_at"):
+            setattr(job, name, state[name])
+        progress = state["progress"]
+        job.progress.stage = progress["stage"]
+        job.progress.report("", progress["pages_fetched"], progress["rows_fetched"])
+        job.progress.rows_processed = progress["rows_processed"]
+        return job
+
+    def to_dict(self):
+        now = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "progress": self.progress.snapshot(),
+            "error": self.error,
+            "meta": self.meta,
+            "elapsed": round(now - (self.started_at or now), 3),
+            "queued_for": round((self.started_at or now) - self.created_at, 3),
+        }
+
+
+class JobManager:
+    """
+    背景工作：大型查詢送入獨立的執行緒池執行，不佔用 Flask worker，
+    也不與互動查詢共用執行緒池。完成的工作保留 ttl 秒供查詢結果。
+
+    fn 的簽名為 fn(progress, *args, **kwargs)，回傳值存入 job.result；
+    拋出 user_errors 中的例外時，訊息直接作為 job.error 顯示給使用者。
+
+    shared 為跨行程的共用快取 (Flask-Caching 介面：get(key) / set(key, value, timeout))。
+    設定後工作的狀態、進度與 result 會寫入共用層 (result 須可序列化)，
+    其他 gunicorn worker 的 get() 找不到本行程的工作時改讀共用層的快照。
+    """
+
+    def __init__(self, max_workers=2, max_pending=20, ttl=3600, user_errors=(), shared=None):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.user_errors = tuple(user_errors)
+        self.shared = shared
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, meta=None, **kwargs):
+        """ 送出工作並回傳 job_id；等待中的工作過多時拋出 JobQueueFull。 """
+        with self._lock:
+            self._prune()
+            pending = sum(1 for j in self._jobs.values() if j.status == QUEUED)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"等待中的背景工作已達上限 ({self.max_pending})")
+            job_id = uuid.uuid4().hex
+            job = Job(job_id, meta or {}, on_change=self._throttled_publisher(job_id))
+            self._jobs[job.id] = job
+        self._publish(job)
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _throttled_publisher(self, job_id):
+        """ 進度更新時呼叫：距上次寫入未滿 PUBLISH_INTERVAL 秒則略過。 """
+        if self.shared is None:
+            return None
+        last = 0.0
+
+        def publish():
+            nonlocal last
+            now = time.time()
+            if now - last < PUBLISH_INTERVAL:
+                return
+            last = now
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None:
+                self._publish(job)
+        return publish
+
+    def _publish(self, job):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(SHARED_PREFIX + job.id, job.to_state(), timeout=self.ttl)
+        except Exception as e:
+            logging.warning(f"背景工作 {job.id} 狀態寫入共用快取失敗: {e}")
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.progress.set_stage(RUNNING)
+        self._publish(job)
+        try:
+            job.result = fn(job.progress, *args, **kwargs)
+            job.status = DONE
+        except self.user_errors as e:
+            job.error = str(e)
+            job.status = FAILED
+        except Exception as e:
+            logging.exception(f"背景工作 {job.id} 失敗: {e}")
+            job.error = "背景工作執行失敗"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            job.progress.set_stage(job.status)
+            self._publish(job)
+
+    def get(self, job_id):
+        """ 本行程的工作；找不到時讀取共用快取層中其他 worker 的工作快照，都沒有則回傳 None。 """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or self.shared is None or not job_id:
+            return job
+        try:
+            state = self.shared.get(SHARED_PREFIX + job_id)
+        except Exception as e:
+            logging.warning(f"讀取共用快取失敗 {job_id}: {e}")
+            return None
+        return Job.from_state(state) if state is not None else None
+
+    def counts(self):
+        """ 各狀態的工作數 (供 /metrics)。 """
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values()
+                       if j.finished_at is not None and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait=False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
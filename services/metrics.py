@@ -0,0 +1,158 @@
+# services/metrics.py
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# 直方圖預設分桶 (秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 目前請求的各階段耗時 (stage => 累計秒數)；不在請求中時為 None
+_breakdown = contextvars.ContextVar("metrics_breakdown", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    輕量的程序內指標 (計數器與直方圖)，以 Prometheus 文字格式輸出。
+    collector 為 callable，回傳 (名稱, 類型, labels dict, 數值) 的 iterable，
+    於輸出時才取值 (例如結果快取的命中統計)。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._meta = {}          # 名稱 => (類型, 說明)
+        self._counters = {}      # (名稱, labels) => 數值
+        self._histograms = {}    # (名稱, labels) => [各桶計數..., 總和, 筆數]
+        self._collectors = []
+
+    def describe(self, name, kind, help_text):
+        self._meta[name] = (kind, help_text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def counter_value(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram_count(self, name, **labels):
+        hist = self._histograms.get((name, tuple(sorted(labels.items()))))
+        return hist[-1] if hist else 0
+
+    def render(self):
+        """ Prometheus text exposition format (0.0.4)。 """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: list(v) for k, v in self._histograms.items()}
+        samples = {}   # 名稱 => [行, ...]
+        kinds = {}
+
+        for (name, labels), value in sorted(counters.items()):
+            kinds.setdefault(name, "counter")
+            samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), hist in sorted(histograms.items()):
+            kinds.setdefault(name, "histogram")
+            lines = samples.setdefault(name, [])
+            for bound, count in zip(self.buckets, hist):
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {count}")
+            lines.append(f'{name}_bucket{_format_labels(labels, ("le", "+Inf"))} {hist[-1]}')
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(hist[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist[-1]}")
+        for collector in self._collectors:
+            for name, kind, labels, value in collector():
+                kinds.setdefault(name, kind)
+                samples.setdefault(name, []).append(
+                    f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+
+        out = []
+        for name in sorted(samples):
+            kind, help_text = self._meta.get(name, (kinds[name], ""))
+            if help_text:
+                out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(samples[name])
+        return "\n".join(out) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("pipeline_stage_seconds", "histogram", "查詢流程各階段耗時 (秒)")
+metrics.describe("http_request_duration_seconds", "histogram", "各路由的請求耗時 (秒)")
+metrics.describe("upstream_requests_total", "counter", "對外部 API 的請求數")
+metrics.describe("cache_requests_total", "counter", "快取查詢次數 (result=hit/miss)")
+metrics.describe("rows_processed_total", "counter", "各階段處理的交易筆數")
+
+
+def inc(name, amount=1, **labels):
+    metrics.inc(name, amount, **labels)
+
+
+def count_rows(stage_name, rows):
+    metrics.inc("rows_processed_total", rows, stage=stage_name)
+
+
+@contextmanager
+def stage(name):
+    """ 量測一段程式的耗時：記入 pipeline_stage_seconds，並累加到目前請求的階段明細。 """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("pipeline_stage_seconds", elapsed, stage=name)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown[name] = breakdown.get(name, 0.0) + elapsed
+
+
+def start_breakdown():
+    """ 開始記錄目前請求的階段明細，回傳給 end_breakdown 用的 token。 """
+    return _breakdown.set({})
+
+
+def end_breakdown(token):
+    """ 結束記錄並回傳 {stage: 秒數}。 """
+    breakdown = _breakdown.get() or {}
+    _breakdown.reset(token)
+    return breakdown
+
+
+def run_in_context(executor, fn, *args, **kwargs):
+    """
+    executor.submit 的包裝：在目前 context 的副本中執行，
+    讓執行緒池中的階段耗時也記入同一個請求的明細 (並行階段的耗時會累加)。
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
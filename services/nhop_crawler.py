@@ -0,0 +1,139 @@
+# services/nhop_crawler.py
+import time
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from models.graph_index import normalize_hashes
+from models.tx_batch import TransactionBatch
+from services.address_book import get_address_book
+
+
+def _as_batch(txs):
+    """ load_txs 的回傳值 => (TransactionBatch, USD 金額陣列)。 """
+    if isinstance(txs, tuple):
+        batch, usd_values = txs
+        return batch, np.asarray(usd_values, dtype=np.float64)
+    batch = TransactionBatch.from_records(txs)
+    usd_values = np.fromiter((float(tx.get("usd_value", 0.0) or 0.0) for tx in txs),
+                             dtype=np.float64, count=len(txs))
+    return batch, usd_values
+
+
+def crawl_nhop(start_address, hops, load_txs, fanout=20, max_requests=60,
+               time_budget=8.0, max_workers=8):
+    """
+    跨地址 n-hop 追蹤：BFS 每一層並行抓取 frontier 上每個地址的交易，
+    再從交易對手中挑出下一層地址。
+
+    參數：
+      - load_txs: callable(address) -> list[dict] (每筆需含 hash/from/to/usd_value/time)
+        或 (TransactionBatch, USD 金額陣列)；建議由本地交易儲存提供，已同步過的地址不會再打 API
+      - fanout: 每個地址最多往外擴展幾個新鄰居 (依往來 USD 金額排序)
+      - max_requests: 本次最多呼叫 load_txs 的次數
+      - time_budget: 總時間上限 (秒)，超時未完成的地址不再等待
+    回傳：
+      - dict：{"nodes": set[str], "node_ids": 地址字典 id 陣列, "links": list[dict], "stats": dict}
+    地址在內部都以地址字典 id 運算 (往來金額以 bincount 加總)，只有送出請求與輸出 link 時轉回字串。
+    """
+    book = get_address_book()
+    start = book.intern(start_address)
+    blank = book.lookup("")
+    deadline = time.time() + time_budget
+    visited = {start}
+    frontier = [start]
+    nodes = {start}
+    links = []
+    seen_hashes = set()
+    requests_made = 0
+    truncated = False
+
+    # 不用 with：超過時間預算時不等待仍在進行中的請求
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nhop")
+    try:
+        for depth in range(hops):
+            if not frontier:
+                break
+            budget = max_requests - requests_made
+            if budget < len(frontier):
+                truncated = True
+                frontier = frontier[:max(budget, 0)]
+            if not frontier:
+                break
+
+            addresses = book.address_strings(frontier)
+            pending = {pool.submit(load_txs, addr): (nid, addr)
+                       for nid, addr in zip(frontier, addresses)}
+            requests_made += len(pending)
+            next_frontier = []
+            while pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    truncated = True
+                    for fut in pending:
+                        fut.cancel()
+                    break
+                done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    nid, addr = pending.pop(fut)
+                    try:
+                        batch, usd_values = _as_batch(fut.result())
+                    except Exception as e:
+                        logging.error(f"n-hop 抓取 {addr} 失敗: {e}")
+                        continue
+
+                    from_gids, to_gids = batch.from_gids, batch.to_gids
+                    rows = np.flatnonzero((from_gids == nid) | (to_gids == nid))
+                    # 該地址與每個交易對手的往來金額，用來挑選要擴展的鄰居
+                    other = np.where(from_gids[rows] == nid, to_gids[rows], from_gids[rows])
+                    nbrs, inverse = np.unique(other, return_inverse=True)
+                    volume = np.bincount(inverse, weights=usd_values[rows], minlength=len(nbrs))
+
+                    fresh = []
+                    for row, key in zip(rows.tolist(), normalize_hashes(batch.hashes[rows]).tolist()):
+                        if key in seen_hashes or from_gids[row] == to_gids[row]:
+                            continue
+                        seen_hashes.add(key)
+                        fresh.append(row)
+                    if fresh:
+                        fresh = np.asarray(fresh, dtype=np.int64)
+                        nodes.update(from_gids[fresh].tolist())
+                        nodes.update(to_gids[fresh].tolist())
+                        sources = book.address_strings(from_gids[fresh])
+                        targets = book.address_strings(to_gids[fresh])
+                        for row, f, t in zip(fresh.tolist(), sources, targets):
+                            links.append({
+                                "source": f,
+                                "target": t,
+                                "value": float(usd_values[row]),
+                                "time": batch.time_str(row)
+                            })
+
+                    if depth + 1 >= hops:
+                        continue
+                    candidates = np.fromiter((n not in visited and n != blank for n in nbrs.tolist()),
+                                             dtype=bool, count=len(nbrs))
+                    ranked = nbrs[candidates][np.argsort(-volume[candidates], kind="stable")]
+                    if len(ranked) > fanout:
+                        truncated = True
+                    for nb in ranked[:fanout].tolist():
+                        visited.add(nb)
+                        next_frontier.append(nb)
+            if time.time() >= deadline:
+                truncated = True
+                break
+            frontier = next_frontier
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    node_ids = np.asarray(sorted(nodes), dtype=np.int64)
+    return {
+        "nodes": set(book.address_strings(node_ids).tolist()),
+        "node_ids": node_ids,
+        "links": links,
+        "stats": {
+            "requests": requests_made,
+            "visited": len(visited),
+            "truncated": truncated,
+        },
+    }
@@ -0,0 +1,205 @@
+# services/price_history.py
+import os
+import time
+import sqlite3
+import logging
+import threading
+import numpy as np
+
+from services import http_client
+from services.metrics import stage, inc
+
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+COINGECKO_RANGE_URL = "{base_url}/coins/{cg_id}/market_chart/range?vs_currency=usd&from={start}&to={end}"
+
+# 已抓取範圍與所需範圍相差在此秒數內視為已涵蓋 (避免為最新幾分鐘反覆呼叫 API)
+COVERAGE_TOLERANCE = 3600
+# API 失敗後，同一幣種在此秒數內不再補抓 (查詢路徑直接使用已有資料或即時匯率)
+FAILURE_BACKOFF = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    cg_id TEXT    NOT NULL,
+    ts    INTEGER NOT NULL,
+    price REAL    NOT NULL,
+    PRIMARY KEY (cg_id, ts)
+);
+CREATE TABLE IF NOT EXISTS price_ranges (
+    cg_id    TEXT    NOT NULL,
+    start_ts INTEGER NOT NULL,
+    end_ts   INTEGER NOT NULL
+);
+"""
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + COVERAGE_TOLERANCE:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def missing_ranges(covered, start, end):
+    """ [start, end] 中未被 covered (已合併、排序) 涵蓋的區間。 """
+    gaps, cursor = [], start
+    for c_start, c_end in covered:
+        if c_end < cursor:
+            continue
+        if c_start > end:
+            break
+        if c_start - cursor > COVERAGE_TOLERANCE:
+            gaps.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+    if end - cursor > COVERAGE_TOLERANCE:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class PriceHistory:
+    """
+    歷史匯率時間序列 (SQLite 持久化 + 記憶體排序陣列)。
+
+    依 Coingecko id 保存 (timestamp, USD 價格)；查詢時找出尚未涵蓋的時間區間，
+    每段區間以一次 market_chart/range 批次補齊 (Coingecko 依區間長度回傳
+    5 分鐘 / 每小時 / 每日資料點)。換算時以二分搜尋找出每筆交易時間點之前最近的價格。
+    補抓失敗時該幣種在 failure_backoff 秒內不再呼叫 API，避免每次查詢都等待逾時。
+    """
+
+    def __init__(self, path, timeout=10, base_url=COINGECKO_API_URL, failure_backoff=FAILURE_BACKOFF):
+        self.path = path
+        self.timeout = timeout
+        self.base_url = base_url.rstrip("/")
+        self.failure_backoff = failure_backoff
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._series = {}     # cg_id => (timestamps, prices)
+        self._covered = {}    # cg_id => [(start, end), ...]
+        self._backoff = {}    # cg_id => 補抓失敗後可再次嘗試的時間 (monotonic)
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, cg_id, refresh=False):
+        if cg_id in self._series and not refresh:
+            return
+        conn = self._conn()
+        rows = conn.execute("SELECT ts, price FROM prices WHERE cg_id=? ORDER BY ts",
+                            (cg_id,)).fetchall()
+        ranges = conn.execute("SELECT start_ts, end_ts FROM price_ranges WHERE cg_id=?",
+                              (cg_id,)).fetchall()
+        ts = np.array([r[0] for r in rows], dtype=np.int64)
+        prices = np.array([r[1] for r in rows], dtype=np.float64)
+        with self._lock:
+            self._series[cg_id] = (ts, prices)
+            self._covered[cg_id] = _merge_ranges(ranges)
+
+    def _fetch_range(self, cg_id, start, end):
+        url = COINGECKO_RANGE_URL.format(base_url=self.base_url, cg_id=cg_id,
+                                         start=int(start), end=int(end))
+        try:
+            with stage("coingecko_http"):
+                resp = http_client.http_get(url, timeout=self.timeout)
+                resp.raise_for_status()
+                points = resp.json().get("prices") or []
+        except Exception:
+            inc("upstream_requests_total", service="coingecko", outcome="error")
+            raise
+        inc("upstream_requests_total", service="coingecko", outcome="ok")
+        return [(int(ms) // 1000, float(price)) for ms, price in points if price]
+
+    def ensure_range(self, cg_id, start, end):
+        """
+        補齊 [start, end] 內缺少的價格資料；API 失敗時記錄錯誤並略過，
+        之後 failure_backoff 秒內該幣種不再補抓。
+        """
+        self._load(cg_id)
+        if time.monotonic() < self._backoff.get(cg_id, 0):
+            return
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(cg_id, threading.Lock())
+        with fetch_lock:
+            if time.monotonic() < self._backoff.get(cg_id, 0):
+                return
+            gaps = missing_ranges(self._covered[cg_id], start, end)
+            if not gaps:
+                return
+            # 同一台主機的其他 worker 行程可能已抓過這段，先重新讀取 SQLite
+            self._load(cg_id, refresh=True)
+            gaps = missing_ranges(self._covered[cg_id], start, end)
+            if not gaps:
+                return
+            conn = self._conn()
+            for g_start, g_end in gaps:
+                try:
+                    points = self._fetch_range(cg_id, g_start, g_end)
+                except Exception as e:
+                    logging.error(f"Coingecko 歷史價格錯誤 {cg_id} {g_start}-{g_end}: {e}，"
+                                  f"{self.failure_backoff} 秒內不再補抓")
+                    self._backoff[cg_id] = time.monotonic() + self.failure_backoff
+                    return
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO prices VALUES (?,?,?)",
+                                     [(cg_id, ts, p) for ts, p in points])
+                    conn.execute("INSERT INTO price_ranges VALUES (?,?,?)",
+                                 (cg_id, g_start, g_end))
+                self._merge_points(cg_id, points, g_start, g_end)
+
+    def _merge_points(self, cg_id, points, start, end):
+        new_ts = np.array([p[0] for p in points], dtype=np.int64)
+        new_prices = np.array([p[1] for p in points], dtype=np.float64)
+        with self._lock:
+            ts, prices = self._series[cg_id]
+            ts = np.concatenate([ts, new_ts])
+            prices = np.concatenate([prices, new_prices])
+            ts, first = np.unique(ts, return_index=True)
+            self._series[cg_id] = (ts, prices[first])
+            self._covered[cg_id] = _merge_ranges(self._covered[cg_id] + [(start, end)])
+
+    def lookup(self, cg_id, timestamps):
+        """
+        每個 timestamp 對應的 USD 價格 (該時間點之前最近的資料點；早於第一點則用第一點)。
+        尚無任何資料時回傳 None。
+        """
+        self._load(cg_id)
+        ts, prices = self._series[cg_id]
+        if len(ts) == 0:
+            return None
+        idx = np.searchsorted(ts, np.asarray(timestamps, dtype=np.int64), side="right") - 1
+        return prices[np.clip(idx, 0, len(ts) - 1)]
+
+    def usd_values(self, cg_id, timestamps, amounts):
+        """
+        以交易當下的歷史匯率換算 USD (四捨五入至小數 2 位)。
+        必要時先補齊缺少的區間；若仍無資料則回傳 None，由呼叫端改用即時匯率。
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if len(timestamps) == 0:
+            return np.empty(0, dtype=np.float64)
+        valid = timestamps[timestamps > 0]
+        if len(valid):
+            # 往前多抓一段，確保只有單一時間點時也會有前一個價格點
+            start = int(valid.min()) - 2 * COVERAGE_TOLERANCE
+            self.ensure_range(cg_id, start, min(int(valid.max()), int(time.time())))
+        prices = self.lookup(cg_id, timestamps)
+        if prices is None:
+            return None
+        return np.round(np.asarray(amounts, dtype=np.float64) * prices, 2)
+
+    def latest(self, cg_id):
+        """ 最新的已知價格；無資料則回傳 None。 """
+        self._load(cg_id)
+        ts, prices = self._series[cg_id]
+        return float(prices[-1]) if len(prices) else None
@@ -0,0 +1,147 @@
+# services/result_cache.py
+import sys
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+
+from models.tx_batch import TransactionBatch
+
+# 每筆交易 dict 的估計記憶體 (dict 本身 + 字串欄位)
+RECORD_BYTES = 1200
+# 共用快取層中查詢結果的鍵前綴
+SHARED_PREFIX = "result_"
+# 只屬於本行程的衍生資料 (表格檢視)，不寫入共用快取層
+LOCAL_ONLY_KEYS = ("table_views",)
+
+
+def estimate_size(result):
+    """ 粗估查詢結果佔用的記憶體 (bytes)。 """
+    size = sys.getsizeof(result)
+    for value in result.values():
+        if isinstance(value, list):
+            size += len(value) * RECORD_BYTES
+        elif isinstance(value, TransactionBatch):
+            # 數值欄位 + 哈希字串
+            size += sum(getattr(value, name).nbytes for name in
+                        ("from_ids", "to_ids", "value_wei", "wei", "timestamps", "blocks"))
+            size += len(value) * 120
+        elif hasattr(value, "nbytes"):
+            # numpy 陣列與 FilterIndex 等提供 nbytes 的物件
+            size += value.nbytes
+        else:
+            size += sys.getsizeof(value)
+    return size
+
+
+class ResultCache:
+    """
+    伺服器端查詢結果快取，取代把整份交易 list 存進 session。
+    session 只保存 put() 回傳的 result_id；後續的 /export、/graph_data 等
+    直接讀取記憶體中的物件，不需反序列化。
+
+    淘汰策略：LRU + TTL，並以 max_entries / max_bytes 限制總量。
+
+    shared 為跨行程的共用快取 (Flask-Caching 介面：get(key) / set(key, value, timeout))，
+    例如 SharedFlaskCache 或 RedisCache。設定後 put() 同時寫入共用層，本行程找不到的
+    result_id (請求被分配到其他 gunicorn worker) 改從共用層讀取並放回本行程快取。
+    """
+
+    def __init__(self, max_entries=256, max_bytes=512 * 1024 * 1024, ttl=3600, shared=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = shared
+        self._data = OrderedDict()   # result_id => (expires_at, size, result)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def put(self, result, result_id=None):
+        """ 存入查詢結果 (dict)，回傳 result_id。 """
+        result_id = result_id or uuid.uuid4().hex
+        self._put_local(result_id, result)
+        if self.shared is not None:
+            shared_result = {k: v for k, v in result.items() if k not in LOCAL_ONLY_KEYS}
+            try:
+                self.shared.set(SHARED_PREFIX + result_id, shared_result, timeout=self.ttl)
+            except Exception as e:
+                logging.warning(f"查詢結果寫入共用快取失敗 {result_id}: {e}")
+        return result_id
+
+    def get(self, result_id):
+        """ 取得查詢結果；不存在或已過期則回傳 None。 """
+        if not result_id:
+            return None
+        with self._lock:
+            entry = self._data.get(result_id)
+            if entry is not None and entry[0] >= time.time():
+                self._data.move_to_end(result_id)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                self._remove(result_id)
+                self.expirations += 1
+            if self.shared is None:
+                self.misses += 1
+                return None
+
+        try:
+            result = self.shared.get(SHARED_PREFIX + result_id)
+        except Exception as e:
+            logging.warning(f"讀取共用快取失敗 {result_id}: {e}")
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.shared_hits += 1
+        self._put_local(result_id, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _put_local(self, result_id, result):
+        size = estimate_size(result)
+        with self._lock:
+            self._remove(result_id)
+            self._data[result_id] = (time.time() + self.ttl, size, result)
+            self._bytes += size
+            self._evict()
+
+    def _remove(self, result_id):
+        entry = self._data.pop(result_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _evict(self):
+        now = time.time()
+        for result_id in [k for k, (expires_at, _, _) in self._data.items() if expires_at < now]:
+            self._remove(result_id)
+            self.expirations += 1
+        # 至少保留最新的一筆，即使它本身超過 max_bytes
+        while len(self._data) > 1 and (len(self._data) > self.max_entries
+                                       or self._bytes > self.max_bytes):
+            _, (_, size, _) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
@@ -0,0 +1,141 @@
+# services/screening.py
+import re
+import logging
+from concurrent.futures import wait, FIRST_COMPLETED
+
+import numpy as np
+
+from models.tx_batch import format_time
+from services.metrics import metrics
+
+metrics.describe("screening_addresses_total", "counter", "批次篩查完成的地址數 (result=風險等級或 error)")
+
+# 0x + 40 hex；前後不可緊接英數字 (排除交易哈希與較長的字串)
+ADDRESS_RE = re.compile(r"(?<![0-9A-Za-z])0x[0-9a-fA-F]{40}(?![0-9A-Za-z])")
+
+# detect_anomalies 的異常類型 => 報告欄位
+ANOMALY_FIELDS = {
+    "黑名單錢包": "blacklist_hits",
+    "大額交易": "large_transfers",
+    "快速流入流出": "rapid_in_out",
+}
+RISK_HIGH, RISK_MEDIUM, RISK_LOW = "high", "medium", "low"
+# 報告中列出的黑名單交易對手上限
+MAX_LISTED_COUNTERPARTIES = 20
+
+
+def parse_address_list(data, max_addresses=None):
+    """
+    從上傳的名單 (純文字、CSV、JSON 皆可) 取出地址：小寫、去重並保留原順序。
+    超過 max_addresses 時拋出 ValueError。
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="ignore")
+    addresses = list(dict.fromkeys(m.lower() for m in ADDRESS_RE.findall(data or "")))
+    if max_addresses is not None and len(addresses) > max_addresses:
+        raise ValueError(f"一次最多篩查 {max_addresses} 個地址 (收到 {len(addresses)} 個)")
+    return addresses
+
+
+def risk_report(address, blockchain, batch, usd_values, summary, anomalies, self_blacklisted,
+                truncated=False):
+    """
+    單一地址的風險報告：流入流出摘要、各類異常筆數與風險等級。
+      - high: 地址本身在黑名單，或與黑名單地址有往來
+      - medium: 有大額交易或快速流入流出
+      - low: 其他
+    truncated 為 True 表示只分析了最近的一段交易 (較舊的歷史未同步或超過單頁上限)，
+    結果為 low 不代表完整歷史中沒有風險。
+    """
+    counts = {field: 0 for field in ANOMALY_FIELDS.values()}
+    counterparties = []
+    for anom in anomalies:
+        field = ANOMALY_FIELDS.get(anom["type"])
+        if field:
+            counts[field] += 1
+        other = anom.get("address")
+        if field == "blacklist_hits" and other and other != address and other not in counterparties:
+            counterparties.append(other)
+
+    if self_blacklisted or counts["blacklist_hits"]:
+        risk = RISK_HIGH
+    elif counts["large_transfers"] or counts["rapid_in_out"]:
+        risk = RISK_MEDIUM
+    else:
+        risk = RISK_LOW
+
+    has_txs = len(batch) > 0
+    return {
+        "address": address,
+        "blockchain": blockchain,
+        "status": "ok",
+        "risk": risk,
+        "blacklisted": bool(self_blacklisted),
+        "tx_count": len(batch),
+        "truncated": bool(truncated),
+        "total_in": summary["total_in"],
+        "total_out": summary["total_out"],
+        "count_in": summary["count_in"],
+        "count_out": summary["count_out"],
+        "usd_volume": round(float(np.sum(usd_values)), 2) if has_txs else 0.0,
+        "first_seen": format_time(batch.timestamps.min()) if has_txs else None,
+        "last_seen": format_time(batch.timestamps.max()) if has_txs else None,
+        **counts,
+        "blacklisted_counterparties": counterparties[:MAX_LISTED_COUNTERPARTIES],
+    }
+
+
+def error_report(address, blockchain, error):
+    return {"address": address, "blockchain": blockchain, "status": "error", "error": str(error)}
+
+
+def iter_screening(addresses, screen_one, executor, max_in_flight=8, user_errors=(), blockchain=None):
+    """
+    並行篩查：同時最多 max_in_flight 個地址在執行 (其餘尚未送出，不佔用執行緒池與記憶體)，
+    每完成一個就 yield 其報告 (依完成順序，附 index 為原名單中的位置)。
+    screen_one(address) 拋出 user_errors 中的例外時只記錄訊息，其他例外另寫入 log。
+    """
+    pending = {}
+    queue = iter(enumerate(addresses))
+
+    def submit_next():
+        for index, address in queue:
+            pending[executor.submit(screen_one, address)] = (index, address)
+            return
+
+    for _ in range(max(1, max_in_flight)):
+        submit_next()
+    try:
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for fut in done:
+                index, address = pending.pop(fut)
+                try:
+                    report = fut.result()
+                except user_errors as e:
+                    report = error_report(address, blockchain, e)
+                except Exception as e:
+                    logging.exception(f"地址篩查失敗 {address}: {e}")
+                    report = error_report(address, blockchain, e)
+                submit_next()
+                report["index"] = index
+                metrics.inc("screening_addresses_total", result=report.get("risk", "error"))
+                yield report
+    finally:
+        # 用戶端中途斷線時不再送出剩下的地址
+        for fut in pending:
+            fut.cancel()
+
+
+def summarize(reports, seconds):
+    """ 串流最後一行的彙總：各風險等級的地址數、錯誤數與只分析了部分歷史的地址數。 """
+    risk_counts = {RISK_HIGH: 0, RISK_MEDIUM: 0, RISK_LOW: 0}
+    errors = truncated = 0
+    for report in reports:
+        if report["status"] == "ok":
+            risk_counts[report["risk"]] += 1
+            truncated += bool(report.get("truncated"))
+        else:
+            errors += 1
+    return {"done": True, "screened": len(reports), "errors": errors, "truncated": truncated,
+            "risk_counts": risk_counts, "seconds": round(seconds, 3)}
@@ -0,0 +1,276 @@
+# services/shared_cache.py
+import os
+import time
+import pickle
+import sqlite3
+import threading
+from urllib.parse import urlparse
+
+from flask_caching.backends.base import BaseCache
+from limits.storage import Storage
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key         TEXT PRIMARY KEY,
+    value       BLOB    NOT NULL,
+    expires_at  REAL    NOT NULL,
+    accessed_at REAL    NOT NULL,
+    size        INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    key        TEXT PRIMARY KEY,
+    value      INTEGER NOT NULL,
+    expires_at REAL    NOT NULL
+);
+"""
+
+# 讀取時若 accessed_at 已超過此秒數才更新，避免每次讀取都寫入 (近似 LRU)
+TOUCH_INTERVAL = 5.0
+# 每幾次寫入檢查一次容量
+EVICT_EVERY = 32
+# 沒有 TTL 的項目視為此時間點後過期
+NEVER = 1e18
+
+
+class SharedCache:
+    """
+    同一台主機上所有 worker 行程共用的快取 (SQLite WAL 檔案)。
+
+    - get / set / delete：pickle 序列化的任意值，各自的 TTL；
+      超過 max_entries 筆或 max_bytes 時，依最近存取時間淘汰 (近似 LRU)
+    - incr：具到期時間的計數器 (限流用)，以單一交易原子更新，不受淘汰影響
+
+    連線依 (行程, 執行緒) 建立，gunicorn preload 後 fork 的 worker 不會共用連線。
+    """
+
+    def __init__(self, path, max_entries=10000, max_bytes=256 * 1024 * 1024, default_ttl=300):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---------- 一般快取 ----------
+    def get(self, key, default=None):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires_at, accessed_at FROM cache WHERE key=?",
+                           (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires_at, accessed_at = row
+        if expires_at <= now:
+            conn.execute("DELETE FROM cache WHERE key=? AND expires_at<=?", (key, now))
+            return default
+        if now - accessed_at > TOUCH_INTERVAL:
+            conn.execute("UPDATE cache SET accessed_at=? WHERE key=?", (now, key))
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        """ ttl 為 None 時使用 default_ttl；0 表示不過期。 """
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache VALUES (?,?,?,?,?)",
+            (key, blob, now + ttl if ttl else NEVER, now, len(blob))
+        )
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0 or len(blob) > self.max_bytes // 100:
+            self.evict()
+        return True
+
+    def add(self, key, value, ttl=None):
+        """ 只在 key 不存在 (或已過期) 時寫入；回傳是否寫入。 """
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache WHERE key=? AND expires_at<=?", (key, now))
+            cur = conn.execute("INSERT OR IGNORE INTO cache VALUES (?,?,?,?,?)",
+                               (key, blob, now + ttl if ttl else NEVER, now, len(blob)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cur.rowcount == 1
+
+    def delete(self, key):
+        return self._conn().execute("DELETE FROM cache WHERE key=?", (key,)).rowcount > 0
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM cache")
+        conn.execute("DELETE FROM counters")
+        return True
+
+    def evict(self):
+        """ 刪除過期項目，再依最近存取時間淘汰到 max_entries / max_bytes 以內。 """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM cache WHERE expires_at<=?", (now,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return 0
+        victims, freed = [], 0
+        over_entries = count - self.max_entries
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            if len(victims) >= over_entries and total - freed <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM cache WHERE key=?", victims)
+        return len(victims)
+
+    def stats(self):
+        count, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"entries": count, "bytes": total}
+
+    # ---------- 計數器 (限流) ----------
+    def incr(self, key, amount=1, expiry=60):
+        """ 計數器加 amount；不存在或已過期時從 amount 起算並重新設定到期時間。回傳新值。 """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value, expires_at FROM counters WHERE key=?",
+                               (key,)).fetchone()
+            if row is None or row[1] <= now:
+                value, expires_at = amount, now + expiry
+            else:
+                value, expires_at = row[0] + amount, row[1]
+            conn.execute("INSERT OR REPLACE INTO counters VALUES (?,?,?)", (key, value, expires_at))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def counter(self, key):
+        """ 回傳 (數值, 到期時間)；不存在或已過期時回傳 (0, None)。 """
+        row = self._conn().execute("SELECT value, expires_at FROM counters WHERE key=?",
+                                   (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return 0, None
+        return row[0], row[1]
+
+    def reset_counters(self, key=None):
+        conn = self._conn()
+        if key is None:
+            return conn.execute("DELETE FROM counters").rowcount
+        return conn.execute("DELETE FROM counters WHERE key=?", (key,)).rowcount
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_shared_cache(path, **options):
+    """ 同一路徑在同一行程內共用一個 SharedCache 物件。 """
+    path = os.path.abspath(path)
+    with _instances_lock:
+        cache = _instances.get(path)
+        if cache is None:
+            cache = _instances[path] = SharedCache(path, **options)
+        return cache
+
+
+class SharedFlaskCache(BaseCache):
+    """
+    Flask-Caching 後端：CACHE_TYPE = "services.shared_cache.SharedFlaskCache"，
+    CACHE_SHARED_PATH 指定 SQLite 檔案，CACHE_THRESHOLD / CACHE_SHARED_MAX_BYTES 限制容量。
+    """
+
+    def __init__(self, cache, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self._cache = cache
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        cache = get_shared_cache(config["CACHE_SHARED_PATH"],
+                                 max_entries=config.get("CACHE_THRESHOLD", 10000),
+                                 max_bytes=config.get("CACHE_SHARED_MAX_BYTES", 256 * 1024 * 1024),
+                                 default_ttl=kwargs.get("default_timeout", 300))
+        return cls(cache, default_timeout=kwargs.get("default_timeout", 300))
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, timeout=None):
+        return self._cache.set(key, value, ttl=self._normalize_timeout(timeout))
+
+    def add(self, key, value, timeout=None):
+        return self._cache.add(key, value, ttl=self._normalize_timeout(timeout))
+
+    def delete(self, key):
+        return self._cache.delete(key)
+
+    def has(self, key):
+        return self._cache.get(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        return self._cache.clear()
+
+
+_MISSING = object()
+
+
+class SQLiteLimiterStorage(Storage):
+    """
+    Flask-Limiter (limits) 的計數器儲存：storage_uri = "sqlite:///相對路徑" 或 "sqlite:////絕對路徑"。
+    同一台主機上的 worker 共用計數，限流一致 (固定視窗策略)。
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        path = urlparse(uri).path if uri else ""
+        path = path[1:] if path.startswith("/") else path
+        self._cache = get_shared_cache(path or os.path.join("data", "shared_cache.sqlite3"))
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key, expiry, amount=1):
+        return self._cache.incr(key, amount, expiry)
+
+    def get(self, key):
+        return self._cache.counter(key)[0]
+
+    def get_expiry(self, key):
+        expires_at = self._cache.counter(key)[1]
+        return expires_at if expires_at is not None else time.time()
+
+    def check(self):
+        try:
+            self._cache.counter("__check__")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._cache.reset_counters()
+
+    def clear(self, key):
+        self._cache.reset_counters(key)
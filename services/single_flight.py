@@ -0,0 +1,61 @@
+# services/single_flight.py
+import threading
+
+from services.metrics import metrics
+
+metrics.describe("upstream_coalesced_total", "counter", "併入進行中相同請求、未另外呼叫外部 API 的次數")
+metrics.describe("upstream_singleflight_calls_total", "counter", "經 single-flight 實際執行的外部請求數")
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    相同 key 的並行呼叫只實際執行一次 (request coalescing)：
+    第一個呼叫者執行 fn，其他呼叫者等待並取得同一個結果 (或同一個例外)。
+    完成後立即移除，之後的呼叫會重新執行；結果快取由呼叫端自行負責。
+
+    多個呼叫者共用同一個回傳物件，呼叫端不應修改它。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.inc("upstream_coalesced_total", group=self.name)
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.inc("upstream_singleflight_calls_total", group=self.name)
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
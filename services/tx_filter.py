@@ -1,5 +1,112 @@
 # services/tx_filter.py
-from datetime import datetime
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from models.tx_batch import TransactionBatch, format_time
+
+DIRECTIONS = ("all", "in", "out")
+
+
+def _day_start(day):
+    """ 本地時間 day 00:00:00 的 epoch 秒 (與 datetime.fromtimestamp 的日期判斷一致)。 """
+    return int(time.mktime(day.timetuple()))
+
+
+def parse_date(raw):
+    """ 'YYYY-MM-DD' / date / datetime => date；空值回傳 None，格式錯誤拋出 ValueError。 """
+    if not raw:
+        return None
+    if isinstance(raw, datetime):
+        return raw.date()
+    if isinstance(raw, date):
+        return raw
+    return datetime.strptime(str(raw).strip(), "%Y-%m-%d").date()
+
+
+class FilterIndex:
+    """
+    一份交易 (某地址、某頁的完整未篩選交易) 的篩選索引，建立一次後每次改篩選條件
+    只需二分搜尋與陣列運算，不再逐筆解析金額與時間，也不需重新抓取。
+
+      - 時間索引：依 timestamps 排序的列位置，日期範圍以 searchsorted 找出區間
+      - 金額索引：依原生幣金額排序的列位置，金額範圍同上
+      - 流向 bitmap：in (to 為錢包) / out (from 為錢包) 各一個 bool 陣列
+
+    select() 先取兩個索引中範圍較窄者，再對候選列檢查另一個條件與流向。
+    usd_values / chain_labels 為與 batch 對齊的附加欄位，subset() 時一併取出。
+    """
+
+    def __init__(self, batch, address, usd_values=None, chain_labels=None):
+        self.batch = batch
+        self.address = address.lower()
+        self.usd_values = usd_values
+        self.chain_labels = chain_labels
+        self.value = batch.value
+        self.time_order = np.argsort(batch.timestamps, kind="stable")
+        self.sorted_ts = batch.timestamps[self.time_order]
+        self.value_order = np.argsort(self.value, kind="stable")
+        self.sorted_value = self.value[self.value_order]
+        wallet_id = batch.address_id(self.address)
+        if wallet_id >= 0:
+            self.in_mask = batch.to_ids == wallet_id
+            self.out_mask = batch.from_ids == wallet_id
+        else:
+            self.in_mask = self.out_mask = np.zeros(len(batch), dtype=bool)
+
+    def __len__(self):
+        return len(self.batch)
+
+    @property
+    def nbytes(self):
+        """ 索引與欄位的估計記憶體 (供 ResultCache 計算容量)。 """
+        arrays = [self.time_order, self.sorted_ts, self.value_order, self.sorted_value,
+                  self.in_mask, self.out_mask, self.value, self.batch.from_ids, self.batch.to_ids,
+                  self.batch.value_wei, self.batch.wei, self.batch.timestamps, self.batch.blocks]
+        if self.usd_values is not None:
+            arrays.append(self.usd_values)
+        return sum(a.nbytes for a in arrays) + len(self.batch) * 120
+
+    @staticmethod
+    def _range(sorted_keys, low, high):
+        lo = 0 if low is None else int(np.searchsorted(sorted_keys, low, side="left"))
+        hi = len(sorted_keys) if high is None else int(np.searchsorted(sorted_keys, high, side="right"))
+        return lo, max(lo, hi)
+
+    def select(self, min_val=0.0, max_val=None, start_date=None, end_date=None, direction="all"):
+        """ 符合條件的列索引 (int64，依 batch 原順序)；條件同 filter_transactions。 """
+        start_ts = _day_start(start_date) if start_date else None
+        end_ts = _day_start(end_date + timedelta(days=1)) - 1 if end_date else None
+        t_lo, t_hi = self._range(self.sorted_ts, start_ts, end_ts)
+        v_lo, v_hi = self._range(self.sorted_value, min_val, max_val)
+
+        if t_hi - t_lo <= v_hi - v_lo:
+            rows = self.time_order[t_lo:t_hi]
+            mask = np.ones(len(rows), dtype=bool)
+            if min_val is not None:
+                mask &= self.value[rows] >= min_val
+            if max_val is not None:
+                mask &= self.value[rows] <= max_val
+        else:
+            rows = self.value_order[v_lo:v_hi]
+            mask = np.ones(len(rows), dtype=bool)
+            if start_ts is not None:
+                mask &= self.batch.timestamps[rows] >= start_ts
+            if end_ts is not None:
+                mask &= self.batch.timestamps[rows] <= end_ts
+        if direction == "in":
+            mask &= self.in_mask[rows]
+        elif direction == "out":
+            mask &= self.out_mask[rows]
+        return np.sort(rows[mask]).astype(np.int64)
+
+    def subset(self, rows):
+        """ 取出 rows 的 (batch, usd_values, chain_labels)。 """
+        usd_values = self.usd_values[rows] if self.usd_values is not None else None
+        chain_labels = self.chain_labels[rows] if self.chain_labels is not None else None
+        return self.batch.take(rows), usd_values, chain_labels
+
 
 def filter_transactions(transactions, address, min_val=0.0, max_val=None,
                        start_date=None, end_date=None, direction='all'):
@@ -9,39 +116,20 @@ def filter_transactions(transactions, address, min_val=0.0, max_val=None,
       - start_date / end_date (日期)
       - direction: 'all'/'in'/'out'
       - address: 使用者輸入的目標地址(小寫)
-    回傳過濾後的新 list
+    回傳過濾後的新 list (維持原順序)，並補上 value_ether / time_str 欄位。
+    需要以不同條件重複篩選同一份交易時，直接使用 FilterIndex。
     """
-    address_lower = address.lower()
+    if not transactions:
+        return []
+    index = FilterIndex(TransactionBatch.from_raw(transactions), address)
+    rows = index.select(min_val, max_val, start_date, end_date, direction)
+    value = index.value
+    timestamps = index.batch.timestamps
     filtered = []
-
-    for tx in transactions:
-        # 1) 金額篩選
-        val = float(tx["value"]) / 10**18
-        if val < min_val:
-            continue
-        if max_val is not None and val > max_val:
-            continue
-
-        # 2) 時間篩選
-        tstamp = int(tx["timeStamp"])
-        dt_obj = datetime.fromtimestamp(tstamp)
-        if start_date and dt_obj.date() < start_date:
-            continue
-        if end_date and dt_obj.date() > end_date:
-            continue
-
-        # 3) 流向篩選
-        f_addr = tx["from"].lower()
-        t_addr = tx["to"].lower()
-
-        if direction == 'in' and t_addr != address_lower:
-            continue
-        if direction == 'out' and f_addr != address_lower:
-            continue
-
+    for i in rows.tolist():
         # 符合 => 補充處理
-        tx["value_ether"] = val
-        tx["time_str"] = dt_obj.strftime("%Y-%m-%d %H:%M:%S")
+        tx = transactions[i]
+        tx["value_ether"] = float(value[i])
+        tx["time_str"] = format_time(timestamps[i])
         filtered.append(tx)
-
     return filtered
@@ -0,0 +1,225 @@
+# services/tx_store.py
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+from services.explorer import MAX_OFFSET, LATEST_BLOCK
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    chain        TEXT    NOT NULL,
+    address      TEXT    NOT NULL,
+    hash         TEXT    NOT NULL,
+    block_number INTEGER NOT NULL,
+    time_stamp   INTEGER NOT NULL,
+    tx_from      TEXT    NOT NULL,
+    tx_to        TEXT    NOT NULL,
+    value        TEXT    NOT NULL,
+    PRIMARY KEY (chain, address, hash)
+);
+CREATE INDEX IF NOT EXISTS idx_tx_block
+    ON transactions (chain, address, block_number DESC);
+CREATE TABLE IF NOT EXISTS sync_state (
+    chain      TEXT    NOT NULL,
+    address    TEXT    NOT NULL,
+    last_block INTEGER NOT NULL,
+    synced_at  REAL    NOT NULL,
+    first_block INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chain, address)
+);
+"""
+
+
+def _to_int(raw, default=0):
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return default
+
+
+class TransactionStore:
+    """
+    本地交易儲存 (SQLite)，以 (chain, address) 為單位保存已抓取的交易，
+    並記錄已完整同步的區塊範圍 [first_block, last_block]：
+    之後以 startblock=last+1 增量同步新交易，以 endblock=first-1 回補較舊的交易。
+    每個執行緒使用各自的連線。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        # 舊版資料庫沒有 first_block 欄位 (當時一律從區塊 0 往上同步，預設 0 即正確)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sync_state)")}
+        if "first_block" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE sync_state "
+                             "ADD COLUMN first_block INTEGER NOT NULL DEFAULT 0")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def sync_state(self, chain, address):
+        """ 回傳 (last_block, synced_at)；從未同步過則回傳 (None, None)。 """
+        row = self._conn().execute(
+            "SELECT last_block, synced_at FROM sync_state WHERE chain=? AND address=?",
+            (chain, address.lower())
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def first_block(self, chain, address):
+        """ 已完整同步的最低區塊 (0 為已回補到創世區塊)；從未同步過則回傳 None。 """
+        row = self._conn().execute(
+            "SELECT first_block FROM sync_state WHERE chain=? AND address=?",
+            (chain, address.lower())
+        ).fetchone()
+        return row[0] if row else None
+
+    def add(self, chain, address, txs, last_block=None, first_block=None):
+        """
+        寫入交易 (以 hash 去重) 並更新已完整同步的區塊範圍。
+        last_block / first_block 為 None 時保留原值 (新地址分別預設為 -1 與 0)。
+        """
+        address = address.lower()
+        rows = [
+            (chain, address, tx.get("hash", ""),
+             _to_int(tx.get("blockNumber")), _to_int(tx.get("timeStamp")),
+             tx.get("from") or "", tx.get("to") or "", str(tx.get("value", "0")))
+            for tx in txs
+        ]
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO transactions VALUES (?,?,?,?,?,?,?,?)", rows
+            )
+            conn.execute(
+                "INSERT INTO sync_state (chain, address, last_block, synced_at, first_block) "
+                "VALUES (:chain, :address, COALESCE(:last, -1), :now, COALESCE(:first, 0)) "
+                "ON CONFLICT (chain, address) DO UPDATE SET "
+                "last_block = COALESCE(:last, last_block), synced_at = :now, "
+                "first_block = COALESCE(:first, first_block)",
+                {"chain": chain, "address": address, "last": last_block,
+                 "first": first_block, "now": time.time()}
+            )
+
+    def count(self, chain, address):
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM transactions WHERE chain=? AND address=?",
+            (chain, address.lower())
+        ).fetchone()
+        return row[0]
+
+    def page(self, chain, address, page=1, offset=MAX_OFFSET):
+        """
+        依區塊新到舊取出第 page 頁 (每頁 offset 筆) 交易，
+        欄位格式與 txlist API 回傳相同 (數值皆為字串)。
+        """
+        cur = self._conn().execute(
+            "SELECT hash, block_number, time_stamp, tx_from, tx_to, value "
+            "FROM transactions WHERE chain=? AND address=? "
+            "ORDER BY block_number DESC, time_stamp DESC, hash "
+            "LIMIT ? OFFSET ?",
+            (chain, address.lower(), offset, (page - 1) * offset)
+        )
+        return [
+            {"hash": h, "blockNumber": str(b), "timeStamp": str(ts),
+             "from": f, "to": t, "value": v}
+            for h, b, ts, f, t, v in cur
+        ]
+
+
+def _lower_bound(txs, offset, upper):
+    """
+    遞減排序的一頁 (區塊 <= upper) 抓完後，已完整同步的最低區塊：
+    未滿頁代表已到創世區塊 (0)；滿頁時最低區塊可能只抓到一部分，之後從該區塊重抓 (以 hash 去重)。
+    """
+    if len(txs) < offset:
+        return 0
+    bottom = min(_to_int(tx.get("blockNumber")) for tx in txs)
+    if bottom >= upper:
+        # 整頁都在同一區塊：無法分頁，略過該區塊其餘交易以免停在原地
+        logging.warning(f"區塊 {bottom} 交易數超過單頁上限，部分交易無法取得")
+        return bottom
+    return bottom + 1
+
+
+def sync_address(store, chain, address, fetch, offset=MAX_OFFSET,
+                 max_pages=5, min_interval=0, on_progress=None, fetch_desc=None):
+    """
+    將 (chain, address) 的交易從 API 增量同步到 store。
+
+    首次同步 (且有 fetch_desc) 時先抓最新的一頁，讓 store.page() 的第一頁就是最近的交易；
+    之後每次同步先以 fetch 抓 last_block 之後的新交易，剩餘的呼叫次數再以 fetch_desc
+    從 first_block 往下回補較舊的區塊，直到回補到創世區塊。
+    未提供 fetch_desc 時從區塊 0 往上同步。
+
+    參數：
+      - fetch: callable(startblock, offset) -> list[dict]，依區塊遞增排序
+      - fetch_desc: callable(endblock, offset) -> list[dict]，區塊 <= endblock、依區塊遞減排序
+      - max_pages: 本次同步最多呼叫幾次 API，未完成的部分留待下次同步
+      - min_interval: 距上次同步未滿此秒數則不呼叫 API
+      - on_progress: callable(calls, rows)，每抓完一頁以累計的 API 呼叫數與交易數呼叫一次
+    回傳：
+      - int：本次呼叫 API 的次數
+    """
+    last_block, synced_at = store.sync_state(chain, address)
+    if synced_at is not None and time.time() - synced_at < min_interval:
+        return 0
+
+    calls = rows = 0
+
+    def fetched(txs):
+        nonlocal calls, rows
+        calls += 1
+        rows += len(txs)
+        if on_progress:
+            on_progress(calls, rows)
+
+    if last_block is None and fetch_desc is not None:
+        # 首次同步：先抓最新的一頁，較舊的區塊之後再回補
+        txs = fetch_desc(LATEST_BLOCK, offset)
+        fetched(txs)
+        top = max((_to_int(tx.get("blockNumber")) for tx in txs), default=-1)
+        store.add(chain, address, txs, top, _lower_bound(txs, offset, top))
+    else:
+        start = 0 if last_block is None else last_block + 1
+        while calls < max_pages:
+            txs = fetch(start, offset)
+            fetched(txs)
+            if len(txs) < offset:
+                # 已抓到最新區塊
+                top = max((_to_int(tx.get("blockNumber")) for tx in txs), default=start - 1)
+                store.add(chain, address, txs, max(top, start - 1))
+                break
+
+            # 整頁滿載：最高區塊可能只抓到一部分，下次從該區塊重抓 (以 hash 去重)
+            top = max(_to_int(tx.get("blockNumber")) for tx in txs)
+            store.add(chain, address, txs, top - 1)
+            if top <= start:
+                logging.warning(f"{chain}:{address} 區塊 {top} 交易數超過單頁上限，停止同步")
+                break
+            start = top
+
+    # 以剩餘的呼叫次數回補較舊的區塊
+    if fetch_desc is not None:
+        first = store.first_block(chain, address)
+        while first and calls < max_pages:
+            txs = fetch_desc(first - 1, offset)
+            fetched(txs)
+            first = _lower_bound(txs, offset, first - 1)
+            store.add(chain, address, txs, first_block=first)
+
+    logging.debug(f"{chain}:{address} 同步完成，API 呼叫 {calls} 次")
+    return calls
@@ -0,0 +1,162 @@
+# services/upstream.py
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from services.metrics import metrics
+
+# 請求優先順序 (數字越小越優先)：互動查詢 > 背景工作 / n-hop 擴展 > 批次作業
+INTERACTIVE, BACKGROUND, BULK = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", BULK: "bulk"}
+
+metrics.describe("upstream_key_wait_seconds", "histogram", "等待 API 金鑰配額的時間 (秒)")
+metrics.describe("upstream_rate_limited_total", "counter", "外部 API 回應超過速率限制的次數")
+
+
+class UpstreamBusy(Exception):
+    """ 在等待時間內沒有可用的 API 金鑰配額。 """
+
+
+class TokenBucket:
+    """ 每秒補充 rate 個 token，最多累積 burst 個；penalize 後在冷卻時間內不發放。 """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now):
+        """ 下一個 token 可取用的時間點 (monotonic)。 """
+        self._refill(now)
+        ready = now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+        return max(ready, self.blocked_until)
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def penalize(self, now, seconds):
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class KeyPool:
+    """
+    單一上游服務 (例如一條鏈的區塊鏈瀏覽器) 的 API 金鑰池。
+
+    每把金鑰以 token bucket 控制在服務公布的速率內；acquire() 取得最早可用的金鑰，
+    沒有配額時依優先順序排隊等待 (同優先順序先到先得)，因此持續吞吐量隨金鑰數增加，
+    背景工作也不會搶在互動查詢前面。收到速率限制回應時以 penalize() 讓該金鑰冷卻。
+
+    token bucket 只在本行程內；多個 worker 共用同一組金鑰時傳入 storage
+    (limits 的計數器儲存，例如 SQLiteLimiterStorage 或 redis://)，
+    每把金鑰另以共用的固定視窗計數器限制所有行程合計的速率，N 個 worker 不會送出 N 倍請求。
+    """
+
+    def __init__(self, name, keys, rate=5.0, burst=None, max_wait=30.0,
+                 max_retries=4, retry_backoff=1.0, storage=None):
+        self.name = name
+        self.keys = [k for k in keys if k]
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.storage = storage
+        # 共用計數器的視窗 (秒) 與視窗內的配額；速率低於每秒 1 次時拉長視窗
+        self.window = max(1, math.ceil(1 / rate))
+        self.window_limit = max(1, int(rate * self.window))
+        self._buckets = {k: TokenBucket(rate, burst or rate) for k in self.keys}
+        self._cond = threading.Condition()
+        self._waiters = []   # heap of (priority, seq)
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __bool__(self):
+        return bool(self.keys)
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        """ 取得一把可立即使用的金鑰 (並扣除一個 token)；超過 timeout 秒拋出 UpstreamBusy。 """
+        if not self.keys:
+            raise UpstreamBusy(f"{self.name} 未設定 API 金鑰")
+        timeout = self.max_wait if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._waiters[0] == ticket:
+                        key = min(self.keys, key=lambda k: self._buckets[k].ready_at(now))
+                        ready = self._buckets[key].ready_at(now)
+                        if ready <= now:
+                            if not self._take_shared(key, now):
+                                continue   # 其他 worker 已用完此金鑰本視窗的配額，改選下一把
+                            self._buckets[key].take(now)
+                            metrics.observe("upstream_key_wait_seconds", now - start,
+                                            service=self.name,
+                                            priority=PRIORITY_NAMES.get(priority, str(priority)))
+                            return key
+                        wait = ready - now
+                    if now >= deadline:
+                        raise UpstreamBusy(f"{self.name} API 請求過多，請稍後再試")
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def _shared_key(self, key):
+        return f"upstream/{self.name}/{key}"
+
+    def _take_shared(self, key, now):
+        """
+        在共用計數器扣除該金鑰一次配額；本視窗已被其他 worker 用完時，
+        本行程的 bucket 暫停到視窗結束並回傳 False。沒有 storage 時一律成功。
+        """
+        if self.storage is None:
+            return True
+        shared_key = self._shared_key(key)
+        if self.storage.incr(shared_key, self.window) <= self.window_limit:
+            return True
+        reset_in = max(0.0, self.storage.get_expiry(shared_key) - time.time())
+        self._buckets[key].penalize(now, reset_in)
+        return False
+
+    def penalize(self, key, seconds):
+        """ 該金鑰被上游判定超過速率：seconds 秒內不再使用 (有 storage 時其他 worker 本視窗也不再使用)。 """
+        metrics.inc("upstream_rate_limited_total", service=self.name)
+        with self._cond:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.penalize(time.monotonic(), seconds)
+                if self.storage is not None:
+                    self.storage.incr(self._shared_key(key), self.window, amount=self.window_limit)
+            self._cond.notify_all()
+
+    def call(self, fn, priority=INTERACTIVE, retry_on=()):
+        """
+        以金鑰池中的金鑰呼叫 fn(key)。fn 拋出 retry_on 中的例外 (速率限制) 時，
+        該金鑰冷卻 retry_backoff * 2^n 秒後改用下一把可用金鑰重試，最多 max_retries 次。
+        """
+        for attempt in range(self.max_retries + 1):
+            key = self.acquire(priority)
+            try:
+                return fn(key)
+            except retry_on:
+                if attempt >= self.max_retries:
+                    raise
+                self.penalize(key, self.retry_backoff * 2 ** attempt)
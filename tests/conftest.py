@@ -1,8 +1,22 @@
 # tests/conftest.py
-import pytest
-from dotenv import load_dotenv
 import os
+from unittest.mock import patch
 
-@pytest.fixture(scope='session', autouse=True)
-def load_env():
-    load_dotenv()  # 加載 .env 檔案
+# 測試不依賴 .env：config 在 import 時要求 API Key，於收集測試 (import app) 之前補上假的值；
+# 已設定的環境變數 (例如 CI 或本機 .env) 不覆蓋
+TEST_ENV = {
+    "ETHERSCAN_API_KEY": "test",
+    "BSCSCAN_API_KEY": "test",
+    "POLYGONSCAN_API_KEY": "test",
+    "BLACKLISTED_WALLETS": '["0x1234567890abcdef1234567890abcdef12345678", '
+                           '"0xabcdefabcdefabcdefabcdefabcdefabcdefabcd", "0xblacklisted"]',
+}
+_env_patch = patch.dict(os.environ, {k: v for k, v in TEST_ENV.items() if k not in os.environ})
+
+
+def pytest_configure(config):
+    _env_patch.start()
+
+
+def pytest_unconfigure(config):
+    _env_patch.stop()
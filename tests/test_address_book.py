@@ -0,0 +1,132 @@
+# tests/test_address_book.py
+import os
+import pickle
+import tempfile
+import threading
+import unittest
+import numpy as np
+from services.address_book import AddressBook, decode_keys, encode_addresses, get_address_book
+from services.blacklist import BlacklistMatcher
+from models.tx_batch import TransactionBatch
+from models.graph_index import AddressGraphIndex
+
+A = "0x" + "ab" * 20
+B = "0x" + "00" * 20
+C = "0x" + "12" * 20
+
+
+class TestAddressBook(unittest.TestCase):
+    def test_intern_and_lookup(self):
+        book = AddressBook()
+        ids = book.intern_many([A, C, A.upper().replace("0X", "0x"), "", "0xLabel", B])
+        self.assertEqual(ids[0], ids[2])
+        self.assertEqual(len(set(ids.tolist())), 5)
+        self.assertEqual(len(book), 5)
+        # 零地址與標籤 (鍵同為全 0) 不可混淆
+        self.assertNotEqual(book.lookup(B), book.lookup(""))
+        self.assertEqual(book.lookup("0xlabel"), ids[4])
+        self.assertEqual(book.lookup("0x" + "cd" * 20), -1)
+        self.assertEqual(book.intern_many([C, A]).tolist(), [ids[1], ids[0]])
+        self.assertEqual(book.address_strings(ids).tolist(), [A, C, A, "", "0xlabel", B])
+
+    def test_decode_keys(self):
+        keys, _ = encode_addresses([A, B, C])
+        self.assertEqual(decode_keys(keys).tolist(), [A, B, C])
+
+    def test_grows_and_persists(self):
+        addresses = ["0x%040x" % i for i in range(3000)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "book.npz")
+            book = AddressBook(path)
+            ids = book.intern_many(addresses[::-1])
+            label = book.intern("0xlabel")
+            book.save()
+
+            again = AddressBook(path)
+            self.assertEqual(again.lookup_many(addresses[::-1]).tolist(), ids.tolist())
+            self.assertEqual(again.lookup("0xlabel"), label)
+            self.assertEqual(again.intern(C), len(book))
+
+            # 已有地址的字典載入快照：併入且既有 id 不變
+            merged = AddressBook()
+            c_id = merged.intern(C)
+            merged.load(path)
+            self.assertEqual(merged.lookup(C), c_id)
+            self.assertEqual(len(merged), len(book) + 1)
+            self.assertEqual(merged.address_strings(merged.lookup_many(addresses[:3])).tolist(),
+                             addresses[:3])
+
+
+class TestInternedPipeline(unittest.TestCase):
+    def records(self):
+        return [{"hash": "0x%064x" % 1, "from": A, "to": C, "value": 1.0, "time": "t"},
+                {"hash": "0x%064x" % 2, "from": C, "to": "0xBlacklisted", "value": 2.0, "time": "t"}]
+
+    def test_batch_ids(self):
+        book = get_address_book()
+        batch = TransactionBatch.from_records(self.records())
+        self.assertEqual(book.address_strings(batch.gids).tolist(), batch.addresses.tolist())
+        self.assertEqual(batch.from_gids.tolist(), book.lookup_many([A, C]).tolist())
+
+        merged = TransactionBatch.concat([batch.take([1]), TransactionBatch.from_records(
+            [{"hash": "0x%064x" % 3, "from": B, "to": A, "value": 3.0, "time": "t"}])])
+        self.assertEqual(book.address_strings(merged.gids).tolist(), merged.addresses.tolist())
+
+        # 序列化後重新取得 id
+        restored = pickle.loads(pickle.dumps(batch))
+        self.assertEqual(restored.gids.tolist(), batch.gids.tolist())
+
+    def test_blacklist_ids(self):
+        matcher = BlacklistMatcher(extra=["0xBlacklisted", C])
+        batch = TransactionBatch.from_records(self.records())
+        self.assertEqual(batch.address_flags(matcher).tolist(),
+                         matcher.contains_many(batch.addresses).tolist())
+        ids = get_address_book().lookup_many([A, C, "0xblacklisted"])
+        self.assertEqual(matcher.contains_ids(np.append(ids, -1)).tolist(), [False, True, True, False])
+
+    def test_blacklist_ids_while_interning(self):
+        # 一個執行緒不斷配發新地址 (每 4 個有 1 個在黑名單)，另一個執行緒同時以 id 比對；
+        # 比對結果會快取在 matcher 中，不可因讀到尚未寫入的鍵而記成「不在黑名單」
+        book = AddressBook()
+        addresses = ["0x%040x" % (i + 1) for i in range(20000)]
+        matcher = BlacklistMatcher(extra=addresses[::4])
+        stop = threading.Event()
+
+        def intern():
+            for i in range(0, len(addresses), 50):
+                book.intern_many(addresses[i:i + 50])
+                book.intern("label-%d" % i)
+            stop.set()
+
+        def screen():
+            while not stop.is_set():
+                matcher.contains_ids(np.arange(len(book)), book=book)
+
+        threads = [threading.Thread(target=intern), threading.Thread(target=screen)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(30)
+        ids = book.lookup_many(addresses)
+        self.assertEqual(matcher.contains_ids(ids, book=book).tolist(),
+                         [i % 4 == 0 for i in range(len(addresses))])
+
+    def test_graph_index_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "graph.npz")
+            index = AddressGraphIndex(path)
+            batch = TransactionBatch.from_records(self.records())
+            index.add_batch(batch, np.array([10.0, 20.0]))
+            index.save()
+            loaded = AddressGraphIndex(path, book=AddressBook())
+            nodes, edges = loaded.neighborhood(A, hops=2)
+            self.assertEqual(sorted(nodes), sorted([A, C, "0xblacklisted"]))
+            self.assertEqual([e["target"] for e in loaded.edge_dicts(edges)], [C, "0xblacklisted"])
+            # 字典中存在、但本索引沒有邊的地址
+            loaded.book.intern(B)
+            nodes, edges = loaded.neighborhood(B)
+            self.assertEqual((nodes, len(edges)), ([], 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
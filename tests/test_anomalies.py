@@ -1,6 +1,6 @@
 # tests/test_anomalies.py
 import unittest
-from models.anomaly_detection import detect_anomalies
+from models.anomaly_detection import detect_anomalies, detect_large_transactions
 
 class TestAnomalyDetection(unittest.TestCase):
     def test_detect_anomalies(self):
@@ -80,5 +80,34 @@ class TestAnomalyDetection(unittest.TestCase):
         for anomaly in expected:
             self.assertIn(anomaly, result)
 
+    def test_detect_quick_in_out_not_adjacent(self):
+        # 0x1 與 0x3 之間夾了一筆無關交易，仍應偵測到 0x3
+        transactions = [
+            {"hash": "0x1", "from": "0xfrom1", "to": "0xhop", "value": 5.0, "time": "2021-01-01 00:00:00"},
+            {"hash": "0x2", "from": "0xother", "to": "0xother2", "value": 1.0, "time": "2021-01-01 00:01:00"},
+            {"hash": "0x3", "from": "0xhop", "to": "0xto2", "value": 4.0, "time": "2021-01-01 00:05:00"},
+            {"hash": "0x4", "from": "0xhop", "to": "0xto3", "value": 1.0, "time": "2021-01-01 00:20:00"},
+        ]
+        expected = [
+            {"type": "快速流入流出", "hash": "0x3", "value": "4.00", "time": "2021-01-01 00:05:00"}
+        ]
+        result = detect_anomalies(transactions, time_threshold=600)
+        self.assertEqual(result, expected)
+
+    def test_detect_quick_in_out_epoch_timestamps(self):
+        transactions = [
+            {"hash": "0x1", "from": "0xa", "to": "0xb", "value": 1.0, "timeStamp": "1609459200", "time": "t1"},
+            {"hash": "0x2", "from": "0xb", "to": "0xc", "value": 1.0, "timeStamp": "1609459260", "time": "t2"},
+        ]
+        result = detect_anomalies(transactions, time_threshold=60)
+        self.assertEqual(result, [{"type": "快速流入流出", "hash": "0x2", "value": "1.00", "time": "t2"}])
+
+    def test_custom_detectors(self):
+        transactions = [
+            {"hash": "0x1", "from": "0xblacklisted", "to": "0xto1", "value": 5000.0, "time": "2021-01-01 00:00:00"},
+        ]
+        result = detect_anomalies(transactions, detectors=[detect_large_transactions])
+        self.assertEqual([a["type"] for a in result], ["大額交易"])
+
 if __name__ == '__main__':
     unittest.main()
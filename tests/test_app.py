@@ -1,7 +1,24 @@
 # tests/test_app.py
+import io
+import os
+import json
+import time
+import tempfile
 import unittest
 from unittest.mock import patch
-from app import app
+from app import app, cache, limiter, get_usd_price_for_blockchain
+from services.tx_store import TransactionStore
+from models.graph_index import GraphIndexRegistry
+from models.tx_batch import format_time
+from services.price_history import PriceHistory
+
+def set_json_payload(mock_response, payload):
+    """ 模擬 API 回應：同時支援 resp.json() 與串流解析用的 resp.iter_content()。 """
+    body = json.dumps(payload).encode("utf-8")
+    mock_response.status_code = 200
+    mock_response.json.return_value = payload
+    mock_response.iter_content.side_effect = lambda chunk_size=1, **kw: iter(
+        [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)])
 
 class TestApp(unittest.TestCase):
 
@@ -10,13 +27,33 @@ class TestApp(unittest.TestCase):
         app.config['WTF_CSRF_ENABLED'] = False  # 禁用 CSRF
         self.app = app.test_client()
         self.app.testing = True
+        # 每個測試使用獨立的本地交易儲存
+        self.tmpdir = tempfile.TemporaryDirectory()
+        store = TransactionStore(os.path.join(self.tmpdir.name, "tx_store.sqlite3"))
+        self.store_patcher = patch('app.tx_store', store)
+        self.store_patcher.start()
+        # 圖索引只放記憶體，不寫檔
+        self.graph_patcher = patch('app.graph_indexes', GraphIndexRegistry(None))
+        self.graph_patcher.start()
+        self.price_patcher = patch('app.price_history',
+                                   PriceHistory(os.path.join(self.tmpdir.name, "prices.sqlite3")))
+        self.price_patcher.start()
+        # 匯率與 API 回應快取、速率限制計數不跨測試沿用
+        cache.clear()
+        limiter.reset()
+
+    def tearDown(self):
+        self.price_patcher.stop()
+        self.graph_patcher.stop()
+        self.store_patcher.stop()
+        self.tmpdir.cleanup()
 
     def test_index_get(self):
         response = self.app.get('/')
         self.assertEqual(response.status_code, 200)
         self.assertIn("金流追查系統", response.get_data(as_text=True))
 
-    @patch('app.requests.get')
+    @patch('services.http_client.http_get')
     def test_invalid_blockchain(self, mock_get):
         response = self.app.post('/', data={
             "blockchain": "invalid",
@@ -29,18 +66,18 @@ class TestApp(unittest.TestCase):
         # 由於表單驗證失敗，錯誤訊息應為 "表單驗證失敗。請檢查輸入。"
         self.assertIn("表單驗證失敗。請檢查輸入。", response.get_data(as_text=True))
 
-    @patch('app.requests.get')
+    @patch('services.http_client.http_get')
     def test_index_post_valid(self, mock_get):
         # 模擬 API 回應
         mock_response = mock_get.return_value
         mock_response.status_code = 200
-        mock_response.json.return_value = {
+        set_json_payload(mock_response, {
             "status": "1",
             "message": "OK",
             "result": [
                 {"hash": "0xabc", "from": "0xfromaddress", "to": "0xtoaddress", "value": "10000000000000000000", "timeStamp": "1609459200"}
             ]
-        }
+        })
 
         response = self.app.post('/', data={
             "blockchain": "ethereum",
@@ -52,12 +89,43 @@ class TestApp(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("查詢結果", response.get_data(as_text=True))
 
-    @patch('app.requests.get')
+    @patch('services.http_client.http_get')
+    def test_spot_price_uses_patched_client(self, mock_get):
+        mock_get.return_value.json.return_value = {"ethereum": {"usd": 2000.0}}
+        self.assertEqual(get_usd_price_for_blockchain("ethereum"), 2000.0)
+        self.assertIn("api/v3/simple/price?ids=ethereum", mock_get.call_args[0][0])
+
+    @patch('services.http_client.http_get')
+    def test_metrics_endpoint(self, mock_get):
+        set_json_payload(mock_get.return_value, {
+            "status": "1",
+            "message": "OK",
+            "result": [
+                {"hash": "0xabc", "from": "0xfromaddress", "to": "0xtoaddress", "value": "10000000000000000000", "timeStamp": "1609459200"}
+            ]
+        })
+        self.app.post('/', data={
+            "blockchain": "ethereum",
+            "address": "0x1234567890abcdef1234567890abcdef12345678",
+            "min_value": "0",
+            "page": "1"
+        })
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        body = response.get_data(as_text=True)
+        for stage in ("explorer_http", "explorer_decode", "store_sync", "analyze", "anomalies", "render"):
+            self.assertIn(f'pipeline_stage_seconds_count{{stage="{stage}"}}', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="POST",route="/",status="200",le="+Inf"}', body)
+        self.assertIn('upstream_requests_total{outcome="ok",service="explorer"}', body)
+        self.assertIn("result_cache_hits_total", body)
+
+    @patch('services.http_client.http_get')
     def test_no_transactions(self, mock_get):
         # 模擬 API 回應無交易
         mock_response = mock_get.return_value
         mock_response.status_code = 200
-        mock_response.json.return_value = {"status": "1", "message": "OK", "result": []}
+        set_json_payload(mock_response, {"status": "1", "message": "OK", "result": []})
 
         response = self.app.post('/', data={
             "blockchain": "ethereum",
@@ -69,18 +137,18 @@ class TestApp(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("該篩選條件下無交易記錄。", response.get_data(as_text=True))
 
-    @patch('app.requests.get')
+    @patch('services.http_client.http_get')
     def test_export(self, mock_get):
         # 模擬 API 回應
         mock_response = mock_get.return_value
         mock_response.status_code = 200
-        mock_response.json.return_value = {
+        set_json_payload(mock_response, {
             "status": "1",
             "message": "OK",
             "result": [
                 {"hash": "0xabc", "from": "0xfromaddress", "to": "0xtoaddress", "value": "10000000000000000000", "timeStamp": "1609459200"}
             ]
-        }
+        })
 
         # 執行查詢以設置 session['transactions']
         response = self.app.post('/', data={
@@ -96,7 +164,257 @@ class TestApp(unittest.TestCase):
         response = self.app.post('/export')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.headers["Content-Disposition"], 'attachment; filename=transactions.csv')
-        self.assertIn("交易哈希,來自,發送到,金額 (ETH),時間", response.get_data(as_text=True))
+        self.assertIn("交易哈希,來自,發送到,金額(原生),金額(USD),時間,區塊,時間戳,金額(wei)", response.get_data(as_text=True))
+
+    @patch('services.http_client.http_get')
+    def test_graph_data_uses_result_cache(self, mock_get):
+        mock_response = mock_get.return_value
+        mock_response.status_code = 200
+        set_json_payload(mock_response, {
+            "status": "1",
+            "message": "OK",
+            "result": [
+                {"hash": "0xabc", "from": "0xfromaddress", "to": "0xtoaddress", "value": "10000000000000000000", "timeStamp": "1609459200"}
+            ]
+        })
+        self.app.post('/', data={
+            "blockchain": "ethereum",
+            "address": "0x1234567890abcdef1234567890abcdef12345678",
+            "min_value": "0",
+            "max_value": "100",
+            "page": "1"
+        })
+        with self.app.session_transaction() as sess:
+            self.assertIn("result_id", sess)
+            self.assertNotIn("transactions", sess)
+
+        data = self.app.get('/graph_data').get_json()
+        self.assertEqual(data["links"], [{"source": "0xfromaddress", "target": "0xtoaddress", "value": 10.0,
+                                          "time": format_time(1609459200)}])
+
+    @patch('services.http_client.http_get')
+    def test_graph_data_nhop_follows_current_result(self, mock_get):
+        mock_response = mock_get.return_value
+        mock_response.status_code = 200
+        address = "0x1234567890abcdef1234567890abcdef12345678"
+        set_json_payload(mock_response, {
+            "status": "1",
+            "message": "OK",
+            "result": [
+                {"hash": "0xnhop1", "from": address, "to": "0xnhopkept", "value": "10000000000000000000", "timeStamp": "1609459200"},
+                {"hash": "0xnhop2", "from": address, "to": "0xnhopfiltered", "value": "500000000000000000000", "timeStamp": "1609459201"}
+            ]
+        })
+        self.app.post('/', data={
+            "blockchain": "ethereum",
+            "address": address,
+            "min_value": "0",
+            "max_value": "100",
+            "page": "1"
+        })
+        # 預設只走目前結果 (被金額篩選掉的交易不出現)；scope=index 才走整個圖索引
+        data = self.app.get('/graph_data_nhop?hop=1').get_json()
+        self.assertEqual([l["target"] for l in data["links"]], ["0xnhopkept"])
+        self.assertEqual(sorted(n["id"] for n in data["nodes"]), [address, "0xnhopkept"])
+        data = self.app.get('/graph_data_nhop?hop=1&scope=index').get_json()
+        self.assertIn("0xnhopfiltered", [l["target"] for l in data["links"]])
+
+    @patch('services.http_client.http_get')
+    def test_index_post_all_chains(self, mock_get):
+        mock_response = mock_get.return_value
+        mock_response.status_code = 200
+        set_json_payload(mock_response, {
+            "status": "1",
+            "message": "OK",
+            "result": [
+                {"hash": "0xabc", "from": "0xfromaddress", "to": "0xtoaddress", "value": "10000000000000000000", "timeStamp": "1609459200"}
+            ]
+        })
+        response = self.app.post('/', data={
+            "blockchain": "all",
+            "address": "0x1234567890abcdef1234567890abcdef12345678",
+            "min_value": "0",
+            "max_value": "100",
+            "page": "1"
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("查詢結果", response.get_data(as_text=True))
+        data = self.app.get('/api/transactions').get_json()
+        self.assertEqual(sorted(tx["chain"] for tx in data["transactions"]), ["bsc", "ethereum", "polygon"])
+
+    @patch('services.http_client.http_get')
+    def test_transactions_api(self, mock_get):
+        wallet = "0x1234567890abcdef1234567890abcdef12345678"
+        rows = [{"hash": f"0x{i:03x}", "from": wallet if i % 2 else f"0x{i:040x}",
+                 "to": f"0x{i:040x}" if i % 2 else wallet,
+                 "value": str((i + 1) * 10 ** 17), "timeStamp": str(1609459200 + i * 60),
+                 "blockNumber": str(100 + i)} for i in range(30)]
+        set_json_payload(mock_get.return_value, {"status": "1", "message": "OK", "result": rows})
+        self.assertEqual(self.app.get('/api/transactions').status_code, 404)
+        response = self.app.post('/', data={
+            "blockchain": "ethereum",
+            "address": wallet,
+            "min_value": "0",
+            "page": "1"
+        })
+        # 結果頁不再內嵌所有交易
+        self.assertNotIn("0x01d", response.get_data(as_text=True))
+
+        first = self.app.get('/api/transactions?limit=20').get_json()
+        self.assertEqual(first["total"], 30)
+        self.assertEqual([tx["hash"] for tx in first["transactions"][:2]], ["0x01d", "0x01c"])
+        self.assertIsNone(first["prev_cursor"])
+        second = self.app.get(f'/api/transactions?limit=20&cursor={first["next_cursor"]}').get_json()
+        self.assertEqual(len(second["transactions"]), 10)
+        self.assertIsNone(second["next_cursor"])
+        self.assertEqual(second["transactions"][-1]["hash"], "0x000")
+
+        by_value = self.app.get('/api/transactions?sort=value&order=asc&limit=3').get_json()
+        self.assertEqual([tx["value"] for tx in by_value["transactions"]], [0.1, 0.2, 0.3])
+        incoming = self.app.get('/api/transactions?direction=in&min_value=2').get_json()
+        self.assertEqual(incoming["total"], 5)
+        self.assertTrue(all(tx["to"] == wallet for tx in incoming["transactions"]))
+        found = self.app.get('/api/transactions?q=0x00A').get_json()
+        self.assertEqual([tx["hash"] for tx in found["transactions"]], ["0x00a"])
+
+        # cursor 只適用於產生它的排序/篩選條件
+        bad = self.app.get(f'/api/transactions?sort=value&cursor={first["next_cursor"]}')
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(self.app.get('/api/transactions?sort=gas').status_code, 400)
+
+    @patch('services.http_client.http_get')
+    def test_refilter_without_refetch(self, mock_get):
+        wallet = "0x1234567890abcdef1234567890abcdef12345678"
+        rows = [{"hash": f"0x{i:03x}", "from": wallet if i % 2 else f"0x{i:040x}",
+                 "to": f"0x{i:040x}" if i % 2 else wallet,
+                 "value": str((i + 1) * 10 ** 17), "timeStamp": str(1609459200 + i * 86400),
+                 "blockNumber": str(100 + i)} for i in range(10)]
+        set_json_payload(mock_get.return_value, {"status": "1", "message": "OK", "result": rows})
+        form = {"blockchain": "ethereum", "address": wallet, "min_value": "0", "page": "1"}
+        self.app.post('/', data=form)
+        self.assertEqual(self.app.get('/api/transactions').get_json()["total"], 10)
+        calls = mock_get.call_count
+
+        # 同一查詢只改篩選條件：由篩選索引重新篩選，不再呼叫 API
+        response = self.app.post('/', data=dict(form, min_value="0.5", direction="out"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, calls)
+        data = self.app.get('/api/transactions').get_json()
+        self.assertEqual(sorted(tx["hash"] for tx in data["transactions"]),
+                         ["0x005", "0x007", "0x009"])
+
+        filtered = self.app.get('/api/filter?direction=in&max_value=0.5').get_json()
+        self.assertEqual((filtered["total"], filtered["source_total"]), (3, 10))
+        self.assertEqual(mock_get.call_count, calls)
+        self.assertEqual(self.app.get('/api/transactions').get_json()["total"], 3)
+        self.assertEqual(self.app.get('/api/filter?direction=up').status_code, 400)
+        self.assertEqual(self.app.get('/api/filter?start_date=2021/01/01').status_code, 400)
+
+    @patch('services.http_client.http_get')
+    def test_taint(self, mock_get):
+        wallet = "0x" + "5e" * 20
+        mule = "0x" + "4d" * 20
+        rows = [{"hash": "0x%064x" % 1, "from": "0xblacklisted", "to": mule,
+                 "value": str(4 * 10 ** 18), "timeStamp": "1609459200", "blockNumber": "1"},
+                {"hash": "0x%064x" % 2, "from": mule, "to": wallet,
+                 "value": str(2 * 10 ** 18), "timeStamp": "1609459300", "blockNumber": "2"},
+                {"hash": "0x%064x" % 3, "from": wallet, "to": mule,
+                 "value": str(10 ** 18), "timeStamp": "1609459100", "blockNumber": "0"}]
+        set_json_payload(mock_get.return_value, {"status": "1", "message": "OK", "result": rows})
+        self.app.post('/', data={"blockchain": "ethereum", "address": wallet, "min_value": "0", "page": "1"})
+
+        data = self.app.get('/taint?model=haircut').get_json()
+        self.assertEqual((data["seeds"], data["chain"]), (1, "ethereum"))
+        # mule 先收到 wallet 的 1 (乾淨) 與黑名單的 4，轉出 2 中有 4/5 為污點
+        self.assertAlmostEqual(data["target"]["tainted"], 1.6)
+        self.assertEqual(data["target"]["hops"], 2)
+        self.assertEqual(data["nodes"][0]["id"], mule)
+        self.assertEqual(data["links"][0]["taint"], 4.0)
+        self.assertEqual(self.app.get('/taint?model=poison').get_json()["target"]["tainted"], 2.0)
+        self.assertTrue(self.app.get('/taint?model=haircut').get_json()["stats"]["cached"])
+        self.assertEqual(self.app.get('/taint?model=lifo').status_code, 400)
+        self.assertEqual(self.app.get('/taint?chain=all').status_code, 400)
+        for hops in ("0", "-1", "", "x"):
+            self.assertEqual(self.app.get(f'/taint?max_hops={hops}').status_code, 400)
+        self.assertEqual(self.app.get('/taint?max_hops=1').get_json()["target"]["tainted"], 0.0)
+
+    @patch('services.http_client.http_get')
+    def test_background_job(self, mock_get):
+        set_json_payload(mock_get.return_value, {
+            "status": "1",
+            "message": "OK",
+            "result": [
+                {"hash": "0xabc", "from": "0xfromaddress", "to": "0xtoaddress", "value": "10000000000000000000", "timeStamp": "1609459200"}
+            ]
+        })
+        response = self.app.post('/', data={
+            "blockchain": "ethereum",
+            "address": "0x1234567890abcdef1234567890abcdef12345678",
+            "min_value": "0",
+            "page": "1",
+            "background": "y"
+        })
+        self.assertEqual(response.status_code, 302)
+        job_url = response.headers["Location"]
+        self.assertIn("背景查詢", self.app.get(job_url).get_data(as_text=True))
+
+        deadline = time.time() + 5
+        status = self.app.get(job_url + "/status").get_json()
+        while status["status"] not in ("done", "failed") and time.time() < deadline:
+            time.sleep(0.02)
+            status = self.app.get(job_url + "/status").get_json()
+        self.assertEqual(status["status"], "done")
+        self.assertEqual(status["progress"]["pages_fetched"], 1)
+        self.assertEqual(status["progress"]["rows_fetched"], 1)
+        self.assertEqual(status["progress"]["rows_processed"], 1)
+
+        response = self.app.get(status["result_url"])
+        self.assertIn("查詢結果", response.get_data(as_text=True))
+        data = self.app.get('/graph_data').get_json()
+        self.assertEqual(data["links"], [{"source": "0xfromaddress", "target": "0xtoaddress", "value": 10.0,
+                                          "time": format_time(1609459200)}])
+        self.assertEqual(self.app.get('/jobs/unknown/status').status_code, 404)
+
+    @patch('services.http_client.http_get')
+    def test_screen(self, mock_get):
+        set_json_payload(mock_get.return_value, {
+            "status": "1",
+            "message": "OK",
+            "result": [
+                {"hash": "0xabc", "from": "0xblacklisted", "to": "0xtoaddress", "value": "10000000000000000000", "timeStamp": "1609459200"}
+            ]
+        })
+        self.assertIn("批次地址篩查", self.app.get('/screen').get_data(as_text=True))
+        a = "0x" + "11" * 20
+        b = "0x" + "22" * 20
+        response = self.app.post('/screen', data={
+            "blockchain": "ethereum",
+            "addresses": f"{a}\n{b.upper().replace('0X', '0x')}",
+            "address_file": (io.BytesIO(f"address,label\n{a},deposit\n".encode()), "list.csv"),
+        }, content_type="multipart/form-data")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        reports, summary = lines[:-1], lines[-1]
+        self.assertEqual(sorted(r["address"] for r in reports), [a, b])
+        for r in reports:
+            self.assertEqual((r["status"], r["risk"], r["blacklist_hits"]), ("ok", "high", 1))
+            self.assertEqual(r["blacklisted_counterparties"], ["0xblacklisted"])
+        self.assertEqual((summary["done"], summary["screened"], summary["risk_counts"]["high"]),
+                         (True, 2, 2))
+        self.assertEqual(([r["truncated"] for r in reports], summary["truncated"]), ([False, False], 0))
+
+        # 交易多於一頁時只分析最近的一頁，報告標示 truncated
+        set_json_payload(mock_get.return_value, {"status": "1", "message": "OK", "result": [
+            {"hash": f"0xdef{i}", "from": "0xfromaddress", "to": "0xtoaddress", "value": "1",
+             "timeStamp": str(1609459200 + i), "blockNumber": str(100 - i)} for i in range(2)]})
+        with patch("app.SCREEN_PAGE_SIZE", 2):
+            response = self.app.post('/screen', data={"blockchain": "ethereum", "addresses": "0x" + "33" * 20})
+        report, summary = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual((report["tx_count"], report["truncated"], summary["truncated"]), (2, True, 1))
+
+        response = self.app.post('/screen', data={"blockchain": "ethereum", "addresses": "0x123"})
+        self.assertEqual(response.status_code, 400)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,38 @@
+# tests/test_benchmarks.py
+import unittest
+from benchmarks.synthetic import generate_txlist
+from benchmarks.run_benchmarks import run_suite, compare, parse_rows, STAGES
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_generator_shape(self):
+        data = generate_txlist(2000, counterparties=50, blacklist_size=10, blacklist_rate=0.1)
+        txs = data["result"]
+        self.assertEqual(len(txs), 2000)
+        blocks = [int(tx["blockNumber"]) for tx in txs]
+        self.assertEqual(blocks, sorted(blocks))
+        self.assertTrue(all(data["wallet"] in (tx["from"], tx["to"]) for tx in txs))
+        blacklist = set(data["blacklist"])
+        hits = sum(1 for tx in txs if tx["from"] in blacklist or tx["to"] in blacklist)
+        self.assertTrue(100 < hits < 300)
+        # 同樣的 seed 產生相同資料
+        self.assertEqual(generate_txlist(10, seed=3)["result"], generate_txlist(10, seed=3)["result"])
+
+    def test_run_suite_small(self):
+        report = run_suite([300], repeat=1, log=lambda msg: None)
+        self.assertEqual([r["stage"] for r in report["results"]], STAGES)
+        for r in report["results"]:
+            self.assertGreaterEqual(r["seconds_median"], 0)
+            self.assertGreaterEqual(r["peak_mb"], 0)
+
+        slower = {"results": [dict(r, seconds_median=r["seconds_median"] * 2 + 1)
+                              for r in report["results"]]}
+        self.assertEqual(len(compare(slower, report)), len(STAGES))
+        self.assertEqual(compare(report, slower), [])
+
+    def test_parse_rows(self):
+        self.assertEqual(parse_rows("10k, 100k,1M,500"), [10000, 100000, 1000000, 500])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# tests/test_blacklist.py
+import os
+import json
+import tempfile
+import unittest
+from services.blacklist import BlacklistMatcher, compile_feeds, encode_addresses
+
+A = "0x" + "ab" * 20
+B = "0x" + "00" * 19 + "01"
+C = "0x" + "12" * 20
+
+
+class TestBlacklist(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.feed = os.path.join(self.tmpdir.name, "feed.txt")
+        self.db = os.path.join(self.tmpdir.name, "blacklist.npy")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_feed(self, lines):
+        with open(self.feed, "w") as fh:
+            fh.write("\n".join(lines))
+
+    def test_encode_addresses(self):
+        keys, valid = encode_addresses([A, A.upper().replace("0X", "0x"), "0x123", "0x" + "zz" * 20])
+        self.assertEqual(valid.tolist(), [True, True, False, False])
+        self.assertEqual(keys[0], keys[1])
+        self.assertEqual(bytes(keys[0]), b"\xab" * 20)
+
+    def test_compile_and_batch_membership(self):
+        self.write_feed(["# 註解", A + ",OFAC", B, "not-an-address", A])
+        keys = compile_feeds([self.feed], self.db)
+        self.assertEqual(len(keys), 2)
+        matcher = BlacklistMatcher(self.db, feeds=[self.feed], extra=["0xBlacklisted", C])
+        hits = matcher.contains_many([A.upper().replace("0X", "0x"), B, C, "0xblacklisted",
+                                      "0x" + "cd" * 20, ""])
+        self.assertEqual(hits.tolist(), [True, True, True, True, False, False])
+        self.assertIn(B, matcher)
+
+    def test_hot_reload_on_feed_change(self):
+        self.write_feed([A])
+        matcher = BlacklistMatcher(self.db, feeds=[self.feed], check_interval=0)
+        self.assertNotIn(C, matcher)
+
+        # 讓編譯檔看起來比名單舊，再更新名單
+        st = os.stat(self.db)
+        os.utime(self.db, ns=(st.st_atime_ns, st.st_mtime_ns - 10 ** 10))
+        self.write_feed([A, C])
+        # 重新編譯在背景執行，查詢期間仍使用舊版本
+        self.assertFalse(matcher.maybe_reload())
+        matcher.wait_compiled(5)
+        self.assertIn(C, matcher)
+        self.assertFalse(matcher.maybe_reload())
+
+        # 其他行程替換編譯檔時，下次檢查即載入新版本
+        other = BlacklistMatcher(self.db, check_interval=0)
+        json_feed = os.path.join(self.tmpdir.name, "feed.json")
+        with open(json_feed, "w") as fh:
+            json.dump([B], fh)
+        compile_feeds([json_feed], self.db)
+        self.assertTrue(other.maybe_reload())
+        self.assertEqual(other.contains_many([A, B]).tolist(), [False, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# tests/test_explorer.py
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+from services.explorer import decode_txlist, fetch_txlist, ExplorerError
+
+
+def raw_tx(i, value):
+    return {"blockNumber": str(100 + i), "timeStamp": str(1609459200 + i), "hash": f"0x{i:064x}",
+            "from": "0xAAAA", "to": "0xbbbb", "value": str(value), "gas": "21000",
+            "input": "0x" + "ab" * 50, "confirmations": "1000"}
+
+
+def chunked(payload, size):
+    body = json.dumps(payload, ensure_ascii=False, indent=1).encode("utf-8")
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestExplorerDecode(unittest.TestCase):
+    def setUp(self):
+        self.payload = {"status": "1", "message": "OK",
+                        "result": [raw_tx(i, v) for i, v in enumerate([5, 10 ** 18, 0, 123456789])]}
+
+    def test_decode_any_chunk_boundary(self):
+        expected = None
+        for size in (1, 2, 3, 7, 64, 100000):
+            status, message, txs, scanned, top = decode_txlist(chunked(self.payload, size))
+            self.assertEqual((status, message, scanned, top), ("1", "OK", 4, 103))
+            if expected is None:
+                expected = txs
+            self.assertEqual(txs, expected)
+        self.assertEqual(expected[1], {"hash": "0x" + "0" * 63 + "1", "from": "0xaaaa", "to": "0xbbbb",
+                                       "value": 10 ** 18, "timeStamp": 1609459201, "blockNumber": 101})
+
+    def test_filter_during_decode(self):
+        _, _, txs, scanned, top = decode_txlist(chunked(self.payload, 5), min_value=6, max_value=10 ** 18)
+        self.assertEqual([tx["value"] for tx in txs], [10 ** 18, 123456789])
+        self.assertEqual((scanned, top), (4, 103))
+
+    def test_error_and_empty_responses(self):
+        err = {"status": "0", "message": "NOTOK", "result": "Invalid API Key"}
+        self.assertEqual(decode_txlist(chunked(err, 4))[:3], ("0", "NOTOK: Invalid API Key", []))
+        empty = {"status": "0", "message": "No transactions found", "result": []}
+        self.assertEqual(decode_txlist(chunked(empty, 4))[:3], ("0", "No transactions found", []))
+
+    @patch('services.http_client.http_get')
+    def test_fetch_txlist_streams(self, mock_get):
+        resp = MagicMock()
+        resp.iter_content.return_value = iter(chunked(self.payload, 16))
+        mock_get.return_value = resp
+        txs = fetch_txlist("https://api.example", "key", "0xbbbb")
+        self.assertEqual(len(txs), 4)
+        self.assertTrue(mock_get.call_args.kwargs["stream"])
+        resp.close.assert_called_once()
+
+        resp.iter_content.return_value = iter([b"<html>busy</html>"])
+        with self.assertRaises(ExplorerError):
+            fetch_txlist("https://api.example", "key", "0xbbbb")
+        resp.iter_content.return_value = iter(chunked({"status": "0", "message": "NOTOK", "result": "x"}, 8))
+        with self.assertRaisesRegex(ExplorerError, "NOTOK"):
+            fetch_txlist("https://api.example", "key", "0xbbbb")
+
+
+if __name__ == '__main__':
+    unittest.main()
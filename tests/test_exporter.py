@@ -0,0 +1,51 @@
+# tests/test_exporter.py
+import io
+import gzip
+import unittest
+import numpy as np
+from models.tx_batch import TransactionBatch
+from services.exporter import iter_csv, iter_gzip, iter_columnar, ARROW_AVAILABLE
+
+
+class TestExporter(unittest.TestCase):
+    def setUp(self):
+        raw = [{"hash": f"0x{i}", "from": "0xa", "to": "0xb", "value": str(i * 10**18),
+                "timeStamp": str(1609459200 + i), "blockNumber": str(i)} for i in range(5)]
+        self.batch = TransactionBatch.from_raw(raw)
+        self.usd = self.batch.usd_values(2.0)
+        self.records = self.batch.to_records(self.usd)
+
+    def test_csv_chunks(self):
+        chunks = list(iter_csv(self.records, chunk_rows=2))
+        self.assertEqual(len(chunks), 3)
+        lines = "".join(chunks).splitlines()
+        self.assertTrue(lines[0].startswith("交易哈希,來自,發送到"))
+        self.assertEqual(len(lines), 6)
+
+    def test_gzip_stream(self):
+        data = b"".join(iter_gzip(iter_csv(self.records, chunk_rows=2)))
+        text = gzip.decompress(data).decode("utf-8")
+        self.assertEqual(text, "".join(iter_csv(self.records)))
+
+    def test_npz(self):
+        data = b"".join(iter_columnar(self.batch, self.usd, "npz"))
+        arrays = np.load(io.BytesIO(data))
+        self.assertEqual(arrays["usd_value"].tolist(), [0.0, 2.0, 4.0, 6.0, 8.0])
+        self.assertEqual(arrays["hash"][1], "0x1")
+        self.assertEqual(arrays["value_wei"].tolist(), [str(i * 10**18) for i in range(5)])
+
+    @unittest.skipUnless(ARROW_AVAILABLE, "pyarrow 未安裝")
+    def test_parquet_and_arrow(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        data = b"".join(iter_columnar(self.batch, self.usd, "parquet", chunk_rows=2))
+        table = pq.read_table(io.BytesIO(data))
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column("block_number").to_pylist(), [0, 1, 2, 3, 4])
+        data = b"".join(iter_columnar(self.batch, self.usd, "arrow", chunk_rows=2))
+        table = pa.ipc.open_stream(data).read_all()
+        self.assertEqual(table.column("to").to_pylist(), ["0xb"] * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
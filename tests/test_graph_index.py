@@ -0,0 +1,109 @@
+# tests/test_graph_index.py
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from models.tx_batch import TransactionBatch
+from models.graph_index import AddressGraphIndex, hash_key
+
+# a -> b -> c -> d，a -> c，e -> a
+EDGES = [("0xa", "0xb"), ("0xb", "0xc"), ("0xc", "0xd"), ("0xa", "0xc"), ("0xe", "0xa")]
+
+
+def make_batch(edges, start=0):
+    raw = [{"hash": f"0x{start + i:064x}", "from": f, "to": t, "value": str(10**18),
+            "timeStamp": str(1609459200 + i), "blockNumber": str(i)}
+           for i, (f, t) in enumerate(edges)]
+    return TransactionBatch.from_raw(raw)
+
+
+class TestAddressGraphIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = AddressGraphIndex()
+        batch = make_batch(EDGES)
+        self.index.add_batch(batch, batch.usd_values(2.0))
+
+    def test_dedupe(self):
+        batch = make_batch(EDGES)
+        self.assertEqual(self.index.add_batch(batch, batch.usd_values(2.0)), 0)
+        self.assertEqual(self.index.edge_count, 5)
+
+    def test_distinct_short_hashes_not_deduplicated(self):
+        # 舊版鍵對 18 字元以內的哈希一律為 0；鍵相同時也須比對完整哈希
+        raw = [{"hash": h, "from": "0xa", "to": "0xb", "value": str(10**18),
+                "timeStamp": "1609459200", "blockNumber": "1"} for h in ("0x1", "0x2", "0xAB", "0xab")]
+        batch = TransactionBatch.from_raw(raw)
+        index = AddressGraphIndex()
+        self.assertEqual(index.add_batch(batch, batch.usd_values(1.0)), 3)
+        # 所有鍵都碰撞時仍以完整哈希去重
+        with patch("models.graph_index.hash_key", lambda hashes: np.zeros(len(hashes), dtype=np.int64)):
+            index = AddressGraphIndex()
+            self.assertEqual(index.add_batch(batch, batch.usd_values(1.0)), 3)
+            more = TransactionBatch.from_raw([dict(raw[0], hash="0x3"), raw[1]])
+            self.assertEqual(index.add_batch(more, more.usd_values(1.0)), 1)
+            self.assertEqual(index.edge_count, 4)
+
+    def test_keys_are_deterministic(self):
+        self.assertEqual(hash_key(["0x" + "ab" * 32]).tolist(), hash_key(["0X" + "AB" * 32]).tolist())
+        self.assertEqual(hash_key(["not-hex"]).tolist(), [4753865855559195877])
+
+    def test_neighborhood(self):
+        nodes, edges = self.index.neighborhood("0xA", hops=1)
+        self.assertEqual(sorted(nodes), ["0xa", "0xb", "0xc", "0xe"])
+        self.assertEqual(len(edges), 3)
+        nodes, edges = self.index.neighborhood("0xa", hops=2)
+        self.assertIn("0xd", nodes)
+        self.assertEqual(len(edges), 5)
+
+    def test_neighborhood_restricted_and_truncated(self):
+        # 只走指定的邊：a -> b 與 b -> c
+        allowed = self.index.edge_ids(["0x" + f"{i:064x}" for i in (0, 1)] + ["0xmissing"])
+        self.assertEqual(len(allowed), 2)
+        nodes, edges = self.index.neighborhood("0xa", hops=2, edge_ids=allowed)
+        self.assertEqual(sorted(nodes), ["0xa", "0xb", "0xc"])
+        self.assertEqual(len(edges), 2)
+        # 截斷後只保留留下來的邊的端點
+        nodes, edges = self.index.neighborhood("0xa", hops=2, max_edges=1)
+        self.assertEqual(len(edges), 1)
+        self.assertEqual(len(nodes), 2)
+
+    def test_shortest_path(self):
+        path = self.index.shortest_path("0xa", "0xd")
+        links = self.index.edge_dicts(path)
+        self.assertEqual([(l["source"], l["target"]) for l in links], [("0xa", "0xc"), ("0xc", "0xd")])
+        self.assertIsNone(self.index.shortest_path("0xd", "0xa"))
+        self.assertEqual(len(self.index.shortest_path("0xd", "0xa", directed=False)), 2)
+
+    def test_all_paths(self):
+        paths = self.index.all_paths("0xa", "0xd", max_hops=3)
+        self.assertEqual(sorted(len(p) for p in paths), [2, 3])
+        self.assertEqual(len(self.index.all_paths("0xa", "0xd", max_hops=2)), 1)
+
+    def test_incremental_batches_keep_keys_sorted(self):
+        index = AddressGraphIndex()
+        for page in range(5):
+            batch = make_batch(EDGES * 300, start=page * 1000)
+            # 每頁與前一頁重疊 500 筆哈希
+            self.assertEqual(index.add_batch(batch, batch.usd_values(1.0)), 1000 if page else 1500)
+        self.assertEqual(index.edge_count, 5500)
+        self.assertEqual(index._sorted_keys.tolist(), sorted(index.keys.tolist()))
+        self.assertEqual(index.keys[index._key_order].tolist(), index._sorted_keys.tolist())
+        self.assertEqual(len(index.edge_ids(make_batch(EDGES * 300, start=2000).hashes)), 1500)
+
+    def test_persistence_and_incremental_update(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ethereum.npz")
+            index = AddressGraphIndex(path)
+            batch = make_batch(EDGES)
+            index.add_batch(batch, batch.usd_values(1.0))
+            index.save()
+            loaded = AddressGraphIndex(path)
+            self.assertEqual(loaded.edge_count, 5)
+            batch = make_batch([("0xd", "0xf")], start=100)
+            loaded.add_batch(batch, batch.usd_values(1.0))
+            self.assertEqual(len(loaded.shortest_path("0xa", "0xf")), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# tests/test_graph_payload.py
+import unittest
+from models.tx_batch import TransactionBatch, format_time
+from models.graph_payload import build_graph_payload
+
+
+def make_batch(edges):
+    raw = [{"hash": f"0x{i}", "from": f, "to": t, "value": str(v * 10**18),
+            "timeStamp": str(1609459200 + i), "blockNumber": str(i)}
+           for i, (f, t, v) in enumerate(edges)]
+    return TransactionBatch.from_raw(raw)
+
+
+class TestGraphPayload(unittest.TestCase):
+    def setUp(self):
+        self.batch = make_batch([("0xa", "0xb", 1), ("0xa", "0xb", 2), ("0xb", "0xc", 10),
+                                 ("0xc", "0xc", 5), ("0xd", "0xa", 0.5)])
+        self.usd = self.batch.usd_values(1.0)
+
+    def test_per_transaction(self):
+        ret = build_graph_payload(self.batch, self.usd, {"0xd"})
+        self.assertEqual(len(ret["links"]), 4)  # 自連交易不產生連線
+        self.assertEqual(len(ret["nodes"]), 4)
+        self.assertTrue(next(n for n in ret["nodes"] if n["id"] == "0xd")["is_blacklisted"])
+        self.assertEqual(ret["links"][0]["time"], format_time(1609459200))
+        self.assertFalse(ret["aggregated"])
+
+    def test_max_links_switches_to_aggregate(self):
+        ret = build_graph_payload(self.batch, self.usd, set(), max_links=4)
+        self.assertEqual((len(ret["links"]), ret["aggregated"]), (4, False))
+        ret = build_graph_payload(self.batch, self.usd, set(), max_links=2)
+        self.assertTrue(ret["aggregated"])
+        self.assertEqual([(l["source"], l["target"], l["count"]) for l in ret["links"]],
+                         [("0xb", "0xc", 1), ("0xa", "0xb", 2)])
+
+    def test_aggregate(self):
+        ret = build_graph_payload(self.batch, self.usd, set(), aggregate=True)
+        ab = next(l for l in ret["links"] if l["source"] == "0xa" and l["target"] == "0xb")
+        self.assertEqual((ab["count"], ab["value"]), (2, 3.0))
+        self.assertEqual(len(ret["links"]), 3)
+
+    def test_top_k_and_compact(self):
+        ret = build_graph_payload(self.batch, self.usd, set(), aggregate=True,
+                                  top_k=1, compact=True)
+        self.assertEqual(len(ret["links"]), 1)
+        s, t, value, count = ret["links"][0][:4]
+        self.assertEqual((ret["nodes"][s][0], ret["nodes"][t][0], value, count), ("0xb", "0xc", 10.0, 1))
+        self.assertEqual(len(ret["nodes"]), 2)
+
+    def test_top_nodes(self):
+        ret = build_graph_payload(self.batch, self.usd, set(), aggregate=True, top_nodes=2)
+        self.assertEqual(sorted(n["id"] for n in ret["nodes"]), ["0xb", "0xc"])
+        self.assertEqual([(l["source"], l["target"]) for l in ret["links"]], [("0xb", "0xc")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+# tests/test_history_fetcher.py
+import threading
+import unittest
+from services.history_fetcher import fetch_history
+
+
+def make_chain(n_blocks, txs_per_block):
+    txs = []
+    for block in range(n_blocks):
+        for j in range(txs_per_block):
+            txs.append({"hash": f"0x{block:06d}{j:03d}", "blockNumber": str(block)})
+    return txs
+
+
+class TestHistoryFetcher(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def fetcher(self, chain_txs):
+        def fetch_range(startblock, endblock, offset):
+            with self.lock:
+                self.calls.append((startblock, endblock))
+            return [tx for tx in chain_txs
+                    if startblock <= int(tx["blockNumber"]) <= endblock][:offset]
+        return fetch_range
+
+    def test_full_history_beyond_window(self):
+        chain_txs = make_chain(200, 3)  # 600 筆，視窗只有 50 筆
+        txs, complete_upto = fetch_history(self.fetcher(chain_txs), endblock=1000, offset=50)
+        self.assertEqual(len(txs), 600)
+        self.assertEqual(len({tx["hash"] for tx in txs}), 600)
+        self.assertEqual(complete_upto, 199)
+        self.assertEqual([tx["hash"] for tx in txs], [tx["hash"] for tx in chain_txs])
+
+    def test_request_budget(self):
+        chain_txs = make_chain(200, 3)
+        txs, complete_upto = fetch_history(self.fetcher(chain_txs), endblock=1000,
+                                           offset=50, max_requests=3)
+        self.assertEqual(len(self.calls), 3)
+        self.assertLess(complete_upto, 199)
+        # complete_upto 以前的區塊必須完整
+        got = {tx["hash"] for tx in txs}
+        for tx in chain_txs:
+            if int(tx["blockNumber"]) <= complete_upto:
+                self.assertIn(tx["hash"], got)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# tests/test_jobs.py
+import os
+import time
+import tempfile
+import threading
+import unittest
+from services.jobs import JobManager, JobQueueFull, DONE, FAILED
+from services.shared_cache import SharedCache, SharedFlaskCache
+
+
+class UserError(Exception):
+    pass
+
+
+def wait_for(manager, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while manager.get(job_id).status not in (DONE, FAILED) and time.time() < deadline:
+        time.sleep(0.01)
+    return manager.get(job_id)
+
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = JobManager(max_workers=1, max_pending=1, user_errors=(UserError,))
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    def test_progress_and_result(self):
+        def work(progress, n):
+            progress.set_stage("fetch")
+            progress.report("ethereum", 1, 10)
+            progress.report("bsc", 2, 5)
+            progress.report("ethereum", 2, 20)   # 累計值覆寫，不重複計算
+            progress.set_rows_processed(25)
+            return n * 2
+        job = wait_for(self.manager, self.manager.submit(work, 21, meta={"address": "0xa"}))
+        self.assertEqual(job.result, 42)
+        info = job.to_dict()
+        self.assertEqual(info["status"], DONE)
+        self.assertEqual(info["progress"], {"stage": DONE, "pages_fetched": 4,
+                                            "rows_fetched": 25, "rows_processed": 25})
+        self.assertEqual(info["meta"], {"address": "0xa"})
+
+    def test_errors(self):
+        def fail(progress, exc):
+            raise exc
+        job = wait_for(self.manager, self.manager.submit(fail, UserError("查無資料")))
+        self.assertEqual((job.status, job.error), (FAILED, "查無資料"))
+        job = wait_for(self.manager, self.manager.submit(fail, RuntimeError("secret detail")))
+        self.assertEqual(job.status, FAILED)
+        self.assertNotIn("secret", job.error)
+
+    def test_queue_limit(self):
+        release = threading.Event()
+        running = self.manager.submit(lambda progress: release.wait(5))
+        deadline = time.time() + 5
+        while self.manager.get(running).status != "running" and time.time() < deadline:
+            time.sleep(0.01)
+        self.manager.submit(lambda progress: None)   # 排隊中
+        with self.assertRaises(JobQueueFull):
+            self.manager.submit(lambda progress: None)
+        release.set()
+        self.assertEqual(wait_for(self.manager, running).status, DONE)
+
+    def test_status_visible_from_other_worker(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "shared.sqlite3")
+            worker = JobManager(max_workers=1, shared=SharedFlaskCache(SharedCache(path)))
+            other = JobManager(max_workers=1, shared=SharedFlaskCache(SharedCache(path)))
+            release = threading.Event()
+
+            def work(progress):
+                progress.report("ethereum", 3, 30)
+                release.wait(5)
+                return "result-id"
+            try:
+                job_id = worker.submit(work, meta={"address": "0xa"})
+                deadline = time.time() + 5
+                while other.get(job_id).status != "running" and time.time() < deadline:
+                    time.sleep(0.01)
+                self.assertEqual(other.get(job_id).meta, {"address": "0xa"})
+                release.set()
+                wait_for(worker, job_id)
+                job = other.get(job_id)
+                self.assertEqual((job.status, job.result), (DONE, "result-id"))
+                self.assertEqual(job.to_dict()["progress"]["rows_fetched"], 30)
+                self.assertIsNone(other.get("missing"))
+            finally:
+                release.set()
+                worker.shutdown()
+                other.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
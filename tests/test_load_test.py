@@ -0,0 +1,79 @@
+# tests/test_load_test.py
+import unittest
+import requests
+from benchmarks.standin_server import StandInServer
+from benchmarks.load_test import run_load, InProcessApp, make_addresses, percentiles, ENDPOINTS
+from services.explorer import fetch_txlist, ExplorerError, RateLimitedError
+
+
+class TestStandInServer(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(rows=250).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_txlist_pagination_and_block_range(self):
+        url = self.server.explorer_url("ethereum")
+        address = make_addresses(1)[0]
+        first = fetch_txlist(url, "k", address, offset=100, page=1)
+        third = fetch_txlist(url, "k", address, offset=100, page=3)
+        self.assertEqual((len(first), len(third)), (100, 50))
+        blocks = [tx["blockNumber"] for tx in first]
+        self.assertEqual(blocks, sorted(blocks))
+        self.assertTrue(all(address in (tx["from"], tx["to"]) for tx in first))
+
+        later = fetch_txlist(url, "k", address, startblock=blocks[-1] + 1)
+        self.assertTrue(all(tx["blockNumber"] > blocks[-1] for tx in later))
+        self.assertEqual(fetch_txlist(url, "k", address, startblock=10 ** 8), [])
+        with self.assertRaisesRegex(ExplorerError, "Result window"):
+            fetch_txlist(url, "k", address, page=2, offset=10000)
+
+    def test_prices(self):
+        price = requests.get(f"{self.server.coingecko_url}/simple/price?ids=ethereum&vs_currencies=usd").json()
+        self.assertEqual(price, {"ethereum": {"usd": 2000.0}})
+        chart = requests.get(f"{self.server.coingecko_url}/coins/ethereum/market_chart/range"
+                             f"?vs_currency=usd&from=1700000000&to=1700036000").json()
+        self.assertEqual(len(chart["prices"]), 11)
+
+    def test_rate_limit_and_errors(self):
+        self.server.rate_limit = 1
+        url = self.server.explorer_url("bsc")
+        # 每秒 1 次：連續 3 次呼叫最多跨過一個秒邊界，至少一次被限流
+        limited = 0
+        for offset in (10, 20, 30):
+            try:
+                fetch_txlist(url, "k1", "0xaaaa", offset=offset)
+            except RateLimitedError:
+                limited += 1
+        self.assertGreaterEqual(limited, 1)
+        fetch_txlist(url, "k2", "0xaaaa", offset=20)
+        self.server.error_rate = 1.0
+        with self.assertRaises(requests.HTTPError):
+            fetch_txlist(url, "k3", "0xaaaa", offset=30)
+        self.assertEqual(self.server.stats["rate_limited"], limited)
+        self.assertEqual(self.server.stats["errors"], 1)
+
+
+class TestLoadDriver(unittest.TestCase):
+    def test_in_process_run(self):
+        with StandInServer(rows=300) as server, InProcessApp(server, keys=2, key_rate=50) as target:
+            report = run_load(target.base_url, users=2, iterations=1, addresses=make_addresses(3))
+        self.assertEqual(report["errors"], 0)
+        self.assertEqual(report["requests"], 2 * len(ENDPOINTS))
+        for name in ENDPOINTS:
+            stats = report["endpoints"][name]
+            self.assertEqual(stats["requests"], 2)
+            self.assertLessEqual(stats["p50"], stats["p99"])
+        self.assertGreater(report["endpoints"]["export"]["bytes"], 0)
+        self.assertGreater(server.stats["txlist"], 0)
+
+    def test_percentiles(self):
+        stats = percentiles([i / 100 for i in range(1, 101)])
+        self.assertAlmostEqual(stats["p50"], 0.505, places=3)
+        self.assertAlmostEqual(stats["p99"], 0.9901, places=3)
+        self.assertIsNone(percentiles([])["p95"])
+
+
+if __name__ == '__main__':
+    unittest.main()
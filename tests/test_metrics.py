@@ -0,0 +1,46 @@
+# tests/test_metrics.py
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from services import metrics as m
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counters_and_histograms_render(self):
+        reg = m.MetricsRegistry(buckets=(0.1, 1.0))
+        reg.describe("jobs_total", "counter", "處理的工作數")
+        reg.inc("jobs_total", kind="a")
+        reg.inc("jobs_total", 2, kind="a")
+        reg.observe("latency_seconds", 0.05, route="/x")
+        reg.observe("latency_seconds", 0.5, route="/x")
+        reg.add_collector(lambda: [("queue_size", "gauge", {}, 3)])
+        text = reg.render()
+        self.assertIn("# HELP jobs_total 處理的工作數\n# TYPE jobs_total counter", text)
+        self.assertIn('jobs_total{kind="a"} 3', text)
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{route="/x",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{route="/x",le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="/x",le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_count{route="/x"} 2', text)
+        self.assertIn("queue_size 3", text)
+
+    def test_stage_breakdown_follows_context(self):
+        token = m.start_breakdown()
+        with m.stage("outer"):
+            pass
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            def work():
+                with m.stage("worker"):
+                    pass
+            m.run_in_context(pool, work).result()
+            pool.submit(work).result()   # 未複製 context：不記入明細
+        breakdown = m.end_breakdown(token)
+        self.assertEqual(set(breakdown), {"outer", "worker"})
+        self.assertGreaterEqual(m.metrics.histogram_count("pipeline_stage_seconds", stage="worker"), 2)
+        # 請求外的階段只記入直方圖
+        with m.stage("outside"):
+            pass
+        self.assertIsNone(m._breakdown.get())
+
+
+if __name__ == '__main__':
+    unittest.main()
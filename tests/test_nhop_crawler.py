@@ -0,0 +1,41 @@
+# tests/test_nhop_crawler.py
+import unittest
+from services.nhop_crawler import crawl_nhop
+
+# a -> b -> c -> d，另外 a -> e
+EDGES = [("0xa", "0xb", 10.0), ("0xb", "0xc", 5.0), ("0xc", "0xd", 1.0), ("0xa", "0xe", 1.0)]
+
+
+def load_txs_factory(calls):
+    def load_txs(addr):
+        calls.append(addr)
+        return [{"hash": f"{f}-{t}", "from": f, "to": t, "usd_value": v, "time": "t"}
+                for f, t, v in EDGES if addr in (f, t)]
+    return load_txs
+
+
+class TestNhopCrawler(unittest.TestCase):
+    def test_two_hops(self):
+        calls = []
+        res = crawl_nhop("0xA", 2, load_txs_factory(calls))
+        self.assertEqual(sorted(calls), ["0xa", "0xb", "0xe"])
+        self.assertEqual(res["nodes"], {"0xa", "0xb", "0xc", "0xe"})
+        # 每筆交易只出現一次
+        self.assertEqual(len(res["links"]), 3)
+        self.assertFalse(res["stats"]["truncated"])
+
+    def test_fanout_and_budget(self):
+        calls = []
+        res = crawl_nhop("0xa", 3, load_txs_factory(calls), fanout=1)
+        # fanout=1 只擴展往來金額最高的 0xb
+        self.assertNotIn("0xe", calls)
+        self.assertTrue(res["stats"]["truncated"])
+
+        calls = []
+        res = crawl_nhop("0xa", 3, load_txs_factory(calls), max_requests=2)
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(res["stats"]["truncated"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# tests/test_price_history.py
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from services.price_history import PriceHistory, missing_ranges
+
+DAY = 86400
+
+
+class TestPriceHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "prices.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_missing_ranges(self):
+        covered = [(0, 10 * DAY), (20 * DAY, 30 * DAY)]
+        self.assertEqual(missing_ranges(covered, 5 * DAY, 25 * DAY), [(10 * DAY, 20 * DAY)])
+        self.assertEqual(missing_ranges(covered, 0, 10 * DAY), [])
+        self.assertEqual(missing_ranges([], 0, DAY), [(0, DAY)])
+
+    @patch('services.http_client.http_get')
+    def test_vectorized_lookup_and_cache(self, mock_get):
+        base = 1600000000
+        mock_get.return_value.json.return_value = {
+            "prices": [[(base + i * DAY) * 1000, 100.0 + i] for i in range(10)]
+        }
+        history = PriceHistory(self.path)
+        ts = [base + 3 * DAY + 5, base, base + 9 * DAY + 100]
+        usd = history.usd_values("ethereum", ts, [2.0, 1.0, 1.0])
+        self.assertEqual(usd.tolist(), [206.0, 100.0, 109.0])
+        self.assertEqual(mock_get.call_count, 1)
+
+        # 已涵蓋的區間不再呼叫 API，重新開啟也從 SQLite 載入
+        history.usd_values("ethereum", ts, [1.0, 1.0, 1.0])
+        reopened = PriceHistory(self.path)
+        self.assertEqual(reopened.lookup("ethereum", [base + DAY]).tolist(), [101.0])
+        reopened.usd_values("ethereum", ts, [1.0, 1.0, 1.0])
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(reopened.latest("ethereum"), 109.0)
+
+    @patch('services.http_client.http_get', side_effect=OSError("offline"))
+    def test_no_data_returns_none(self, mock_get):
+        history = PriceHistory(self.path)
+        self.assertIsNone(history.usd_values("ethereum", [1600000000], [1.0]))
+        # 失敗後的退避期間內不再呼叫 API
+        self.assertIsNone(history.usd_values("ethereum", [1500000000], [1.0]))
+        self.assertEqual(mock_get.call_count, 1)
+        history._backoff["ethereum"] = 0
+        history.usd_values("ethereum", [1600000000], [1.0])
+        self.assertEqual(mock_get.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
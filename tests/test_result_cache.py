@@ -0,0 +1,72 @@
+# tests/test_result_cache.py
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from models.tx_batch import TransactionBatch
+from services.result_cache import ResultCache
+from services.shared_cache import SharedCache, SharedFlaskCache
+
+
+class TestResultCache(unittest.TestCase):
+    def test_put_get_and_stats(self):
+        cache = ResultCache()
+        rid = cache.put({"transactions": [{"hash": "0x1"}]})
+        self.assertEqual(cache.get(rid)["transactions"][0]["hash"], "0x1")
+        self.assertIsNone(cache.get("missing"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_lru_eviction_by_entries(self):
+        cache = ResultCache(max_entries=2)
+        a = cache.put({"transactions": []})
+        b = cache.put({"transactions": []})
+        cache.get(a)  # a 變成最近使用
+        c = cache.put({"transactions": []})
+        self.assertIsNotNone(cache.get(a))
+        self.assertIsNone(cache.get(b))
+        self.assertIsNotNone(cache.get(c))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_eviction_by_bytes(self):
+        cache = ResultCache(max_bytes=50000)
+        a = cache.put({"transactions": [{}] * 30})
+        b = cache.put({"transactions": [{}] * 30})
+        self.assertIsNone(cache.get(a))
+        self.assertIsNotNone(cache.get(b))
+        self.assertLessEqual(cache.stats()["bytes"], 50000)
+
+    def test_ttl_expiry(self):
+        cache = ResultCache(ttl=10)
+        with patch("services.result_cache.time.time", return_value=1000.0):
+            rid = cache.put({"transactions": []})
+        with patch("services.result_cache.time.time", return_value=1011.0):
+            self.assertIsNone(cache.get(rid))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_shared_tier_between_workers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "shared.sqlite3")
+            # 兩個 worker 各自的本行程快取，共用同一個 SQLite 檔
+            first = ResultCache(shared=SharedFlaskCache(SharedCache(path)))
+            second = ResultCache(shared=SharedFlaskCache(SharedCache(path)))
+            batch = TransactionBatch.from_raw([{"hash": "0x1", "from": "0xa", "to": "0xb",
+                                                "value": "10", "timeStamp": "1", "blockNumber": "1"}])
+            rid = first.put({"transactions": [{"hash": "0x1"}], "batch": batch,
+                             "usd_values": np.array([1.5]), "table_views": {"k": np.arange(1)}})
+
+            result = second.get(rid)
+            self.assertEqual(result["transactions"][0]["hash"], "0x1")
+            self.assertEqual(result["batch"].hashes.tolist(), ["0x1"])
+            self.assertNotIn("table_views", result)
+            self.assertEqual(second.stats()["shared_hits"], 1)
+            # 之後從本行程快取讀取
+            self.assertIs(second.get(rid), result)
+            self.assertEqual(second.stats()["shared_hits"], 1)
+            self.assertIsNone(second.get("missing"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# tests/test_screening.py
+import json
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from services.screening import parse_address_list, iter_screening, summarize
+
+A = "0x" + "ab" * 20
+B = "0x" + "cd" * 20
+
+
+class TestParseAddressList(unittest.TestCase):
+    def test_formats(self):
+        text = f"address,label\n{A.upper().replace('0X', '0x')},x\n{B}\n0x{'ef' * 32}\n{A}"
+        self.assertEqual(parse_address_list(text), [A, B])
+        self.assertEqual(parse_address_list(json.dumps([B, A]).encode()), [B, A])
+        self.assertEqual(parse_address_list("0x123 foo"), [])
+        with self.assertRaises(ValueError):
+            parse_address_list(f"{A}\n{B}", max_addresses=1)
+
+
+class TestIterScreening(unittest.TestCase):
+    def test_bounded_concurrency_and_errors(self):
+        addresses = ["0x%040x" % i for i in range(20)]
+        lock = threading.Lock()
+        running = {"now": 0, "max": 0}
+
+        def screen_one(address):
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            try:
+                if address == addresses[3]:
+                    raise KeyError("boom")
+                return {"address": address, "status": "ok", "risk": "low", "truncated": address == addresses[5]}
+            finally:
+                with lock:
+                    running["now"] -= 1
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            reports = list(iter_screening(addresses, screen_one, executor, max_in_flight=3,
+                                          blockchain="ethereum"))
+        self.assertLessEqual(running["max"], 3)
+        self.assertEqual(sorted(r["index"] for r in reports), list(range(20)))
+        failed = [r for r in reports if r["status"] == "error"]
+        self.assertEqual([(r["address"], r["blockchain"]) for r in failed], [(addresses[3], "ethereum")])
+        summary = summarize(reports, 1.0)
+        self.assertEqual((summary["screened"], summary["errors"], summary["truncated"],
+                          summary["risk_counts"]["low"]), (20, 1, 1, 19))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# tests/test_shared_cache.py
+import os
+import time
+import tempfile
+import unittest
+import multiprocessing
+from unittest.mock import patch
+from flask import Flask
+from flask_caching import Cache
+from limits import RateLimitItemPerMinute
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from services.shared_cache import SharedCache, SQLiteLimiterStorage
+
+
+def _worker_incr(path, n):
+    cache = SharedCache(path)
+    for _ in range(n):
+        cache.incr("hits", expiry=60)
+    cache.set("from_child", os.getpid())
+
+
+class TestSharedCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "shared.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_set_ttl(self):
+        cache = SharedCache(self.path)
+        cache.set("a", {"price": 1.5}, ttl=60)
+        cache.set("b", [1, 2, 3], ttl=1)
+        self.assertEqual(cache.get("a"), {"price": 1.5})
+        self.assertEqual(cache.get("missing", "default"), "default")
+        with patch("services.shared_cache.time.time", return_value=time.time() + 5):
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(cache.get("a"), {"price": 1.5})
+        self.assertTrue(cache.delete("a"))
+        self.assertIsNone(cache.get("a"))
+
+    def test_add_only_when_absent(self):
+        cache = SharedCache(self.path)
+        self.assertTrue(cache.add("k", 1))
+        self.assertFalse(cache.add("k", 2))
+        self.assertEqual(cache.get("k"), 1)
+
+    def test_eviction_by_entries_and_bytes(self):
+        cache = SharedCache(self.path, max_entries=3, max_bytes=10 ** 6)
+        now = time.time()
+        for i in range(5):
+            with patch("services.shared_cache.time.time", return_value=now + i * 10):
+                cache.set(f"k{i}", i)
+        # k0 最近被讀過，應保留；最久未存取的 k1、k2 被淘汰
+        with patch("services.shared_cache.time.time", return_value=now + 100):
+            cache.get("k0")
+        self.assertEqual(cache.evict(), 2)
+        self.assertEqual({k for k in ("k0", "k1", "k2", "k3", "k4") if cache.get(k) is not None},
+                         {"k0", "k3", "k4"})
+
+        small = SharedCache(os.path.join(self.tmpdir.name, "small.sqlite3"), max_bytes=5000)
+        for i in range(10):
+            small.set(f"blob{i}", b"x" * 1000)
+        small.evict()
+        self.assertLessEqual(small.stats()["bytes"], 5000)
+        self.assertIsNotNone(small.get("blob9"))
+
+    def test_shared_between_processes(self):
+        cache = SharedCache(self.path)
+        cache.set("from_parent", "hello")
+        ctx = multiprocessing.get_context("fork")
+        procs = [ctx.Process(target=_worker_incr, args=(self.path, 50)) for _ in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(30)
+        self.assertEqual(cache.counter("hits")[0], 150)
+        self.assertIsNotNone(cache.get("from_child"))
+        self.assertEqual(SharedCache(self.path).get("from_parent"), "hello")
+
+    def test_counter_expiry(self):
+        cache = SharedCache(self.path)
+        self.assertEqual(cache.incr("c", expiry=10), 1)
+        self.assertEqual(cache.incr("c", amount=2, expiry=10), 3)
+        with patch("services.shared_cache.time.time", return_value=time.time() + 11):
+            self.assertEqual(cache.counter("c"), (0, None))
+            self.assertEqual(cache.incr("c", expiry=10), 1)
+
+    def test_limiter_storage(self):
+        storage = storage_from_string(f"sqlite:///{self.path}")
+        self.assertIsInstance(storage, SQLiteLimiterStorage)
+        self.assertTrue(storage.check())
+        limiter = FixedWindowRateLimiter(storage)
+        item = RateLimitItemPerMinute(2)
+        self.assertTrue(limiter.hit(item, "1.2.3.4"))
+        self.assertTrue(limiter.hit(item, "1.2.3.4"))
+        self.assertFalse(limiter.hit(item, "1.2.3.4"))
+        # 另一個 worker 的儲存物件看到相同計數
+        other = FixedWindowRateLimiter(storage_from_string(f"sqlite:///{self.path}"))
+        self.assertFalse(other.test(item, "1.2.3.4"))
+        self.assertTrue(other.test(item, "5.6.7.8"))
+
+    def test_flask_cache_backend(self):
+        app = Flask(__name__)
+        cache = Cache(app, config={"CACHE_TYPE": "services.shared_cache.SharedFlaskCache",
+                                   "CACHE_SHARED_PATH": self.path})
+        cache.set("cg_price_ethereum", 3000.0, timeout=60)
+        self.assertEqual(cache.get("cg_price_ethereum"), 3000.0)
+        self.assertEqual(SharedCache(self.path).get("cg_price_ethereum"), 3000.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
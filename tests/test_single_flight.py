@@ -0,0 +1,117 @@
+# tests/test_single_flight.py
+import json
+import time
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from concurrent.futures import ThreadPoolExecutor
+from services.single_flight import SingleFlight
+from services.metrics import metrics
+from services.explorer import fetch_txlist
+from services.upstream import KeyPool, INTERACTIVE, BULK
+
+
+def wait_until(cond, timeout=5):
+    deadline = time.time() + timeout
+    while not cond() and time.time() < deadline:
+        time.sleep(0.001)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def run_concurrently(self, n, fn):
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            futures = [pool.submit(fn) for _ in range(n)]
+            return [f.exception() or f.result() for f in futures]
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight("test-share")
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"price": 1}
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            leader = pool.submit(flight.do, "k", slow)
+            started.wait(5)
+            followers = [pool.submit(flight.do, "k", slow) for _ in range(4)]
+            wait_until(lambda: metrics.counter_value("upstream_coalesced_total", group="test-share") >= 4)
+            other = flight.do("other", lambda: "independent")
+            release.set()
+            results = [leader.result()] + [f.result() for f in followers]
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(other, "independent")
+        self.assertEqual(flight.in_flight(), 0)
+        # 完成後不快取：再次呼叫會重新執行
+        flight.do("k", slow)
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_propagate_to_waiters(self):
+        flight = SingleFlight("test-error")
+        barrier = threading.Barrier(3)
+
+        def fail():
+            raise ValueError("upstream down")
+
+        def call():
+            barrier.wait(5)
+            return flight.do("k", fail)
+
+        results = self.run_concurrently(3, call)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    @patch('services.http_client.http_get')
+    def test_fetch_txlist_coalesces_identical_requests(self, mock_get):
+        release = threading.Event()
+        body = json.dumps({"status": "1", "message": "OK", "result": [
+            {"hash": "0x1", "from": "0xa", "to": "0xb", "value": "1", "timeStamp": "1", "blockNumber": "5"}
+        ]}).encode()
+
+        def slow_get(url, **kw):
+            release.wait(5)
+            resp = MagicMock()
+            resp.iter_content.return_value = iter([body])
+            return resp
+        mock_get.side_effect = slow_get
+
+        before = metrics.counter_value("upstream_coalesced_total", group="explorer")
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(fetch_txlist, "https://api.example", "key", "0xB", startblock=5)
+                       for _ in range(4)]
+            wait_until(lambda: metrics.counter_value("upstream_coalesced_total",
+                                                     group="explorer") - before >= 3)
+            release.set()
+            results = [f.result() for f in futures]
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertTrue(all(r == results[0] and len(r) == 1 for r in results))
+
+    @patch('services.http_client.http_get')
+    def test_interactive_not_coalesced_behind_bulk(self, mock_get):
+        body = json.dumps({"status": "1", "message": "OK", "result": []}).encode()
+
+        def get(url, **kw):
+            resp = MagicMock()
+            resp.iter_content.return_value = iter([body])
+            return resp
+        mock_get.side_effect = get
+
+        # 唯一的金鑰配額已用完：BULK 請求排隊等待，同參數的互動查詢應另外發出並優先取得配額
+        pool = KeyPool("test-priority", ["k1"], rate=5, burst=1)
+        pool.acquire()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            bulk = executor.submit(fetch_txlist, "https://api.example", pool, "0xC", priority=BULK)
+            wait_until(lambda: len(pool._waiters) == 1)
+            interactive = executor.submit(fetch_txlist, "https://api.example", pool, "0xC",
+                                          priority=INTERACTIVE)
+            self.assertEqual(interactive.result(5), [])
+            self.assertFalse(bulk.done())
+            self.assertEqual(bulk.result(5), [])
+        self.assertEqual(mock_get.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# tests/test_taint.py
+import unittest
+import numpy as np
+from models.tx_batch import TransactionBatch
+from models.graph_index import AddressGraphIndex
+from models.taint import propagate_taint, cached_taint
+
+S, A, B, C, D, X, F = ("0x%040x" % (0x7a1000 + i) for i in range(7))
+
+# (from, to, 金額, 時間)；B 在收到 S 的污點資金之前先轉出 2 給 X
+FLOWS = [(A, B, 10, 100), (B, X, 2, 200), (S, B, 10, 300), (B, C, 6, 400),
+         (C, D, 6, 500), (B, F, 6, 600)]
+
+
+def build_index(flows=FLOWS):
+    # 依時間倒序加入，確認傳播依時間而非加入順序
+    rows = [{"hash": "0x%064x" % (0x7a1000 + i), "from": s, "to": t, "value": str(v * 10 ** 18),
+             "timeStamp": str(ts), "blockNumber": str(ts)} for i, (s, t, v, ts) in enumerate(flows)][::-1]
+    index = AddressGraphIndex(None)
+    batch = TransactionBatch.from_raw(rows)
+    index.add_batch(batch, batch.value * 2)
+    return index
+
+
+class TestTaintModels(unittest.TestCase):
+    def setUp(self):
+        self.index = build_index()
+        self.seeds = self.index.book.lookup_many([S])
+
+    def tainted(self, result, address):
+        return result.report(result.position(self.index.book.lookup(address)))
+
+    def edge_taint(self, result, src, dst):
+        book = self.index.book
+        for e, t in zip(result.edge_ids.tolist(), result.edge_taint.tolist()):
+            if (self.index.src[e], self.index.dst[e]) == (book.lookup(src), book.lookup(dst)):
+                return t
+        return 0.0
+
+    def test_poison(self):
+        result = propagate_taint(self.index, self.seeds, "poison")
+        self.assertEqual(self.edge_taint(result, B, X), 0.0)   # 早於污點流入
+        self.assertEqual([self.edge_taint(result, *p) for p in [(B, C), (C, D), (B, F)]], [6, 6, 6])
+        self.assertEqual((self.tainted(result, D)["tainted"], self.tainted(result, D)["hops"]), (6, 3))
+        self.assertEqual(self.tainted(result, X)["hops"], -1)
+
+    def test_haircut(self):
+        result = propagate_taint(self.index, self.seeds, "haircut")
+        # B 餘額 18 (其中污點 10)，轉出 6 => 污點 10/3；之後餘額 12、污點 20/3，再轉出 6 => 10/3
+        self.assertAlmostEqual(self.edge_taint(result, B, C), 10 / 3)
+        self.assertAlmostEqual(self.edge_taint(result, C, D), 10 / 3)
+        self.assertAlmostEqual(self.edge_taint(result, B, F), 10 / 3)
+        report = self.tainted(result, C)
+        self.assertEqual(report["received"], 6)
+        self.assertAlmostEqual(report["ratio"], 5 / 9, places=5)
+
+    def test_fifo(self):
+        result = propagate_taint(self.index, self.seeds, "fifo")
+        # B 的資金批次：乾淨 8、污點 10；先轉出的 6 全部來自乾淨批次
+        self.assertEqual(self.edge_taint(result, B, C), 0.0)
+        self.assertEqual(self.edge_taint(result, C, D), 0.0)
+        self.assertAlmostEqual(self.edge_taint(result, B, F), 4)
+        # 每個地址只保留一個批次時退化為比例稀釋
+        merged = propagate_taint(self.index, self.seeds, "fifo", max_lots=1)
+        self.assertAlmostEqual(self.edge_taint(merged, B, C), 10 / 3)
+
+    def test_max_hops_and_cache(self):
+        result = propagate_taint(self.index, self.seeds, "poison", max_hops=1)
+        self.assertEqual(self.tainted(result, B)["tainted"], 10)
+        self.assertEqual(self.tainted(result, C)["tainted"], 0)
+        self.assertEqual(result.edges_scanned, 2)   # 只掃描 1 跳內節點的入邊
+
+        first, hit = cached_taint(self.index, self.seeds, "haircut")
+        again, hit_again = cached_taint(self.index, self.seeds, "haircut")
+        self.assertEqual((hit, hit_again), (False, True))
+        self.assertIs(first, again)
+        batch = TransactionBatch.from_raw([{"hash": "0x%064x" % 0x7a2000, "from": D, "to": A,
+                                            "value": str(10 ** 18), "timeStamp": "700"}])
+        self.index.add_batch(batch, batch.value)
+        self.assertFalse(cached_taint(self.index, self.seeds, "haircut")[1])
+
+    def test_no_seeds(self):
+        result = propagate_taint(self.index, np.array([], dtype=np.int64), "haircut")
+        self.assertEqual((result.edges_scanned, len(result.edge_ids)), (0, 0))
+        with self.assertRaises(ValueError):
+            propagate_taint(self.index, self.seeds, "lifo")
+
+
+if __name__ == '__main__':
+    unittest.main()
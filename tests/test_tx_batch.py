@@ -0,0 +1,59 @@
+# tests/test_tx_batch.py
+import pickle
+import unittest
+from models.tx_batch import TransactionBatch, wei_strings
+from models.data_processing import analyze_transactions
+
+
+class TestTransactionBatch(unittest.TestCase):
+    def setUp(self):
+        self.raw = [
+            {"hash": "0x1", "from": "0xAAA", "to": "0xbbb", "value": "5000000000000000000",
+             "timeStamp": "1609459200", "blockNumber": "10"},
+            {"hash": "0x2", "from": "0xbbb", "to": "0xccc", "value": "20000000000000000000",
+             "timeStamp": "1609459300", "blockNumber": "11"},
+            {"hash": "0x3", "from": "0xccc", "to": "0xbbb", "value": "not-a-number",
+             "timeStamp": "1609459400", "blockNumber": "12"},
+        ]
+
+    def test_from_raw_columns(self):
+        batch = TransactionBatch.from_raw(self.raw)
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.value.tolist(), [5.0, 20.0, 0.0])
+        self.assertEqual(batch.from_addr(0), "0xaaa")
+        self.assertEqual(batch.to_ids[0], batch.from_ids[1])
+
+    def test_exact_wei_above_float_precision(self):
+        # 2^53 + 1 與超過 int64 的金額，float64 無法精確表示
+        values = [str(2 ** 53 + 1), str(10 ** 25 + 1), 2 ** 64 + 3]
+        raw = [{"hash": f"0x{i}", "from": "0xa", "to": "0xb", "value": v,
+                "timeStamp": "1609459200", "blockNumber": "1"} for i, v in enumerate(values)]
+        batch = TransactionBatch.from_raw(raw)
+        expected = [str(int(v)) for v in values]
+        self.assertEqual(wei_strings(batch.wei).tolist(), expected)
+        self.assertEqual(wei_strings(batch.take([2, 0]).wei).tolist(), [expected[2], expected[0]])
+        self.assertEqual(wei_strings(TransactionBatch.concat([batch, batch]).wei).tolist(), expected * 2)
+        self.assertEqual(wei_strings(pickle.loads(pickle.dumps(batch)).wei).tolist(), expected)
+        records = batch.to_records()
+        self.assertEqual([r["value_wei"] for r in records], expected)
+        self.assertEqual(wei_strings(TransactionBatch.from_records(records).wei).tolist(), expected)
+
+    def test_value_mask_and_take(self):
+        batch = TransactionBatch.from_raw(self.raw)
+        sub = batch.take(batch.value_mask(1, 10))
+        self.assertEqual(sub.hashes.tolist(), ["0x1"])
+        records = sub.to_records(sub.usd_values(2.0))
+        self.assertEqual(records[0]["usd_value"], 10.0)
+
+    def test_analyze_batch_matches_records(self):
+        batch = TransactionBatch.from_raw(self.raw)
+        from_batch = analyze_transactions(batch, "0xBBB")
+        from_records = analyze_transactions(batch.to_records(), "0xbbb")
+        self.assertEqual(from_batch, from_records)
+        self.assertEqual(from_batch["total_in"], 5.0)
+        self.assertEqual(from_batch["count_in"], 2)
+        self.assertEqual(from_batch["total_out"], 20.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
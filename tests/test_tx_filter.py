@@ -0,0 +1,75 @@
+# tests/test_tx_filter.py
+import unittest
+from datetime import date, datetime
+import numpy as np
+from models.tx_batch import TransactionBatch
+from services.tx_filter import FilterIndex, filter_transactions, parse_date
+
+WALLET = "0x" + "ab" * 20
+
+
+def make_rows(n=40):
+    base = int(datetime(2021, 1, 1).timestamp())
+    return [{"hash": "0x%064x" % i,
+             "from": WALLET if i % 3 == 0 else "0x%040x" % (i + 1),
+             "to": "0x%040x" % (i + 1) if i % 3 == 0 else WALLET,
+             "value": str((n - i) * 10 ** 17), "timeStamp": str(base + i * 43200),
+             "blockNumber": str(100 + i)} for i in range(n)]
+
+
+def brute_force(rows, min_val, max_val, start, end, direction):
+    keep = []
+    for i, tx in enumerate(rows):
+        value = int(tx["value"]) / 1e18
+        day = datetime.fromtimestamp(int(tx["timeStamp"])).date()
+        if min_val is not None and value < min_val or max_val is not None and value > max_val:
+            continue
+        if start and day < start or end and day > end:
+            continue
+        if direction == "in" and tx["to"] != WALLET or direction == "out" and tx["from"] != WALLET:
+            continue
+        keep.append(i)
+    return keep
+
+
+class TestFilterIndex(unittest.TestCase):
+    def test_select_matches_brute_force(self):
+        rows = make_rows()
+        index = FilterIndex(TransactionBatch.from_raw(rows), WALLET.upper().replace("0X", "0x"))
+        cases = [(0.0, None, None, None, "all"),
+                 (1.0, 2.5, None, None, "all"),
+                 (0.0, None, date(2021, 1, 3), date(2021, 1, 7), "in"),
+                 (0.5, 3.0, date(2021, 1, 2), None, "out"),
+                 (10.0, None, None, None, "all"),
+                 (None, None, None, date(2020, 12, 31), "all")]
+        for case in cases:
+            with self.subTest(case=case):
+                self.assertEqual(index.select(*case).tolist(), brute_force(rows, *case))
+
+    def test_subset_and_unknown_wallet(self):
+        batch = TransactionBatch.from_raw(make_rows(6))
+        usd = np.arange(6, dtype=float)
+        index = FilterIndex(batch, WALLET, usd, np.array(["eth"] * 6))
+        sub, sub_usd, labels = index.subset(index.select(direction="in"))
+        self.assertEqual(sub_usd.tolist(), [1.0, 2.0, 4.0, 5.0])
+        self.assertEqual(len(sub), len(labels))
+        self.assertGreater(index.nbytes, 0)
+        self.assertEqual(len(FilterIndex(batch, "0x" + "cd" * 20).select(direction="out")), 0)
+
+    def test_filter_transactions(self):
+        rows = make_rows(10)
+        out = filter_transactions(rows, WALLET, min_val=0.5, direction="out")
+        self.assertEqual([tx["hash"] for tx in out], [rows[i]["hash"] for i in (0, 3)])
+        self.assertEqual(out[0]["value_ether"], 1.0)
+        self.assertIn("time_str", out[0])
+        self.assertEqual(filter_transactions([], WALLET), [])
+
+    def test_parse_date(self):
+        self.assertEqual(parse_date("2021-02-03"), date(2021, 2, 3))
+        self.assertIsNone(parse_date(""))
+        with self.assertRaises(ValueError):
+            parse_date("03/02/2021")
+
+
+if __name__ == '__main__':
+    unittest.main()
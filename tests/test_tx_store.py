@@ -0,0 +1,93 @@
+# tests/test_tx_store.py
+import os
+import tempfile
+import unittest
+from services.tx_store import TransactionStore, sync_address
+
+
+def make_tx(i, block):
+    return {"hash": f"0x{i:04x}", "blockNumber": str(block), "timeStamp": str(1609459200 + i),
+            "from": "0xfrom", "to": "0xto", "value": str(i * 10**18)}
+
+
+class TestTransactionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = TransactionStore(os.path.join(self.tmpdir.name, "store.sqlite3"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_incremental_sync(self):
+        calls = []
+        chain_txs = [make_tx(i, 100 + i) for i in range(5)]
+
+        def fetch(startblock, offset):
+            calls.append(startblock)
+            return [tx for tx in chain_txs if int(tx["blockNumber"]) >= startblock][:offset]
+
+        sync_address(self.store, "ethereum", "0xABC", fetch, offset=10)
+        self.assertEqual(calls, [0])
+        self.assertEqual(self.store.count("ethereum", "0xabc"), 5)
+
+        chain_txs.append(make_tx(5, 200))
+        sync_address(self.store, "ethereum", "0xabc", fetch, offset=10)
+        self.assertEqual(calls, [0, 105])
+        self.assertEqual(self.store.count("ethereum", "0xabc"), 6)
+        self.assertEqual(self.store.page("ethereum", "0xabc")[0]["blockNumber"], "200")
+
+    def test_full_page_refetches_last_block(self):
+        chain_txs = [make_tx(i, 100 + i // 2) for i in range(6)]
+
+        def fetch(startblock, offset):
+            return [tx for tx in chain_txs if int(tx["blockNumber"]) >= startblock][:offset]
+
+        calls = sync_address(self.store, "ethereum", "0xabc", fetch, offset=3)
+        # 第一頁結束於區塊 101 的一半，需從 101 重抓
+        self.assertGreater(calls, 1)
+        self.assertEqual(self.store.count("ethereum", "0xabc"), 6)
+        self.assertEqual(self.store.sync_state("ethereum", "0xabc")[0], 102)
+
+    def test_first_sync_serves_newest_when_history_exceeds_cap(self):
+        # 25 筆交易、每頁 5 筆、每次同步最多 2 頁：首次同步只能抓 10 筆
+        chain_txs = [make_tx(i, 100 + i) for i in range(25)]
+        calls = []
+
+        def fetch(startblock, offset):
+            calls.append(("asc", startblock))
+            return [tx for tx in chain_txs if int(tx["blockNumber"]) >= startblock][:offset]
+
+        def fetch_desc(endblock, offset):
+            calls.append(("desc", endblock))
+            older = [tx for tx in chain_txs if int(tx["blockNumber"]) <= endblock]
+            return sorted(older, key=lambda tx: -int(tx["blockNumber"]))[:offset]
+
+        sync_address(self.store, "ethereum", "0xabc", fetch, offset=5, max_pages=2,
+                     fetch_desc=fetch_desc)
+        self.assertEqual(calls[0][0], "desc")
+        page = self.store.page("ethereum", "0xabc", 1, 5)
+        self.assertEqual([tx["blockNumber"] for tx in page], ["124", "123", "122", "121", "120"])
+        self.assertEqual(self.store.sync_state("ethereum", "0xabc")[0], 124)
+        self.assertEqual(self.store.first_block("ethereum", "0xabc"), 117)
+
+        # 新交易優先同步，剩餘的呼叫次數往下回補
+        chain_txs.append(make_tx(25, 130))
+        sync_address(self.store, "ethereum", "0xabc", fetch, offset=5, max_pages=2,
+                     fetch_desc=fetch_desc)
+        self.assertEqual(self.store.page("ethereum", "0xabc", 1, 5)[0]["blockNumber"], "130")
+        self.assertEqual(self.store.first_block("ethereum", "0xabc"), 113)
+
+        for _ in range(5):
+            sync_address(self.store, "ethereum", "0xabc", fetch, offset=5, max_pages=2,
+                         fetch_desc=fetch_desc)
+        self.assertEqual(self.store.count("ethereum", "0xabc"), 26)
+        self.assertEqual(self.store.first_block("ethereum", "0xabc"), 0)
+
+    def test_min_interval_skips_api(self):
+        fetch = lambda startblock, offset: []
+        sync_address(self.store, "ethereum", "0xabc", fetch)
+        self.assertEqual(sync_address(self.store, "ethereum", "0xabc", fetch, min_interval=60), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# tests/test_tx_table.py
+import unittest
+import numpy as np
+from models.tx_batch import TransactionBatch
+from models.tx_table import table_order, counterparty_ids
+
+
+def make_batch(edges):
+    raw = [{"hash": f"0xh{i}", "from": f, "to": t, "value": str(int(v * 10**18)),
+            "timeStamp": str(1609459200 + i), "blockNumber": str(i)}
+           for i, (f, t, v) in enumerate(edges)]
+    return TransactionBatch.from_raw(raw)
+
+
+class TestTxTable(unittest.TestCase):
+    def setUp(self):
+        self.batch = make_batch([("0xw", "0xc", 1), ("0xa", "0xw", 5), ("0xw", "0xb", 3),
+                                 ("0xb", "0xw", 3), ("0xw", "0xw", 2)])
+        self.usd = self.batch.usd_values(2.0)
+
+    def test_sort_fields(self):
+        self.assertEqual(table_order(self.batch, self.usd, "0xw").tolist(), [4, 3, 2, 1, 0])
+        self.assertEqual(table_order(self.batch, self.usd, "0xw", "value", descending=False).tolist(),
+                         [0, 4, 3, 2, 1])  # 同金額依時間新到舊
+        self.assertEqual(table_order(self.batch, self.usd, "0xw", "usd_value").tolist(), [1, 3, 2, 4, 0])
+        cp = counterparty_ids(self.batch, "0xw")
+        self.assertEqual([self.batch.addresses[i] for i in cp], ["0xc", "0xa", "0xb", "0xb", "0xw"])
+        self.assertEqual(table_order(self.batch, self.usd, "0xw", "counterparty", descending=False).tolist(),
+                         [1, 3, 2, 0, 4])
+        with self.assertRaises(ValueError):
+            table_order(self.batch, self.usd, "0xw", "gas")
+
+    def test_value_sort_is_exact(self):
+        # 兩筆金額只差 1 wei，float64 視為相同；應依精確金額排序而非時間
+        raw = [{"hash": f"0xh{i}", "from": "0xw", "to": "0xc", "value": str(10 ** 20 + i),
+                "timeStamp": str(1609459200 + i), "blockNumber": str(i)} for i in range(2)]
+        batch = TransactionBatch.from_raw(raw)
+        self.assertEqual(batch.value_wei[0], batch.value_wei[1])
+        usd = batch.usd_values(1.0)
+        self.assertEqual(table_order(batch, usd, "0xw", "value").tolist(), [1, 0])
+        self.assertEqual(table_order(batch, usd, "0xw", "value", descending=False).tolist(), [0, 1])
+
+    def test_filters(self):
+        order = lambda **kw: sorted(table_order(self.batch, self.usd, "0xW", **kw).tolist())
+        self.assertEqual(order(direction="in"), [1, 3, 4])
+        self.assertEqual(order(direction="out"), [0, 2])
+        self.assertEqual(order(text="0xB"), [2, 3])
+        self.assertEqual(order(text="h4"), [4])
+        self.assertEqual(order(min_value=2, max_value=3), [2, 3, 4])
+        self.assertEqual(order(flagged=np.array([True, False, False, False, True])), [0, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
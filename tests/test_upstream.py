@@ -0,0 +1,106 @@
+# tests/test_upstream.py
+import json
+import time
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from limits.storage import MemoryStorage
+from services.upstream import KeyPool, UpstreamBusy, INTERACTIVE, BACKGROUND, BULK
+from services.explorer import fetch_txlist, RateLimitedError
+
+
+def response(payload, status_code=200):
+    resp = MagicMock()
+    resp.status_code = status_code
+    resp.iter_content.return_value = iter([json.dumps(payload).encode("utf-8")])
+    return resp
+
+
+class TestKeyPool(unittest.TestCase):
+    def test_pacing_scales_with_keys(self):
+        # 每把金鑰每秒 20 次、不可累積：單把金鑰 10 次約需 0.45 秒，3 把約 0.15 秒
+        def elapsed(keys):
+            pool = KeyPool("test", keys, rate=20, burst=1)
+            start = time.monotonic()
+            used = [pool.acquire() for _ in range(10)]
+            return time.monotonic() - start, used
+
+        single, _ = elapsed(["k1"])
+        multi, used = elapsed(["k1", "k2", "k3"])
+        self.assertGreaterEqual(single, 0.4)
+        self.assertLess(multi, single / 2)
+        self.assertEqual(set(used), {"k1", "k2", "k3"})
+
+    def test_timeout_raises_busy(self):
+        pool = KeyPool("test", ["k1"], rate=1, burst=1)
+        pool.acquire()
+        with self.assertRaises(UpstreamBusy):
+            pool.acquire(timeout=0.05)
+        with self.assertRaises(UpstreamBusy):
+            KeyPool("empty", []).acquire()
+
+    def test_interactive_goes_first(self):
+        pool = KeyPool("test", ["k1"], rate=20, burst=1)
+        pool.acquire()
+        order = []
+
+        def worker(priority, label):
+            pool.acquire(priority)
+            order.append(label)
+
+        threads = [threading.Thread(target=worker, args=(BULK, f"bulk{i}")) for i in range(2)]
+        threads += [threading.Thread(target=worker, args=(BACKGROUND, "background"))]
+        for t in threads:
+            t.start()
+        time.sleep(0.01)
+        interactive = threading.Thread(target=worker, args=(INTERACTIVE, "interactive"))
+        interactive.start()
+        for t in threads + [interactive]:
+            t.join(5)
+        self.assertEqual(order[:2], ["interactive", "background"])
+
+    def test_penalized_key_is_skipped(self):
+        pool = KeyPool("test", ["k1", "k2"], rate=100, burst=5)
+        pool.penalize("k1", 10)
+        self.assertEqual({pool.acquire() for _ in range(4)}, {"k2"})
+
+    def test_shared_storage_caps_all_workers(self):
+        # 兩個 worker 各自的 bucket 都有 5 個 token，但共用計數器讓合計每秒只用 5 次
+        storage = MemoryStorage()
+        workers = [KeyPool("test", ["k1"], rate=5, burst=5, storage=storage) for _ in range(2)]
+        for _ in range(5):
+            workers[0].acquire()
+        with self.assertRaises(UpstreamBusy):
+            workers[1].acquire(timeout=0.05)
+        # 速率限制的冷卻也傳到其他 worker
+        shared = [KeyPool("test", ["k1", "k2"], rate=100, burst=5, storage=MemoryStorage())]
+        shared.append(KeyPool("test", ["k1", "k2"], rate=100, burst=5, storage=shared[0].storage))
+        shared[0].penalize("k1", 10)
+        self.assertEqual({shared[1].acquire() for _ in range(4)}, {"k2"})
+
+
+class TestExplorerRetry(unittest.TestCase):
+    @patch('services.http_client.http_get')
+    def test_rate_limit_switches_key(self, mock_get):
+        limited = {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+        ok = {"status": "1", "message": "OK", "result": [
+            {"hash": "0x1", "from": "0xa", "to": "0xb", "value": "1", "timeStamp": "1", "blockNumber": "1"}]}
+        mock_get.side_effect = [response(limited), response({}, status_code=429), response(ok)]
+        pool = KeyPool("ethereum", ["k1", "k2", "k3"], rate=100, retry_backoff=0.01)
+        txs = fetch_txlist("https://api.example", pool, "0xa")
+        self.assertEqual(len(txs), 1)
+        keys = [call.args[0].rsplit("apikey=", 1)[1] for call in mock_get.call_args_list]
+        self.assertEqual(len(set(keys)), 3)
+
+    @patch('services.http_client.http_get')
+    def test_gives_up_after_retries(self, mock_get):
+        limited = {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+        mock_get.side_effect = lambda *a, **kw: response(limited)
+        pool = KeyPool("ethereum", ["k1"], rate=100, max_retries=2, retry_backoff=0.01)
+        with self.assertRaisesRegex(RateLimitedError, "Max rate limit"):
+            fetch_txlist("https://api.example", pool, "0xa")
+        self.assertEqual(mock_get.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()